@@ -12,6 +12,7 @@ cli = click.Group(name="cli")
 retrieval_command_group = click.Group(name="retrieval")
 profiles_command_group = click.Group(name="profiles")
 bundle_command_group = click.Group(name="bundle")
+catalog_command_group = click.Group(name="catalog")
 
 
 def _check_config_validity() -> None:
@@ -114,6 +115,25 @@ def run_profiles_download() -> None:
     src.profiles.main.run()
 
 
+@profiles_command_group.command(
+    name="daemon",
+    help=
+    "Run the profiles download as a long-running process. Requests are uploaded to the `ccycle.gps.caltech.edu` FTP server one every 65 seconds as long as there are open request slots, while finished requests are polled and downloaded concurrently. Stop it with Ctrl+C.",
+)
+@click.option(
+    "--poll-interval",
+    type=click.IntRange(min=10),
+    default=300,
+    show_default=True,
+    help="Seconds between two checks for finished requests.",
+)
+def run_profiles_daemon(poll_interval: int) -> None:
+    _check_config_validity()
+
+    import src  # import here so that the CLI is more reactive
+    src.profiles.daemon.run(poll_interval=poll_interval)
+
+
 @profiles_command_group.command(
     name="request-ginput-status",
     help=
@@ -144,6 +164,19 @@ def run_bundle() -> None:
     src.bundle.main.run()
 
 
+@catalog_command_group.command(
+    name="rebuild",
+    help="Regenerate the catalog of all retrieval results from the results directory",
+)
+def rebuild_catalog() -> None:
+    _check_config_validity()
+
+    import src  # import here so that the CLI is more reactive
+    config = src.types.Config.load()
+    result_count = src.utils.results_catalog.rebuild(config.general.data.results.root)
+    click.echo(f"Found {result_count} results in {config.general.data.results.root}")
+
+
 @cli.command(
     name="data-report",
     help="exports a report of the data present on the configured system",
@@ -188,6 +221,7 @@ def print_data_report() -> None:
 cli.add_command(retrieval_command_group)
 cli.add_command(profiles_command_group)
 cli.add_command(bundle_command_group)
+cli.add_command(catalog_command_group)
 
 if __name__ == "__main__":
     cli()
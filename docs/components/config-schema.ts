@@ -325,6 +325,30 @@ const CONFIG_SCHEMA: any = {
                                     "minimum": 1,
                                     "title": "Max Parallel Requests",
                                     "type": "integer"
+                                },
+                                "max_parallel_downloads": {
+                                    "default": 4,
+                                    "description": "Maximum number of FTP connections used to download tarballs from the ccycle server concurrently. Each connection logs in separately.",
+                                    "maximum": 16,
+                                    "minimum": 1,
+                                    "title": "Max Parallel Downloads",
+                                    "type": "integer"
+                                },
+                                "listing_cache_ttl": {
+                                    "default": 10,
+                                    "description": "Number of minutes for which the directory listings of the ccycle server are reused before listing the directories again. Set to `0` to list the directories on every download.",
+                                    "maximum": 1440,
+                                    "minimum": 0,
+                                    "title": "Listing Cache Ttl",
+                                    "type": "integer"
+                                },
+                                "max_query_length": {
+                                    "default": 7,
+                                    "description": "Maximum number of days covered by a single request. Nearby missing days of a location are merged into as few requests as possible, each spanning at most this many days.",
+                                    "maximum": 31,
+                                    "minimum": 1,
+                                    "title": "Max Query Length",
+                                    "type": "integer"
                                 }
                             },
                             "required": [
@@ -426,6 +450,34 @@ const CONFIG_SCHEMA: any = {
                             },
                             "title": "Ggg2020 Standard Sites",
                             "type": "array"
+                        },
+                        "file_types": {
+                            "default": [
+                                "map",
+                                "mod",
+                                "vmr"
+                            ],
+                            "description": "File types to extract from the downloaded tarballs. The retrievals only use the `.map` files, so you can set this to `[\"map\"]` to save disk space and inodes. GGG2014 tarballs do not contain `.vmr` files. Days are considered as downloaded when all files of these types exist.",
+                            "items": {
+                                "enum": [
+                                    "map",
+                                    "mod",
+                                    "vmr"
+                                ],
+                                "type": "string"
+                            },
+                            "title": "File Types",
+                            "type": "array"
+                        },
+                        "storage_format": {
+                            "default": "files",
+                            "description": "How to store the extracted profiles. `files` stores every file in the profiles directory. `packed` stores the files of one location and month in a single zip archive `<model>/YYYYMM_<coordinates>.zip`, which saves inodes and makes scanning the profiles directory much faster. The retrievals can read both formats, so you can switch at any time.",
+                            "enum": [
+                                "files",
+                                "packed"
+                            ],
+                            "title": "Storage Format",
+                            "type": "string"
                         }
                     },
                     "required": [
@@ -477,6 +529,177 @@ const CONFIG_SCHEMA: any = {
                                     ],
                                     "title": "Queue Verbosity",
                                     "type": "string"
+                                },
+                                "requeue_changed_inputs": {
+                                    "default": false,
+                                    "description": "Every result stores a fingerprint of its inputs in its `about.json`: the names, sizes and modification times of the interferograms, the contents of the ground pressure and map files, the metadata of the sensor-day and the job settings which affect the results (e.g. not `output_suffix` or `store_binary_spectra`). If this is set, the retrieval queue compares these fingerprints with the current inputs and processes the sensor-days again whose inputs have changed since, e.g. because of late-arriving interferograms or corrected pressure files. The old results of these sensor-days are replaced. Results without a fingerprint (from older versions of the pipeline) are never reprocessed. If not set, every sensor-day with a result is considered done.",
+                                    "title": "Requeue Changed Inputs",
+                                    "type": "boolean"
+                                },
+                                "input_prefetch": {
+                                    "anyOf": [
+                                        {
+                                            "additionalProperties": false,
+                                            "properties": {
+                                                "scratch_dir": {
+                                                    "title": "StrictDirectoryPath",
+                                                    "type": "string",
+                                                    "description": "Local directory to copy the interferograms of upcoming retrievals to. The pipeline uses the subdirectory `em27-retrieval-prefetch-$hash`, where the hash is unique for each installation of the pipeline, and removes it when the retrievals are finished."
+                                                },
+                                                "max_size_gb": {
+                                                    "default": 20,
+                                                    "description": "Maximum size of all prefetched interferograms in GB.",
+                                                    "exclusiveMinimum": 0.0,
+                                                    "title": "Max Size Gb",
+                                                    "type": "number"
+                                                },
+                                                "lookahead": {
+                                                    "default": 4,
+                                                    "description": "Number of queued retrievals for which the interferograms are prefetched.",
+                                                    "maximum": 128,
+                                                    "minimum": 1,
+                                                    "title": "Lookahead",
+                                                    "type": "integer"
+                                                },
+                                                "thread_count": {
+                                                    "default": 2,
+                                                    "description": "Number of sensor days which are copied in parallel.",
+                                                    "maximum": 32,
+                                                    "minimum": 1,
+                                                    "title": "Thread Count",
+                                                    "type": "integer"
+                                                }
+                                            },
+                                            "required": [
+                                                "scratch_dir"
+                                            ],
+                                            "title": "RetrievalInputPrefetchConfig",
+                                            "type": "object"
+                                        },
+                                        {
+                                            "type": "null"
+                                        }
+                                    ],
+                                    "default": null,
+                                    "description": "If set, the interferograms of the next queued retrievals are copied to a local scratch directory in the background while other retrievals are running. The retrievals then read the local copies instead of the interferogram directory. This helps when the interferograms are stored on slow network storage. If not set, the retrievals read the interferograms directly from `config.general.data.interferograms`."
+                                },
+                                "stage_concurrency": {
+                                    "anyOf": [
+                                        {
+                                            "additionalProperties": false,
+                                            "properties": {
+                                                "input_output": {
+                                                    "anyOf": [
+                                                        {
+                                                            "maximum": 128,
+                                                            "minimum": 1,
+                                                            "type": "integer"
+                                                        },
+                                                        {
+                                                            "type": "null"
+                                                        }
+                                                    ],
+                                                    "default": 2,
+                                                    "description": "How many sensor-days can move their inputs into or their outputs out of the containers at the same time. Set to `null` to not limit this stage.",
+                                                    "title": "Input Output"
+                                                },
+                                                "preprocess": {
+                                                    "anyOf": [
+                                                        {
+                                                            "maximum": 128,
+                                                            "minimum": 1,
+                                                            "type": "integer"
+                                                        },
+                                                        {
+                                                            "type": "null"
+                                                        }
+                                                    ],
+                                                    "default": null,
+                                                    "description": "How many sensor-days can run the preprocessing at the same time. Set to `null` to not limit this stage.",
+                                                    "title": "Preprocess"
+                                                },
+                                                "pcxs": {
+                                                    "anyOf": [
+                                                        {
+                                                            "maximum": 128,
+                                                            "minimum": 1,
+                                                            "type": "integer"
+                                                        },
+                                                        {
+                                                            "type": "null"
+                                                        }
+                                                    ],
+                                                    "default": null,
+                                                    "description": "How many sensor-days can run pcxs at the same time. Set to `null` to not limit this stage.",
+                                                    "title": "Pcxs"
+                                                },
+                                                "invers": {
+                                                    "anyOf": [
+                                                        {
+                                                            "maximum": 128,
+                                                            "minimum": 1,
+                                                            "type": "integer"
+                                                        },
+                                                        {
+                                                            "type": "null"
+                                                        }
+                                                    ],
+                                                    "default": null,
+                                                    "description": "How many sensor-days can run invers at the same time. Set to `null` to not limit this stage.",
+                                                    "title": "Invers"
+                                                }
+                                            },
+                                            "title": "RetrievalStageConcurrencyConfig",
+                                            "type": "object"
+                                        },
+                                        {
+                                            "type": "null"
+                                        }
+                                    ],
+                                    "default": null,
+                                    "description": "If set, each sensor-day runs through the stages inputs, preprocess, pcxs, invers and outputs, and every stage has its own limit of how many sensor-days can run it at the same time. The sensor-days still run in separate processes (up to `max_process_count`), but they wait for a free slot before each stage. A waiting sensor-day keeps its process and its retrieval container, so it still counts towards `max_process_count` and no other sensor-day starts in its place. Therefore, `max_process_count` should be larger than the stage limits, otherwise the sensor-days waiting for one stage leave the other stages idle. With more processes than CPU cores, this lets the inputs and outputs of some sensor-days be moved while others are computing, and avoids that all processes hit the disk at the same time. If not set, every process runs all stages without waiting."
+                                },
+                                "preprocess_shard_count": {
+                                    "default": 1,
+                                    "description": "Only used by Proffast 2.X. Into how many parts the interferograms of one sensor-day are split for the preprocessing. The parts are converted by concurrent preprocess processes and their spectra are merged afterwards, so each retrieval process uses up to this many cores during the preprocessing. This shortens the preprocessing of days with many interferograms.",
+                                    "maximum": 64,
+                                    "minimum": 1,
+                                    "title": "Preprocess Shard Count",
+                                    "type": "integer"
+                                },
+                                "use_spectra_cache": {
+                                    "default": false,
+                                    "description": "Whether to cache the binary spectra generated by the preprocessing of Proffast 2.X in `data/spectra_cache`. The preprocessing does not depend on the atmospheric profile model or the ground pressure, so jobs processing the same sensor days with the same interferograms, preprocess version, DC thresholds and ILS parameters reuse the spectra of the first job and skip the preprocessing. Each cached day takes up as much disk space as the spectra stored with `store_binary_spectra`.",
+                                    "title": "Use Spectra Cache",
+                                    "type": "boolean"
+                                },
+                                "spectra_cache_max_size": {
+                                    "anyOf": [
+                                        {
+                                            "minimum": 1,
+                                            "type": "integer"
+                                        },
+                                        {
+                                            "type": "null"
+                                        }
+                                    ],
+                                    "default": 100,
+                                    "description": "Maximum size of `data/spectra_cache` in GB. Whenever new spectra are stored, the cached spectra that have not been used for the longest time are removed until the cache is below this size again. Set to `null` to never remove spectra from the cache.",
+                                    "title": "Spectra Cache Max Size"
+                                },
+                                "interpolated_mapfile_cache_max_size": {
+                                    "anyOf": [
+                                        {
+                                            "minimum": 1,
+                                            "type": "integer"
+                                        },
+                                        {
+                                            "type": "null"
+                                        }
+                                    ],
+                                    "default": 1,
+                                    "description": "Only used by Proffast 2.4. Maximum size of `data/interpolated_mapfiles` in GB. After each retrieval, the interpolated map files that have not been used for the longest time are removed until the cache is below this size again. One interpolated map file takes up about 10 KB. Set to `null` to never remove map files from the cache.",
+                                    "title": "Interpolated Mapfile Cache Max Size"
                                 }
                             },
                             "required": [
@@ -570,6 +793,27 @@ const CONFIG_SCHEMA: any = {
                                                 "title": "Use Ifg Corruption Filter",
                                                 "type": "boolean"
                                             },
+                                            "use_ifg_prescreen": {
+                                                "default": false,
+                                                "description": "Whether to pre-screen the interferograms before passing them to the retrieval algorithm. The pre-screen computes the DC level and DC variation of each interferogram in the same way as the preprocessing and excludes the interferograms which are below `dc_min_threshold` or above `dc_var_threshold`, e.g. scans during cloudy periods. These would be rejected by the preprocessing anyway, but skipping them saves preprocessing time.",
+                                                "title": "Use Ifg Prescreen",
+                                                "type": "boolean"
+                                            },
+                                            "max_sza": {
+                                                "anyOf": [
+                                                    {
+                                                        "maximum": 90.0,
+                                                        "minimum": 0.0,
+                                                        "type": "number"
+                                                    },
+                                                    {
+                                                        "type": "null"
+                                                    }
+                                                ],
+                                                "default": null,
+                                                "description": "If set, interferograms recorded at a solar zenith angle (in degrees) above this value are not passed to the retrieval algorithm. The solar zenith angle is computed from the measurement time in the OPUS file header and the location of the sensor. Interferograms without a readable measurement time are always passed on.",
+                                                "title": "Max Sza"
+                                            },
                                             "custom_ils": {
                                                 "anyOf": [
                                                     {
@@ -624,6 +868,85 @@ const CONFIG_SCHEMA: any = {
                                                 "default": null,
                                                 "description": "Suffix to append to the output folders. If not set, the pipeline output folders are named `sensorid/YYYYMMDD/`. If set, the folders are named `sensorid/YYYYMMDD_suffix/`. This is useful when having multiple retrieval jobs processing the same sensor dates with different settings.",
                                                 "title": "Output Suffix"
+                                            },
+                                            "reprocess_from_spectra": {
+                                                "anyOf": [
+                                                    {
+                                                        "additionalProperties": false,
+                                                        "properties": {
+                                                            "atmospheric_profile_model": {
+                                                                "description": "Atmospheric profile model of the retrieval job that stored the spectra.",
+                                                                "enum": [
+                                                                    "GGG2014",
+                                                                    "GGG2020"
+                                                                ],
+                                                                "title": "Atmospheric Profile Model",
+                                                                "type": "string"
+                                                            },
+                                                            "output_suffix": {
+                                                                "anyOf": [
+                                                                    {
+                                                                        "type": "string"
+                                                                    },
+                                                                    {
+                                                                        "type": "null"
+                                                                    }
+                                                                ],
+                                                                "default": null,
+                                                                "description": "Output suffix of the retrieval job that stored the spectra.",
+                                                                "title": "Output Suffix"
+                                                            }
+                                                        },
+                                                        "required": [
+                                                            "atmospheric_profile_model"
+                                                        ],
+                                                        "title": "RetrievalJobSettingsSpectraSourceConfig",
+                                                        "type": "object"
+                                                    },
+                                                    {
+                                                        "type": "null"
+                                                    }
+                                                ],
+                                                "default": null,
+                                                "description": "If set, the job does not use any interferograms but reprocesses the binary spectra stored by an earlier job with the same retrieval algorithm and `store_binary_spectra` enabled. The spectra are read from the successful results of that job (`results/<algorithm>/<model>/<sensor>/successful/YYYYMMDD[_suffix]/analysis/cal/`) and only PCXS and INVERS are run, which makes reprocessing with new ground pressure data or another atmospheric profile model much faster. Only sensor days with stored spectra are processed. Only available for Proffast 2.X, and the earlier job must have a different atmospheric profile model or output suffix than this job."
+                                            },
+                                            "batching": {
+                                                "anyOf": [
+                                                    {
+                                                        "additionalProperties": false,
+                                                        "properties": {
+                                                            "max_days": {
+                                                                "default": 7,
+                                                                "description": "Maximum number of days processed in one batch.",
+                                                                "maximum": 31,
+                                                                "minimum": 2,
+                                                                "title": "Max Days",
+                                                                "type": "integer"
+                                                            },
+                                                            "max_ifg_count": {
+                                                                "anyOf": [
+                                                                    {
+                                                                        "minimum": 1,
+                                                                        "type": "integer"
+                                                                    },
+                                                                    {
+                                                                        "type": "null"
+                                                                    }
+                                                                ],
+                                                                "default": null,
+                                                                "description": "Maximum number of interferograms processed in one batch. A day with more interferograms than this is processed on its own. If not set, the batches are only limited by `max_days`.",
+                                                                "title": "Max Ifg Count"
+                                                            }
+                                                        },
+                                                        "title": "RetrievalJobSettingsBatchingConfig",
+                                                        "type": "object"
+                                                    },
+                                                    {
+                                                        "type": "null"
+                                                    }
+                                                ],
+                                                "default": null,
+                                                "description": "If set, consecutive days of the same sensor with the same location and metadata are retrieved together in one container, i.e. with a single run of the Proffast Pylot. This saves the fixed costs of each retrieval session (creating the container, starting the Pylot, moving the outputs) for every day but the first. The outputs are split up again afterwards, so every day still gets its own `successful/YYYYMMDD` or `failed/YYYYMMDD` directory. The rows of the combined output csv are assigned to the days by the date in the name of their spectrum. Days whose inputs are incomplete are left out of the batch and stay unprocessed. Batches do not use the spectra cache. Only available for Proffast 2.X, and not together with `use_local_pressure_in_pcxs` or `reprocess_from_spectra`."
                                             }
                                         },
                                         "title": "RetrievalJobSettingsConfig",
@@ -634,8 +957,12 @@ const CONFIG_SCHEMA: any = {
                                             "dc_var_threshold": 0.1,
                                             "use_local_pressure_in_pcxs": false,
                                             "use_ifg_corruption_filter": true,
+                                            "use_ifg_prescreen": false,
+                                            "max_sza": null,
                                             "custom_ils": null,
-                                            "output_suffix": null
+                                            "output_suffix": null,
+                                            "reprocess_from_spectra": null,
+                                            "batching": null
                                         },
                                         "description": "Advanced settings that only apply to this retrieval job"
                                     }
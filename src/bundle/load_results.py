@@ -3,16 +3,15 @@ import datetime
 import os
 import polars as pl
 import tum_esm_utils
+from src import utils
 
 
-def load_results_directory(
+def _parse_about_file(
     d: str,
     sensor_id: str,
-    parse_dc_timeseries: bool = False,
-    retrieval_job_output_suffix: Optional[str] = None,
-) -> Optional[pl.DataFrame]:
-
-    # 1. PARSE ABOUT.JSON
+) -> tuple[datetime.datetime, datetime.datetime, str, datetime.datetime, Optional[str]]:
+    """Time span, location id, generation time and output suffix of a
+    results directory."""
 
     about_path = os.path.join(d, "about.json")
     about = tum_esm_utils.files.load_json_file(about_path)
@@ -52,6 +51,35 @@ def load_results_directory(
     except KeyError:
         pass
 
+    return from_datetime, to_datetime, location_id, retrieval_time, output_suffix
+
+
+def load_results_directory(
+    d: str,
+    sensor_id: str,
+    parse_dc_timeseries: bool = False,
+    retrieval_job_output_suffix: Optional[str] = None,
+    catalog_entry: Optional[utils.results_catalog.ResultsCatalogEntry] = None,
+) -> Optional[pl.DataFrame]:
+
+    # 1. PARSE ABOUT.JSON (UNLESS THE RESULTS CATALOG ALREADY KNOWS ITS CONTENT)
+
+    if (
+        (catalog_entry is not None) and (catalog_entry.from_datetime is not None) and
+        (catalog_entry.to_datetime is not None) and (catalog_entry.location_id is not None) and
+        (catalog_entry.generation_time is not None)
+    ):
+        assert sensor_id == catalog_entry.sensor_id
+        from_datetime = catalog_entry.from_datetime
+        to_datetime = catalog_entry.to_datetime
+        location_id = catalog_entry.location_id
+        retrieval_time = catalog_entry.generation_time
+        output_suffix = catalog_entry.output_suffix
+    else:
+        from_datetime, to_datetime, location_id, retrieval_time, output_suffix = _parse_about_file(
+            d, sensor_id
+        )
+
     if output_suffix != retrieval_job_output_suffix:
         return None
 
@@ -1,7 +1,6 @@
 from typing import Optional
 import datetime
 import os
-import re
 import sys
 import polars as pl
 import em27_metadata
@@ -59,63 +58,47 @@ def run(
                 for sensor_id in bundle_target.sensor_ids:
                     dfs: list[pl.DataFrame] = []
 
-                    d = os.path.join(
-                        config.general.data.results.root, retrieval_algorithm,
-                        atmospheric_profile_model, sensor_id, "successful"
+                    print(f"  Sensor {sensor_id}: looking for results in the results catalog")
+                    all_results = utils.results_catalog.get_results(
+                        config.general.data.results.root,
+                        retrieval_algorithm,
+                        atmospheric_profile_model,
+                        sensor_id,
+                        status="successful",
                     )
-                    print(f"  Sensor {sensor_id}: looking for files in {d}")
-
-                    results_pattern = re.compile(r"^\d{8}(_\d{8}_\d{8})?(_.+)?$")
-
-                    all_results = [
-                        r for r in os.listdir(d)
-                        if os.path.isdir(os.path.join(d, r)) and results_pattern.match(r)
-                    ]
                     print(f"    Found {len(all_results)} results directories")
 
-                    if bundle_target.retrieval_job_output_suffix is None:
-                        results_pattern_without_suffix = re.compile(r"^\d{8}(_\d{8}_\d{8})?$")
-                        matching_results = [
-                            r for r in all_results if results_pattern_without_suffix.match(r)
-                        ]
-                        print(
-                            f"    Found {len(matching_results)} results directories with output suffix `None`"
-                        )
-                    else:
-                        results_pattern_with_suffix = re.compile(r"^\d{8}(_\d{8}_\d{8})?(_.+)$")
-                        matching_results = [
-                            r for r in all_results if results_pattern_with_suffix.match(r) and
-                            r.endswith(bundle_target.retrieval_job_output_suffix)
-                        ]
-                        print(
-                            f"    Found {len(matching_results)} results directories matching the output suffix"
-                        )
+                    matching_results = [
+                        r for r in all_results
+                        if r.output_suffix == bundle_target.retrieval_job_output_suffix
+                    ]
+                    print(
+                        f"    Found {len(matching_results)} results directories matching the output suffix"
+                    )
 
-                    timed_results: list[str] = [
-                        r for r in matching_results if ((
-                            bundle_target.from_datetime.date() <=
-                            datetime.datetime.strptime(r[: 8], "%Y%m%d").date()
-                        ) and (
-                            datetime.datetime.strptime(r[: 8], "%Y%m%d").date() <=
+                    timed_results = [
+                        r for r in matching_results if (
+                            bundle_target.from_datetime.date() <= r.date <=
                             bundle_target.to_datetime.date()
-                        ))
+                        )
                     ]
                     print(
                         f"    Found {len(timed_results)} results directories matching the time range"
                     )
 
-                    progress = tqdm.tqdm(sorted(timed_results), dynamic_ncols=True, desc="    ...")
+                    progress = tqdm.tqdm(timed_results, dynamic_ncols=True, desc="    ...")
                     for result in progress:
-                        progress.desc = f"    {result}"
+                        progress.desc = f"    {result.output_slug}"
                         progress.refresh()
                         df = load_results_directory(
-                            os.path.join(d, result),
+                            result.directory,
                             sensor_id,
                             parse_dc_timeseries=(
                                 bundle_target.parse_dc_timeseries and
                                 (retrieval_algorithm == "proffast-2.4")
                             ),
                             retrieval_job_output_suffix=bundle_target.retrieval_job_output_suffix,
+                            catalog_entry=result,
                         )
                         if df is not None:
                             dfs.append(df)
@@ -1 +1,11 @@
-from . import main, generate_queries, upload_logic, download_logic, cache, std_site_logic
+from . import (
+    connection_pool,
+    listing_cache,
+    main,
+    generate_queries,
+    upload_logic,
+    download_logic,
+    cache,
+    std_site_logic,
+    daemon,
+)
@@ -0,0 +1,198 @@
+from __future__ import annotations
+from typing import Any, BinaryIO, Callable, Generator, Optional, TypeVar
+import contextlib
+import ftplib
+import io
+import queue
+import threading
+import time
+
+CCYCLE_FTP_HOST = "ccycle.gps.caltech.edu"
+
+T = TypeVar("T")
+
+
+class _CountingReader(io.RawIOBase):
+    """Raw reader around a socket file that reports the number of
+    received bytes to a callback."""
+
+    def __init__(
+        self,
+        fileobj: BinaryIO,
+        on_bytes_received: Optional[Callable[[int], None]],
+    ) -> None:
+        self._fileobj = fileobj
+        self._on_bytes_received = on_bytes_received
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        chunk = self._fileobj.read(len(buffer))
+        buffer[: len(chunk)] = chunk
+        if (self._on_bytes_received is not None) and (len(chunk) > 0):
+            self._on_bytes_received(len(chunk))
+        return len(chunk)
+
+
+class FTPConnectionPool:
+    """A bounded pool of logged-in FTP connections to the ccycle server.
+
+    Connections are opened lazily, each one with its own login, and are
+    reused across downloads. A connection that raised an error is closed
+    and replaced by a fresh one on the next checkout. The pool can be
+    shared between threads."""
+
+    def __init__(
+        self,
+        email: str,
+        size: int = 1,
+        host: str = CCYCLE_FTP_HOST,
+        port: int = 21,
+        timeout: float = 60,
+        max_retries: int = 3,
+        retry_delay: float = 5,
+    ) -> None:
+        assert size >= 1, "pool size must be at least 1"
+        self.email = email
+        self.size = size
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._idle_connections: queue.LifoQueue[Optional[ftplib.FTP]] = queue.LifoQueue()
+        for _ in range(size):
+            self._idle_connections.put(None)
+        self._lock = threading.Lock()
+        self._open_connections: set[ftplib.FTP] = set()
+
+    def _connect(self) -> ftplib.FTP:
+        ftp = ftplib.FTP(timeout=self.timeout)
+        ftp.connect(host=self.host, port=self.port)
+        ftp.login(user="anonymous", passwd=self.email)
+        with self._lock:
+            self._open_connections.add(ftp)
+        return ftp
+
+    def _discard(self, ftp: ftplib.FTP) -> None:
+        with self._lock:
+            self._open_connections.discard(ftp)
+        try:
+            ftp.close()
+        except Exception:
+            pass
+
+    @contextlib.contextmanager
+    def connection(self) -> Generator[ftplib.FTP, None, None]:
+        """Check out a connection from the pool. Blocks until one of the
+        `size` slots is free. If the block raises, the connection is not
+        put back but replaced by a new one on the next checkout."""
+
+        ftp = self._idle_connections.get()
+        try:
+            if ftp is None:
+                ftp = self._connect()
+            yield ftp
+        except BaseException:
+            if ftp is not None:
+                self._discard(ftp)
+            ftp = None
+            raise
+        finally:
+            self._idle_connections.put(ftp)
+
+    def run(self, function: Callable[[ftplib.FTP], Any]) -> Any:
+        """Run `function` with a pooled connection. Retries up to
+        `max_retries` times on FTP/network errors, each time with a new
+        connection. Permanent errors (5xx replies) are not retried."""
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.connection() as ftp:
+                    return function(ftp)
+            except ftplib.error_perm:
+                raise
+            except ftplib.all_errors:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.retry_delay * (attempt + 1))
+
+    def nlst(self, path: str) -> list[str]:
+        """List a directory on the server. Some servers only return the
+        filenames, so the returned paths are always prefixed with `path`."""
+
+        result: list[str] = self.run(lambda ftp: ftp.nlst(path))
+        directory = path.rstrip("/")
+        return [f if ("/" in f) else f"{directory}/{f}" for f in result]
+
+    def download(
+        self,
+        path: str,
+        on_bytes_received: Optional[Callable[[int], None]] = None,
+    ) -> io.BytesIO:
+        """Download a file into memory. `on_bytes_received` is called with
+        the size of every received chunk, e.g. to update a progress bar.
+        The returned buffer is positioned at the start."""
+
+        def _download(ftp: ftplib.FTP) -> io.BytesIO:
+            buffer = io.BytesIO()
+
+            def _callback(chunk: bytes) -> None:
+                buffer.write(chunk)
+                if on_bytes_received is not None:
+                    on_bytes_received(len(chunk))
+
+            ftp.retrbinary(f"RETR {path}", _callback)
+            buffer.seek(0)
+            return buffer
+
+        result: io.BytesIO = self.run(_download)
+        return result
+
+    def stream(
+        self,
+        path: str,
+        consume: Callable[[BinaryIO], T],
+        on_bytes_received: Optional[Callable[[int], None]] = None,
+    ) -> T:
+        """Stream a file from the server into `consume` without holding it in
+        memory. `consume` receives a non-seekable binary stream and may be
+        called again on retries, so it should not publish any results before
+        it returns. Bytes left unread by `consume` are drained."""
+
+        def _stream(ftp: ftplib.FTP) -> T:
+            ftp.voidcmd("TYPE I")
+            with ftp.transfercmd(f"RETR {path}") as conn:
+                with conn.makefile("rb") as socket_file:
+                    with io.BufferedReader(
+                        _CountingReader(socket_file, on_bytes_received),
+                        buffer_size=io.DEFAULT_BUFFER_SIZE * 8,
+                    ) as reader:
+                        result = consume(reader)
+                        while reader.read(io.DEFAULT_BUFFER_SIZE * 8):
+                            pass
+            ftp.voidresp()
+            return result
+
+        result: T = self.run(_stream)
+        return result
+
+    def close(self) -> None:
+        """Close all open connections."""
+
+        with self._lock:
+            open_connections = list(self._open_connections)
+            self._open_connections.clear()
+        for ftp in open_connections:
+            try:
+                ftp.quit()
+            except Exception:
+                ftp.close()
+
+    def __enter__(self) -> FTPConnectionPool:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
@@ -0,0 +1,203 @@
+from typing import Optional
+import asyncio
+import datetime
+import ftplib
+import os
+import sys
+import time
+import traceback
+import em27_metadata
+import tum_esm_utils
+
+sys.path.append(tum_esm_utils.files.rel_to_abs_path("../.."))
+from src import types, profiles
+
+# the uploaded request files are parsed by a cron job every minute, so
+# there has to be at least a minute between two uploads
+_UPLOAD_INTERVAL = 65
+
+_METADATA_REFRESH_INTERVAL = datetime.timedelta(hours=1)
+_STD_SITES_INTERVAL = datetime.timedelta(hours=1)
+
+
+def _log(message: str) -> None:
+    print(f"{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}", flush=True)
+
+
+class _DaemonState:
+    """State shared between the request and the download loop. It is
+    only modified from the event loop thread, never from worker threads."""
+
+    def __init__(self, config: types.Config) -> None:
+        self.config = config
+        self.cache = profiles.cache.DownloadQueryCache.load()
+        self.em27_metadata_interface: Optional[em27_metadata.interfaces.EM27MetadataInterface
+                                              ] = None
+        self.metadata_load_time = datetime.datetime.min
+
+    async def get_em27_metadata_interface(
+        self
+    ) -> em27_metadata.interfaces.EM27MetadataInterface:
+        now = datetime.datetime.now()
+        if (self.em27_metadata_interface is None
+           ) or ((now - self.metadata_load_time) > _METADATA_REFRESH_INTERVAL):
+            self.em27_metadata_interface = await asyncio.to_thread(
+                profiles.generate_queries.load_em27_metadata_interface, self.config
+            )
+            self.metadata_load_time = now
+        return self.em27_metadata_interface
+
+
+async def _request_loop(
+    state: _DaemonState,
+    upload_pool: profiles.connection_pool.FTPConnectionPool,
+    poll_interval: float,
+) -> None:
+    """Upload one request at a time to the server, at most one every 65
+    seconds, while there are open slots on the server."""
+
+    config = state.config
+    assert config.profiles is not None
+    if config.profiles.scope is None:
+        _log("No scope defined, not requesting any on-demand data")
+        return
+
+    while True:
+        query_uploaded = False
+        try:
+            for model in config.profiles.scope.models:
+                active_queries = set(state.cache.get_active_queries(model))
+                if len(active_queries) >= config.profiles.server.max_parallel_requests:
+                    continue
+                download_queries = await asyncio.to_thread(
+                    profiles.generate_queries.generate_download_queries,
+                    config,
+                    model,
+                    await state.get_em27_metadata_interface(),
+                )
+                new_download_queries = [q for q in download_queries if q not in active_queries]
+                if len(new_download_queries) == 0:
+                    continue
+
+                query = new_download_queries[0]
+                _log(
+                    f"Requesting {model} data for {query} " +
+                    f"({len(new_download_queries) - 1} more queries outstanding)"
+                )
+                t1 = time.time()
+
+                def _upload(ftp: ftplib.FTP) -> None:
+                    profiles.upload_logic.upload_request(config, query, ftp, model)
+
+                # the pool reconnects and retries if the idle connection has timed out
+                await asyncio.to_thread(upload_pool.run, _upload)
+                state.cache.add_query(model, query)
+                state.cache.dump()
+                query_uploaded = True
+                await asyncio.sleep(max(_UPLOAD_INTERVAL - (time.time() - t1), 0))
+        except Exception:
+            _log(f"Error while requesting data:\n{traceback.format_exc()}")
+
+        if not query_uploaded:
+            await asyncio.sleep(poll_interval)
+
+
+async def _download_loop(
+    state: _DaemonState,
+    download_pool: profiles.connection_pool.FTPConnectionPool,
+    poll_interval: float,
+) -> None:
+    """Poll the server for finished requests and download them. Standard
+    site data is downloaded once per hour."""
+
+    config = state.config
+    assert config.profiles is not None
+    last_std_sites_download = datetime.datetime.min
+
+    while True:
+        try:
+            now = datetime.datetime.now()
+            if (len(config.profiles.GGG2020_standard_sites) > 0) and (
+                (now - last_std_sites_download) > _STD_SITES_INTERVAL
+            ):
+                _log("Downloading standard site data")
+                await asyncio.to_thread(
+                    profiles.std_site_logic.download_data, config, download_pool
+                )
+                last_std_sites_download = now
+
+            models = [] if (config.profiles.scope is None) else config.profiles.scope.models
+            for model in models:
+                active_queries = state.cache.get_active_queries(model)
+                if len(active_queries) == 0:
+                    continue
+                _log(f"Checking {len(active_queries)} active {model} queries")
+                fulfilled_queries = await asyncio.to_thread(
+                    profiles.download_logic.download_data,
+                    config,
+                    active_queries,
+                    download_pool,
+                    model,
+                    # the listing of finished jobs is always refreshed
+                    datetime.timedelta(0),
+                )
+                if len(fulfilled_queries) > 0:
+                    _log(f"Downloaded {len(fulfilled_queries)} {model} queries")
+                state.cache.remove_queries(model, fulfilled_queries)
+
+                timed_out_queries = state.cache.get_timed_out_queries(model)
+                if len(timed_out_queries) > 0:
+                    _log(
+                        f"{len(timed_out_queries)} {model} queries have been issued more " +
+                        "than 7 days ago but have not been fulfilled yet. They will be " +
+                        "re-requested: " + ", ".join(str(q) for q in timed_out_queries)
+                    )
+                    state.cache.remove_queries(model, timed_out_queries)
+                state.cache.dump()
+        except Exception:
+            _log(f"Error while downloading data:\n{traceback.format_exc()}")
+
+        await asyncio.sleep(poll_interval)
+
+
+async def _run(config: types.Config, poll_interval: float) -> None:
+    assert config.profiles is not None
+    state = _DaemonState(config)
+
+    with profiles.connection_pool.FTPConnectionPool(
+        email=config.profiles.server.email,
+        size=1,
+    ) as upload_pool, profiles.connection_pool.FTPConnectionPool(
+        email=config.profiles.server.email,
+        size=config.profiles.server.max_parallel_downloads,
+    ) as download_pool:
+        await asyncio.gather(
+            _request_loop(state, upload_pool, poll_interval),
+            _download_loop(state, download_pool, poll_interval),
+        )
+
+
+def run(poll_interval: float = 300) -> None:
+    """Run the profiles download as a long-running process. Requests are
+    uploaded as soon as the server accepts them (one every 65 seconds)
+    while finished requests are downloaded concurrently every
+    `poll_interval` seconds."""
+
+    config = types.Config.load()
+    assert config.profiles is not None, "No profiles config found"
+
+    for variant in ["GGG2014", "GGG2020"]:
+        os.makedirs(
+            os.path.join(config.general.data.atmospheric_profiles.root, variant), exist_ok=True
+        )
+
+    _log(f"Starting profiles daemon (polling every {poll_interval} seconds)")
+    try:
+        asyncio.run(_run(config, poll_interval))
+    except KeyboardInterrupt:
+        _log("Interrupted by user.")
+        exit(1)
+
+
+if __name__ == "__main__":
+    run()
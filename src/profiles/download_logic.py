@@ -1,71 +1,148 @@
-from typing import BinaryIO
-import tarfile
-import io
+from typing import BinaryIO, Optional
+import concurrent.futures
+import datetime
 import ftplib
+import os
+import shutil
+import tarfile
+import tempfile
 import rich.progress
-from src import types, utils
+from src import types, utils, profiles
 
 
 def download_data(
     config: types.Config,
     queries: list[types.DownloadQuery],
-    ftp: ftplib.FTP,
+    pool: profiles.connection_pool.FTPConnectionPool,
     atmospheric_profile_model: types.AtmosphericProfileModel,
+    listing_ttl: Optional[datetime.timedelta] = None,
 ) -> list[types.DownloadQuery]:
     """Downloads data from 'ccycle.gps.caltech.edu' and returns a list of
-    queries that were fulfilled."""
-
+    queries that were fulfilled. The tarballs are fetched concurrently
+    using all connections of the pool. `listing_ttl` overrides the
+    configured maximum age of the cached directory listings."""
+
+    assert config.profiles is not None
+    listing_cache = profiles.listing_cache.FTPListingCache.load()
+    if listing_ttl is None:
+        listing_ttl = datetime.timedelta(minutes=config.profiles.server.listing_cache_ttl)
     tarballs_on_server: list[str]
     if atmospheric_profile_model == "GGG2020":
-        tarballs_on_server = ftp.nlst("ginput-jobs")
+        tarballs_on_server = listing_cache.list_directory(pool, "ginput-jobs", listing_ttl)
     else:
-        tarballs_on_server = ftp.nlst("upload/modfiles/tar/maps"
-                                     ) + ftp.nlst("upload/modfiles/tar/mods")
+        tarballs_on_server = listing_cache.list_directory(
+            pool, "upload/modfiles/tar/maps", listing_ttl
+        ) + listing_cache.list_directory(pool, "upload/modfiles/tar/mods", listing_ttl)
+    tarball_index = profiles.listing_cache.TarballIndex(tarballs_on_server)
 
     # GGG2014: /upload/modfiles/tar/mods/mods_48N011E_20231211_20231217.tar
     # GGG2020: /ginput-jobs/job_000034641_tu_48.00N_12.00E_20221001-20221008.tgz
 
     fulfilled_queries: list[types.DownloadQuery] = []
+    tarballs_to_download: list[tuple[types.DownloadQuery, str]] = []
+
+    for query in queries:
+        query_tarballs = tarball_index.get_query_tarballs(query)
+        required_tarball_count = 1 if (atmospheric_profile_model == "GGG2020") else 2
+        if len(query_tarballs) >= required_tarball_count:
+            fulfilled_queries.append(query)
+        tarballs_to_download += [(query, t) for t in query_tarballs]
+
+    print(f"Found data for {len(fulfilled_queries)} out of {len(queries)} queries")
+    if len(tarballs_to_download) == 0:
+        return fulfilled_queries
+
+    failed_queries: set[types.DownloadQuery] = set()
+    completed_tarball_count = 0
+
+    with rich.progress.Progress(
+        rich.progress.TextColumn("[progress.description]{task.description}"),
+        rich.progress.TextColumn("{task.fields[tarballs]}"),
+        rich.progress.DownloadColumn(),
+        rich.progress.TransferSpeedColumn(),
+        rich.progress.TimeElapsedColumn(),
+    ) as progress:
+        task = progress.add_task(
+            f"Downloading ({pool.size} connection(s))",
+            total=None,
+            tarballs=f"0/{len(tarballs_to_download)} tarballs",
+        )
+
+        def _download_tarball(query: types.DownloadQuery, tarball: str) -> None:
+            pool.stream(
+                tarball,
+                lambda archive: extract_archive(
+                    config=config,
+                    archive=archive,
+                    lat=query.lat,
+                    lon=query.lon,
+                    atmospheric_profile_model=atmospheric_profile_model,
+                ),
+                on_bytes_received=lambda n: progress.advance(task, n),
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=pool.size) as executor:
+            futures = {
+                executor.submit(_download_tarball, query, tarball): (query, tarball)
+                for query, tarball in tarballs_to_download
+            }
+            for future in concurrent.futures.as_completed(futures):
+                query, tarball = futures[future]
+                try:
+                    future.result()
+                except ftplib.all_errors + (tarfile.TarError, ) as e:
+                    progress.print(f"Could not download {tarball}: {e}")
+                    failed_queries.add(query)
+                completed_tarball_count += 1
+                progress.update(
+                    task,
+                    tarballs=f"{completed_tarball_count}/{len(tarballs_to_download)} tarballs",
+                )
+
+    # queries with failed downloads are not considered fulfilled so
+    # that they are downloaded again during the next run
+    return [q for q in fulfilled_queries if q not in failed_queries]
+
+
+def get_file_types(
+    config: types.Config,
+    atmospheric_profile_model: types.AtmosphericProfileModel,
+) -> list[str]:
+    """Returns the file types that are extracted from the tarballs of the
+    given model, i.e. the ones that have to exist for a downloaded day."""
+
+    assert config.profiles is not None
+    model_file_types = ["map", "mod", "vmr"]
+    if atmospheric_profile_model == "GGG2014":
+        model_file_types = ["map", "mod"]
+    return [t for t in model_file_types if t in config.profiles.file_types]
 
-    with rich.progress.Progress() as progress:
-        for query in progress.track(queries, description=f"Downloading ..."):
-            progress.print(f"Downloading {query}")
-
-            cs_verbose = utils.text.get_coordinates_slug(query.lat, query.lon, verbose=True)
-            cs_nonverbose = utils.text.get_coordinates_slug(query.lat, query.lon, verbose=False)
-            ds = query.from_date.strftime("%Y%m%d")
-            tarballs_to_download = [
-                t for t in tarballs_on_server
-                if ((f"{cs_verbose}_{ds}" in t) or (f"{cs_nonverbose}_{ds}" in t))
-            ]
-            if atmospheric_profile_model == "GGG2020":
-                if len(tarballs_to_download) >= 1:
-                    fulfilled_queries.append(query)
-                    progress.print(f"Found!")
-                else:
-                    progress.print(f"Not found!")
-            else:
-                if len(tarballs_to_download) >= 2:
-                    fulfilled_queries.append(query)
-                    progress.print(f"Found!")
-                else:
-                    progress.print(f"Not found!")
-            for t in tarballs_to_download:
-                with io.BytesIO() as archive:
-                    ftp.retrbinary(
-                        f"RETR {t}",
-                        archive.write,
-                    )
-                    archive.seek(0)
-                    extract_archive(
-                        config=config,
-                        archive=archive,
-                        lat=query.lat,
-                        lon=query.lon,
-                        atmospheric_profile_model=atmospheric_profile_model,
-                    )
-
-    return fulfilled_queries
+
+def _get_destination_filename(
+    name: str,
+    coordinates_slug: str,
+    atmospheric_profile_model: types.AtmosphericProfileModel,
+) -> str:
+    """Returns the name under which an archive member is stored."""
+
+    extension = name.split(".")[-1]
+    if atmospheric_profile_model == "GGG2020":
+        basename = name.split("/")[-1]
+        if extension == "map":
+            timestamp = basename.split("_")[-1][: 10]
+        else:
+            timestamp = basename.split("_")[1][: 10]
+        # 2022010100_48N011E.map
+        # 2022010103_48N011E.map
+        # 20220101??_48N011E.map
+        return f"{timestamp}_{coordinates_slug}.{extension}"
+    else:
+        if extension == "map":
+            date = name[2 : 10]
+        else:
+            date = name[5 : 13]
+        # 20220101_48N011E.map
+        return f"{date}_{coordinates_slug}.{extension}"
 
 
 def extract_archive(
@@ -75,43 +152,41 @@ def extract_archive(
     lon: float,
     atmospheric_profile_model: types.AtmosphericProfileModel,
 ) -> None:
-    """Extracts, renames and stores archive members."""
-
-    dst_path = f"{config.general.data.atmospheric_profiles.root}/{atmospheric_profile_model}"
-    with tarfile.open(fileobj=archive) as tar:
-        for member in tar:
-            name = member.name
-
-            if not name.endswith((".map", ".mod", ".vmr")):
-                # Skip (sub-)directories
-                continue
-
-            cs = utils.text.get_coordinates_slug(lat, lon)
-
-            if atmospheric_profile_model == "GGG2020":
-                basename = name.split("/")[-1]
-                extension = basename.split(".")[-1]
-                assert extension in ["map", "mod", "vmr"], f"Unexpected extension: {extension}"
-                if extension == "map":
-                    date = basename.split("_")[-1][: 8]
-                    hour = basename.split("_")[-1][8 : 10]
-                elif extension == "mod":
-                    date = basename.split("_")[1][: 8]
-                    hour = basename.split("_")[1][8 : 10]
-                elif extension == "vmr":
-                    date = basename.split("_")[1][: 8]
-                    hour = basename.split("_")[1][8 : 10]
-                member.name = f"{date}{hour}_{cs}.{extension}"
-                # 2022010100_48N011E.map
-                # 2022010103_48N011E.map
-                # 20220101??_48N011E.map
-
-            else:
-                if name.endswith(".map"):
-                    date, type_ = name[2 : 10], "map"
-                elif name.endswith(".mod"):
-                    date, type_ = name[5 : 13], "mod"
-                member.name = f"{date}_{cs}.{type_}"
-                # 20220101_48N011E.map
-
-            tar.extract(member, dst_path)
+    """Extracts, renames and stores archive members. The archive is read as
+    a stream, so `archive` does not have to be seekable. Only members of
+    the configured file types are extracted. They are written to a
+    temporary directory first and only moved into the profiles directory
+    (or added to the packed archives, see `config.profiles.storage_format`)
+    once the whole archive has been read, so partially extracted archives
+    are never visible."""
+
+    assert config.profiles is not None
+
+    dst_path = os.path.join(
+        config.general.data.atmospheric_profiles.root, atmospheric_profile_model
+    )
+    file_types = tuple(f".{t}" for t in get_file_types(config, atmospheric_profile_model))
+    cs = utils.text.get_coordinates_slug(lat, lon)
+
+    with tempfile.TemporaryDirectory(dir=dst_path, prefix=".extracting-") as tmp_path:
+        filenames: list[str] = []
+        with tarfile.open(fileobj=archive, mode="r|*") as tar:
+            for member in tar:
+                # skip (sub-)directories and unused file types
+                if (not member.isfile()) or (not member.name.endswith(file_types)):
+                    continue
+
+                filename = _get_destination_filename(member.name, cs, atmospheric_profile_model)
+                member_file = tar.extractfile(member)
+                assert member_file is not None
+                with open(os.path.join(tmp_path, filename), "wb") as f:
+                    shutil.copyfileobj(member_file, f)
+                filenames.append(filename)
+
+        if config.profiles.storage_format == "packed":
+            utils.profile_store.pack_files(
+                dst_path, [os.path.join(tmp_path, filename) for filename in filenames]
+            )
+        else:
+            for filename in filenames:
+                os.replace(os.path.join(tmp_path, filename), os.path.join(dst_path, filename))
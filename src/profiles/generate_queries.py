@@ -1,15 +1,14 @@
 from __future__ import annotations
 from typing import Optional
-import copy
+import bisect
 import os
-import re
 import em27_metadata
 import pydantic
 import datetime
-
-import tum_esm_utils
 from src import types, utils
+from src.utils.date_intervals import DateIntervalSet
 from .cache import DownloadQueryCache
+from .download_logic import get_file_types
 
 
 class ProfilesQueryTimePeriod(pydantic.BaseModel):
@@ -28,64 +27,39 @@ class ProfilesQueryLocation(pydantic.BaseModel):
 def list_downloaded_data(
     config: types.Config,
     atmospheric_profile_model: types.AtmosphericProfileModel,
-) -> dict[ProfilesQueryLocation, set[datetime.date]]:
+) -> dict[ProfilesQueryLocation, DateIntervalSet]:
 
     assert config.profiles is not None
     assert config.profiles.scope is not None
-    downloaded_data: dict[ProfilesQueryLocation, set[datetime.date]] = {}
-
-    r = re.compile(r"^\d{8,10}_\d{2}(N|S)\d{3}(E|W)\.(map|mod|vmr)$")
-    filenames: set[str] = set([
-        f for f in os.listdir(
-            os.path.join(config.general.data.atmospheric_profiles.root, atmospheric_profile_model)
-        ) if r.match(f)
-    ])
-    dates: set[datetime.date] = set([
-        d for d in [
-            datetime.date(
-                year=int(f[0 : 4]),
-                month=int(f[4 : 6]),
-                day=int(f[6 : 8]),
-            ) for f in filenames
-        ] if ((config.profiles.scope.from_date <= d) and (d <= config.profiles.scope.to_date))
-    ])
-    locations: set[ProfilesQueryLocation] = set([
-        ProfilesQueryLocation(
-            lat=int(f.split("_")[1][0 : 2]) * (-1 if f.split("_")[1][2] == "S" else 1),
-            lon=int(f.split("_")[1][3 : 6]) * (-1 if f.split("_")[1][6] == "W" else 1),
-        ) for f in filenames
-    ])
-
-    required_prefixes: list[str]
-    required_extensions: list[str]
-    if atmospheric_profile_model == "GGG2014":
-        required_prefixes = ["%Y%m%d"]
-        required_extensions = ["map", "mod"]
-    else:
-        required_prefixes = [f"%Y%m%d{h:02d}" for h in range(0, 24, 3)]
-        required_extensions = ["map", "mod", "vmr"]
-
-    for l in locations:
-        cs = utils.text.get_coordinates_slug(lat=l.lat, lon=l.lon)
-        for d in dates:
-            expected_filenames = set([
-                f"{d.strftime(p)}_{cs}.{e}" for e in required_extensions for p in required_prefixes
-            ])
-            if expected_filenames.issubset(filenames):
-                if l not in downloaded_data.keys():
-                    downloaded_data[l] = set()
-                downloaded_data[l].add(d)
+    downloaded_data: dict[ProfilesQueryLocation, DateIntervalSet] = {}
+
+    index = utils.profile_store.get_profile_store_index(
+        config.general.data.atmospheric_profiles.root, atmospheric_profile_model
+    )
+    scope = DateIntervalSet.from_range(
+        config.profiles.scope.from_date, config.profiles.scope.to_date
+    )
+    required_file_types = get_file_types(config, atmospheric_profile_model)
+
+    for cs in index.get_slugs():
+        dates = index.get_dates(cs, required_file_types) & scope
+        if dates:
+            l = ProfilesQueryLocation(
+                lat=int(cs[0 : 2]) * (-1 if cs[2] == "S" else 1),
+                lon=int(cs[3 : 6]) * (-1 if cs[6] == "W" else 1),
+            )
+            downloaded_data[l] = dates
 
     return downloaded_data
 
 
 def list_desired_data(
     config: types.Config, em27_metadata_interface: em27_metadata.interfaces.EM27MetadataInterface
-) -> dict[ProfilesQueryLocation, set[datetime.date]]:
+) -> dict[ProfilesQueryLocation, DateIntervalSet]:
 
     assert config.profiles is not None
     assert config.profiles.scope is not None
-    requested_data: dict[ProfilesQueryLocation, set[datetime.date]] = {}
+    requested_data: dict[ProfilesQueryLocation, DateIntervalSet] = {}
 
     for sensor in em27_metadata_interface.sensors.root:
         for sensor_setup in sensor.setups:
@@ -101,7 +75,7 @@ def list_desired_data(
 
             l = ProfilesQueryLocation(lat=round(location.lat), lon=round(location.lon))
             if l not in requested_data.keys():
-                requested_data[l] = set()
+                requested_data[l] = DateIntervalSet()
 
             from_date = max(
                 config.profiles.scope.from_date,
@@ -113,89 +87,223 @@ def list_desired_data(
                 (datetime.datetime.now(datetime.timezone.utc) -
                  datetime.timedelta(hours=36)).date(),
             )
-            if from_date <= to_date:
-                requested_data[l].update(
-                    tum_esm_utils.timing.date_range(from_date=from_date, to_date=to_date)
-                )
+            requested_data[l] |= DateIntervalSet.from_range(from_date, to_date)
 
     return requested_data
 
 
 def compute_missing_data(
-    desired_data: dict[ProfilesQueryLocation, set[datetime.date]],
-    downloaded_data: dict[ProfilesQueryLocation, set[datetime.date]],
-) -> dict[ProfilesQueryLocation, set[datetime.date]]:
+    desired_data: dict[ProfilesQueryLocation, DateIntervalSet],
+    downloaded_data: dict[ProfilesQueryLocation, DateIntervalSet],
+) -> dict[ProfilesQueryLocation, DateIntervalSet]:
 
-    missing_data: dict[ProfilesQueryLocation, set[datetime.date]] = {}
+    missing_data: dict[ProfilesQueryLocation, DateIntervalSet] = {}
 
     for l in desired_data.keys():
         if l not in downloaded_data.keys():
             missing_data[l] = desired_data[l]
         else:
-            missing_data[l] = set(desired_data[l]).difference(downloaded_data[l])
+            missing_data[l] = desired_data[l] - downloaded_data[l]
 
     return missing_data
 
 
 def remove_already_requested_data(
-    missing_data: dict[ProfilesQueryLocation, set[datetime.date]],
+    missing_data: dict[ProfilesQueryLocation, DateIntervalSet],
     atmospheric_profile_model: types.AtmosphericProfileModel,
-) -> dict[ProfilesQueryLocation, set[datetime.date]]:
+) -> dict[ProfilesQueryLocation, DateIntervalSet]:
     cache = DownloadQueryCache.load()
     active_queries = cache.get_active_queries(atmospheric_profile_model)
+    already_requested_data: dict[ProfilesQueryLocation, list[tuple[int, int]]] = {}
+    for q in active_queries:
+        already_requested_data.setdefault(ProfilesQueryLocation(lat=q.lat, lon=q.lon), []).append(
+            (q.from_date.toordinal(), q.to_date.toordinal())
+        )
     for l in list(missing_data.keys()):
-        already_requested_dates: set[datetime.date] = set()
-        for q in active_queries:
-            if q.lat == l.lat and q.lon == l.lon:
-                already_requested_dates.update(
-                    tum_esm_utils.timing.date_range(from_date=q.from_date, to_date=q.to_date)
-                )
-        missing_data[l].difference_update(already_requested_dates)
-        if len(missing_data[l]) == 0:
+        if l in already_requested_data:
+            missing_data[l] -= DateIntervalSet(already_requested_data[l])
+        if not missing_data[l]:
             missing_data.pop(l)
     return missing_data
 
 
 def remove_std_site_data(
     config: types.Config,
-    missing_data: dict[ProfilesQueryLocation, set[datetime.date]],
-) -> dict[ProfilesQueryLocation, set[datetime.date]]:
+    missing_data: dict[ProfilesQueryLocation, DateIntervalSet],
+) -> dict[ProfilesQueryLocation, DateIntervalSet]:
     assert config.profiles is not None
-    filtered_data: dict[ProfilesQueryLocation, set[datetime.date]] = copy.deepcopy(missing_data)
+    filtered_data: dict[ProfilesQueryLocation, DateIntervalSet] = dict(missing_data)
     for std_site_config in config.profiles.GGG2020_standard_sites:
         location = ProfilesQueryLocation(
             lat=round(std_site_config.lat),
             lon=round(std_site_config.lon),
         )
         if location in filtered_data.keys():
-            filtered_data[location].difference_update(
-                tum_esm_utils.timing.date_range(
-                    from_date=std_site_config.from_date,
-                    to_date=std_site_config.to_date,
-                )
+            filtered_data[location] -= DateIntervalSet.from_range(
+                std_site_config.from_date,
+                std_site_config.to_date,
             )
-            if len(filtered_data[location]) == 0:
+            if not filtered_data[location]:
                 filtered_data.pop(location)
     return filtered_data
 
 
-def compute_time_periods(missing_data: set[datetime.date]) -> list[ProfilesQueryTimePeriod]:
-    mondays = set([d - datetime.timedelta(days=d.weekday()) for d in missing_data])
+def compute_time_periods(
+    missing_data: DateIntervalSet,
+    max_query_length: int = 7,
+) -> list[ProfilesQueryTimePeriod]:
+    """Cover the missing dates with as few time periods as possible.
+    Each period spans at most `max_query_length` days and starts and ends
+    on a missing date. Gaps shorter than the query length are included in
+    the period, i.e. a few downloaded days may be requested again."""
+
     time_periods: list[ProfilesQueryTimePeriod] = []
-    for d in mondays:
-        dates = set([d + datetime.timedelta(days=i)
-                     for i in range(0, 7)]).intersection(missing_data)
-        time_periods.append(ProfilesQueryTimePeriod(from_date=min(dates), to_date=max(dates)))
+    ranges = missing_data.ranges
+    i = 0
+    start = ranges[0][0] if len(ranges) > 0 else 0
+    while i < len(ranges):
+        # greedily extend the period as far as the query length allows
+        period_end = start + max_query_length - 1
+        while (i + 1 < len(ranges)) and (ranges[i][1] < period_end) and (
+            ranges[i + 1][0] <= period_end
+        ):
+            i += 1
+        to_ordinal = min(ranges[i][1], period_end)
+        time_periods.append(
+            ProfilesQueryTimePeriod(
+                from_date=datetime.date.fromordinal(start),
+                to_date=datetime.date.fromordinal(to_ordinal),
+            )
+        )
+        if to_ordinal < ranges[i][1]:
+            start = to_ordinal + 1
+        else:
+            i += 1
+            if i < len(ranges):
+                start = ranges[i][0]
     return time_periods
 
 
+def list_retrieval_demand(
+    config: types.Config,
+    atmospheric_profile_model: types.AtmosphericProfileModel,
+    em27_metadata_interface: em27_metadata.interfaces.EM27MetadataInterface,
+) -> dict[ProfilesQueryLocation, list[int]]:
+    """For each location, the sorted day ordinals of the retrievals that
+    wait for atmospheric profiles of the given model. A day appears once
+    per waiting sensor data context.
+
+    This is a cheap approximation of the retrieval queue: it only lists
+    the interferogram directories and queries the results catalog and the
+    profile store index. Ground pressure files, locked interferograms and
+    jobs reprocessing stored spectra are not considered."""
+
+    demand: dict[ProfilesQueryLocation, list[int]] = {}
+    if config.retrieval is None:
+        return demand
+
+    profile_store_index = utils.profile_store.get_profile_store_index(
+        config.general.data.atmospheric_profiles.root, atmospheric_profile_model
+    )
+    for job in config.retrieval.jobs:
+        if (job.atmospheric_profile_model !=
+                atmospheric_profile_model) or (job.settings.reprocess_from_spectra is not None):
+            continue
+        for sensor_id in job.sensor_ids:
+            ifg_directory = os.path.join(config.general.data.interferograms.root, sensor_id)
+            if not os.path.isdir(ifg_directory):
+                continue
+            dates_with_interferograms: list[datetime.date] = []
+            for name in os.listdir(ifg_directory):
+                try:
+                    date = datetime.datetime.strptime(name, "%Y%m%d").date()
+                except ValueError:
+                    continue
+                if job.from_date <= date <= job.to_date:
+                    dates_with_interferograms.append(date)
+            if len(dates_with_interferograms) == 0:
+                continue
+
+            existing_results = utils.results_catalog.get_results_by_slug(
+                config.general.data.results.root,
+                job.retrieval_algorithm,
+                atmospheric_profile_model,
+                sensor_id,
+            )
+            for date in dates_with_interferograms:
+                utc = datetime.timezone.utc
+                for sdc in em27_metadata_interface.get(
+                    sensor_id,
+                    datetime.datetime.combine(date, datetime.time.min, tzinfo=utc),
+                    datetime.datetime.combine(date, datetime.time.max, tzinfo=utc),
+                ):
+                    if utils.functions.get_output_slug(
+                        sdc, job.settings.output_suffix
+                    ) in existing_results:
+                        continue
+                    cs = utils.text.get_coordinates_slug(
+                        sdc.atmospheric_profile_location.lat, sdc.atmospheric_profile_location.lon
+                    )
+                    if profile_store_index.has_date(cs, date):
+                        continue
+                    l = ProfilesQueryLocation(
+                        lat=round(sdc.atmospheric_profile_location.lat),
+                        lon=round(sdc.atmospheric_profile_location.lon),
+                    )
+                    demand.setdefault(l, []).append(date.toordinal())
+
+    for ordinals in demand.values():
+        ordinals.sort()
+    return demand
+
+
+def rank_download_queries(
+    queries: list[types.DownloadQuery],
+    demand: dict[ProfilesQueryLocation, list[int]],
+) -> list[types.DownloadQuery]:
+    """Sort the queries by the number of queued retrieval days they would
+    unblock (see `list_retrieval_demand`). Queries with the same number
+    are sorted by date, latest first."""
+
+    def _unblocked_days(q: types.DownloadQuery) -> int:
+        ordinals = demand.get(ProfilesQueryLocation(lat=q.lat, lon=q.lon), [])
+        return bisect.bisect_right(ordinals, q.to_date.toordinal()
+                                  ) - bisect.bisect_left(ordinals, q.from_date.toordinal())
+
+    return sorted(
+        sorted(queries, key=lambda q: q.from_date, reverse=True),
+        key=_unblocked_days,
+        reverse=True,
+    )
+
+
+def load_em27_metadata_interface(
+    config: types.Config
+) -> em27_metadata.interfaces.EM27MetadataInterface:
+    """Load the local metadata or fetch it from GitHub if there is none."""
+
+    em27_metadata_interface = utils.metadata.load_local_em27_metadata_interface()
+    if em27_metadata_interface is not None:
+        print("Found local metadata")
+    else:
+        print("Did not find local metadata -> fetching metadata from GitHub")
+        assert config.general.metadata is not None, "Remote metadata not configured"
+        em27_metadata_interface = em27_metadata.load_from_github(
+            github_repository=config.general.metadata.github_repository,
+            access_token=config.general.metadata.access_token,
+        )
+        print("Successfully fetched metadata from GitHub")
+    return em27_metadata_interface
+
+
 def generate_download_queries(
     config: types.Config,
     atmospheric_profile_model: types.AtmosphericProfileModel,
     em27_metadata_interface: Optional[em27_metadata.interfaces.EM27MetadataInterface] = None,
 ) -> list[types.DownloadQuery]:
     """Returns a list of `DownloadQuery` objects for which the
-    data has not been downloaded yet. Example:
+    data has not been downloaded yet. The queries that unblock the most
+    queued retrievals come first. Example:
 
     ```python
     [
@@ -207,17 +315,7 @@ def generate_download_queries(
     assert config.profiles is not None
 
     if em27_metadata_interface is None:
-        em27_metadata_interface = utils.metadata.load_local_em27_metadata_interface()
-        if em27_metadata_interface is not None:
-            print("Found local metadata")
-        else:
-            print("Did not find local metadata -> fetching metadata from GitHub")
-            assert config.general.metadata is not None, "Remote metadata not configured"
-            em27_metadata_interface = em27_metadata.load_from_github(
-                github_repository=config.general.metadata.github_repository,
-                access_token=config.general.metadata.access_token,
-            )
-            print("Successfully fetched metadata from GitHub")
+        em27_metadata_interface = load_em27_metadata_interface(config)
 
     missing_data = compute_missing_data(
         desired_data=list_desired_data(
@@ -246,7 +344,13 @@ def generate_download_queries(
                 lon=l.lon,
                 from_date=tp.from_date,
                 to_date=tp.to_date,
-            ) for tp in compute_time_periods(dates)
+            ) for tp in compute_time_periods(dates, config.profiles.server.max_query_length)
         ])
 
-    return sorted(download_queries, key=lambda q: q.from_date, reverse=True)
+    # ranking is only an optimisation, so it must never block the requests
+    try:
+        demand = list_retrieval_demand(config, atmospheric_profile_model, em27_metadata_interface)
+    except Exception as e:
+        print(f"Could not determine the retrieval demand, requests are sorted by date: {e}")
+        demand = {}
+    return rank_download_queries(download_queries, demand)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+import datetime
+import os
+import re
+import filelock
+import pydantic
+import tum_esm_utils
+from src import types, utils
+from .connection_pool import FTPConnectionPool
+
+_CACHE_FILE = tum_esm_utils.files.rel_to_abs_path("../../data/profiles_listing_cache.json")
+
+# no listing is reused for longer than the maximum `listing_cache_ttl`
+_MAX_LISTING_AGE = datetime.timedelta(minutes=1440)
+
+# GGG2014: mods_48N011E_20231211_20231217.tar
+# GGG2020: job_000034641_tu_48.00N_12.00E_20221001-20221008.tgz
+_TARBALL_PATTERN = re.compile(
+    r"_(\d+\.\d{2}[NS]_\d+\.\d{2}[EW]|\d{2}[NS]\d{3}[EW])_(\d{8})(?=[_\-.])"
+)
+
+# GGG2020 standard sites: xx_ggg2020_20221001.tgz
+_STD_SITE_TARBALL_PATTERN = re.compile(r"(\d{8})\.tgz$")
+
+
+class FTPDirectoryListing(pydantic.BaseModel):
+    listing_time: datetime.datetime
+    paths: list[str]
+
+
+class FTPListingCache(pydantic.RootModel[dict[str, FTPDirectoryListing]]):
+    """Directory listings of the ccycle server keyed by `host:port/directory`.
+    Listing `ginput-jobs` takes a while because it contains the tarballs of
+    all users, so listings are reused until they are older than the TTL."""
+
+    root: dict[str, FTPDirectoryListing]
+
+    @staticmethod
+    def with_filelock() -> filelock.FileLock:
+        return filelock.FileLock(_CACHE_FILE + ".lock", timeout=15)
+
+    @staticmethod
+    def load() -> FTPListingCache:
+        """Load the cache from disk."""
+
+        try:
+            with open(_CACHE_FILE, "r") as f:
+                return FTPListingCache.model_validate_json(f.read())
+        except (FileNotFoundError, pydantic.ValidationError):
+            return FTPListingCache(root={})
+
+    def dump(self) -> None:
+        """Save the cache to disk. Listings older than the maximum TTL
+        are dropped, so listings of servers and directories that are no
+        longer used do not pile up."""
+
+        now = datetime.datetime.now()
+        self.root = {
+            key: listing
+            for key, listing in self.root.items() if (now - listing.listing_time) < _MAX_LISTING_AGE
+        }
+        tmp_file = f"{_CACHE_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(self.model_dump_json())
+        os.replace(tmp_file, _CACHE_FILE)
+
+    def list_directory(
+        self,
+        pool: FTPConnectionPool,
+        directory: str,
+        ttl: datetime.timedelta,
+    ) -> list[str]:
+        """Return the paths in a directory on the server. The directory is
+        only listed again if the cached listing is older than `ttl`. New
+        listings are merged into the latest cache on disk, which drops
+        all other listings older than `ttl`."""
+
+        key = f"{pool.host}:{pool.port}/{directory}"
+        now = datetime.datetime.now()
+        listing = self.root.get(key)
+        if (listing is None) or ((now - listing.listing_time) >= ttl):
+            listing = FTPDirectoryListing(listing_time=now, paths=pool.nlst(directory))
+            self.root[key] = listing
+            with FTPListingCache.with_filelock():
+                latest_cache = FTPListingCache.load()
+                latest_cache.root = {
+                    k: l
+                    for k, l in latest_cache.root.items() if (now - l.listing_time) < ttl
+                }
+                latest_cache.root[key] = listing
+                latest_cache.dump()
+        return listing.paths
+
+    def invalidate(self, pool: FTPConnectionPool, directory: str) -> None:
+        """Remove a directory listing from the cache."""
+
+        key = f"{pool.host}:{pool.port}/{directory}"
+        self.root.pop(key, None)
+        with FTPListingCache.with_filelock():
+            latest_cache = FTPListingCache.load()
+            if latest_cache.root.pop(key, None) is not None:
+                latest_cache.dump()
+
+
+class TarballIndex:
+    """Index of tarball paths by `(coordinates slug, start date)`. Both the
+    verbose (`48.00N_11.00E`) and the compact (`48N011E`) slugs are
+    indexed as they are found in the filenames."""
+
+    def __init__(self, paths: list[str]) -> None:
+        self.index: dict[tuple[str, str], list[str]] = {}
+        for path in paths:
+            match = _TARBALL_PATTERN.search(path.split("/")[-1])
+            if match is not None:
+                self.index.setdefault((match.group(1), match.group(2)), []).append(path)
+
+    def get_query_tarballs(self, query: types.DownloadQuery) -> list[str]:
+        """Return all tarballs for a given query."""
+
+        ds = query.from_date.strftime("%Y%m%d")
+        tarballs: list[str] = []
+        for verbose in [True, False]:
+            cs = utils.text.get_coordinates_slug(query.lat, query.lon, verbose=verbose)
+            tarballs += self.index.get((cs, ds), [])
+        return tarballs
+
+
+def index_std_site_tarballs(paths: list[str]) -> dict[datetime.date, str]:
+    """Index the tarballs of a standard site by their date."""
+
+    index: dict[datetime.date, str] = {}
+    for path in paths:
+        match = _STD_SITE_TARBALL_PATTERN.search(path)
+        if match is not None:
+            try:
+                date = datetime.datetime.strptime(match.group(1), "%Y%m%d").date()
+            except ValueError:
+                continue
+            index.setdefault(date, path)
+    return index
@@ -1,7 +1,6 @@
 import os
 import sys
 import tum_esm_utils
-import ftplib
 
 sys.path.append(tum_esm_utils.files.rel_to_abs_path("../.."))
 from src import types, profiles
@@ -19,14 +18,11 @@ def run() -> None:
     try:
         if len(config.profiles.GGG2020_standard_sites) > 0:
             print("Downloading standard site data")
-            with ftplib.FTP(
-                host="ccycle.gps.caltech.edu",
-                passwd=config.profiles.server.email,
-                user="anonymous",
-                timeout=60,
-            ) as ftp:
-                print("Connected to FTP server")
-                profiles.std_site_logic.download_data(config, ftp)
+            with profiles.connection_pool.FTPConnectionPool(
+                email=config.profiles.server.email,
+                size=config.profiles.server.max_parallel_downloads,
+            ) as pool:
+                profiles.std_site_logic.download_data(config, pool)
         else:
             print("No standard site data to download")
 
@@ -37,13 +33,10 @@ def run() -> None:
         for profile_model in config.profiles.scope.models:
             print(f"Downloading on-demand {profile_model} data")
 
-            with ftplib.FTP(
-                host="ccycle.gps.caltech.edu",
-                passwd=config.profiles.server.email,
-                user="anonymous",
-                timeout=60,
-            ) as ftp:
-                print("Connected to FTP server")
+            with profiles.connection_pool.FTPConnectionPool(
+                email=config.profiles.server.email,
+                size=config.profiles.server.max_parallel_downloads,
+            ) as pool:
                 cache = profiles.cache.DownloadQueryCache.load()
                 running_queries = cache.get_active_queries(profile_model)
                 print(f"Found {len(running_queries)} already requested queries")
@@ -51,7 +44,7 @@ def run() -> None:
                 if len(running_queries) > 0:
                     print(f"Trying to download {len(running_queries)} queries")
                     fulfilled_queries = profiles.download_logic.download_data(
-                        config, running_queries, ftp, profile_model
+                        config, running_queries, pool, profile_model
                     )
                     print(f"Successfully downloaded {len(fulfilled_queries)} queries")
                     cache.remove_queries(profile_model, fulfilled_queries)
@@ -97,28 +90,25 @@ def run() -> None:
                 # downloadable from the server
                 print(f"Trying to download {len(outstanding_download_queries)} queries")
                 fulfilled_queries = profiles.download_logic.download_data(
-                    config, outstanding_download_queries, ftp, profile_model
-                )
-                outstanding_download_queries = sorted(
-                    set(outstanding_download_queries).difference(set(fulfilled_queries)),
-                    key=lambda q: q.from_date,
-                    reverse=True,
+                    config, outstanding_download_queries, pool, profile_model
                 )
+                # keep the order of `generate_download_queries`, which
+                # ranks the queries by the number of retrievals they unblock
+                active_queries = set(cache.get_active_queries(profile_model))
+                outstanding_download_queries = [
+                    q for q in outstanding_download_queries if q not in fulfilled_queries
+                ]
                 print(f"Successfully downloaded {len(fulfilled_queries)} queries")
-                new_download_queries = sorted(
-                    list(
-                        set(outstanding_download_queries) - set(fulfilled_queries) -
-                        set(cache.get_active_queries(profile_model))
-                    ),
-                    key=lambda q: q.from_date,
-                    reverse=True,
-                )
+                new_download_queries = [
+                    q for q in outstanding_download_queries if q not in active_queries
+                ]
 
                 query_count = min(open_query_count, len(new_download_queries))
                 print(f"Requesting {query_count} out of {len(new_download_queries)} queries")
-                profiles.upload_logic.upload_requests(
-                    config, new_download_queries[: query_count], ftp, profile_model
-                )
+                with pool.connection() as ftp:
+                    profiles.upload_logic.upload_requests(
+                        config, new_download_queries[: query_count], ftp, profile_model
+                    )
                 print(
                     "Done. Run this script again (after waiting " +
                     "a bit to download the reqested data)."
@@ -1,8 +1,7 @@
+import concurrent.futures
 import datetime
 import ftplib
-import io
-import os
-import re
+import tarfile
 import rich.progress
 import tum_esm_utils
 from src import types, utils, profiles
@@ -29,36 +28,16 @@ def list_downloaded_data(
     std_site_config: types.config.ProfilesGGG2020StandardSitesItemConfig,
 ) -> set[datetime.date]:
     assert config.profiles is not None
-    downloaded_data: set[datetime.date] = set()
-
+    index = utils.profile_store.get_profile_store_index(
+        config.general.data.atmospheric_profiles.root, "GGG2020"
+    )
     cs = utils.text.get_coordinates_slug(lat=std_site_config.lat, lon=std_site_config.lon)
-    r = re.compile(r"^\d{8,10}_" + cs + r"\.(map|mod|vmr)$")
-    filenames: set[str] = set([
-        f
-        for f in os.listdir(os.path.join(config.general.data.atmospheric_profiles.root, "GGG2020"))
-        if r.match(f)
-    ])
-    dates: set[datetime.date] = set([
-        d for d in [
-            datetime.date(
-                year=int(f[0 : 4]),
-                month=int(f[4 : 6]),
-                day=int(f[6 : 8]),
-            ) for f in filenames
-        ] if ((std_site_config.from_date <= d) and (d <= std_site_config.to_date))
-    ])
-
-    required_prefixes = [f"%Y%m%d{h:02d}" for h in range(0, 24, 3)]
-    required_extensions = ["map", "mod", "vmr"]
-
-    for d in dates:
-        expected_filenames = set([
-            f"{d.strftime(p)}_{cs}.{e}" for e in required_extensions for p in required_prefixes
-        ])
-        if expected_filenames.issubset(filenames):
-            downloaded_data.add(d)
-
-    return downloaded_data
+    downloaded_dates = index.get_dates(
+        cs, profiles.download_logic.get_file_types(config, "GGG2020")
+    ) & utils.date_intervals.DateIntervalSet.from_range(
+        std_site_config.from_date, std_site_config.to_date
+    )
+    return downloaded_dates.to_dates()
 
 
 def compute_missing_data(
@@ -70,9 +49,11 @@ def compute_missing_data(
 
 def download_data(
     config: types.Config,
-    ftp: ftplib.FTP,
+    pool: profiles.connection_pool.FTPConnectionPool,
 ) -> None:
     assert config.profiles is not None
+    listing_cache = profiles.listing_cache.FTPListingCache.load()
+    listing_ttl = datetime.timedelta(minutes=config.profiles.server.listing_cache_ttl)
     with rich.progress.Progress() as progress:
         task = progress.add_task(
             description="Processing standard sites",
@@ -96,35 +77,44 @@ def download_data(
                     description=f"Downloading {std_site_config.identifier}",
                     total=len(missing_data),
                 )
-                tarballs_on_server = ftp.nlst(
-                    f"ginput-std-sites/tarballs/{std_site_config.identifier}/"
+                tarball_index = profiles.listing_cache.index_std_site_tarballs(
+                    listing_cache.list_directory(
+                        pool,
+                        f"ginput-std-sites/tarballs/{std_site_config.identifier}/",
+                        listing_ttl,
+                    )
                 )
+                tarballs_to_download: list[str] = []
                 for date in sorted(missing_data):
-                    progress.print(date.strftime("%Y-%m-%d"))
-                    try:
-                        filename = next(
-                            filter(
-                                lambda f: f.endswith(date.strftime("%Y%m%d.tgz")),
-                                tarballs_on_server,
-                            )
-                        )
-                        print("Found!")
-                        with io.BytesIO() as archive:
-                            ftp.retrbinary(
-                                f"RETR {filename}",
-                                archive.write,
-                            )
-                            archive.seek(0)
-                            profiles.download_logic.extract_archive(
-                                config=config,
-                                archive=archive,
-                                lat=std_site_config.lat,
-                                lon=std_site_config.lon,
-                                atmospheric_profile_model="GGG2020",
-                            )
-                    except StopIteration:
-                        progress.print(f"No tarball")
-                    progress.advance(subtask)
+                    if date in tarball_index:
+                        tarballs_to_download.append(tarball_index[date])
+                    else:
+                        progress.print(f"No tarball for {date.strftime('%Y-%m-%d')}")
+                        progress.advance(subtask)
+
+                def _download_tarball(filename: str) -> None:
+                    pool.stream(
+                        filename,
+                        lambda archive: profiles.download_logic.extract_archive(
+                            config=config,
+                            archive=archive,
+                            lat=std_site_config.lat,
+                            lon=std_site_config.lon,
+                            atmospheric_profile_model="GGG2020",
+                        ),
+                    )
+
+                with concurrent.futures.ThreadPoolExecutor(max_workers=pool.size) as executor:
+                    futures = {
+                        executor.submit(_download_tarball, filename): filename
+                        for filename in tarballs_to_download
+                    }
+                    for future in concurrent.futures.as_completed(futures):
+                        try:
+                            future.result()
+                        except ftplib.all_errors + (tarfile.TarError, ) as e:
+                            progress.print(f"Could not download {futures[future]}: {e}")
+                        progress.advance(subtask)
             else:
                 progress.print("No data to download")
             progress.advance(task)
@@ -6,6 +6,54 @@ import rich.progress
 from src import types, profiles
 
 
+def upload_request(
+    config: types.Config,
+    query: types.DownloadQuery,
+    ftp: ftplib.FTP,
+    atmospheric_profile_model: types.AtmosphericProfileModel,
+) -> None:
+    """Requests Ginput data for a single query by uploading a '.txt' to
+    'ccycle.gps.caltech.edu'. Retries for 15 seconds if the server is busy.
+    Does not update the query cache."""
+
+    assert config.profiles is not None, "this is a bug in the code"
+
+    to_date: str
+    if atmospheric_profile_model == "GGG2020":
+        # Exclusive to date
+        to_date = (query.to_date + datetime.timedelta(days=1)).strftime("%Y%m%d")
+        filename = "input_file_2020.txt"
+    else:
+        # Inclusive to date
+        to_date = query.to_date_str
+        filename = "input_file.txt"
+
+    # Build request in-memory
+    with io.BytesIO(
+        "\n".join((
+            "mu",
+            query.from_date_str,
+            to_date,
+            str(query.lat),
+            str(query.lon),
+            config.profiles.server.email,
+        )).encode("utf-8")
+    ) as file_:
+        upload_start_time = time.time()
+
+        while (time.time() - upload_start_time) < 15:
+            try:
+                ftp.storbinary(f"STOR upload/{filename}", file_)
+                print(f"Success")
+                break
+            except ftplib.error_perm as e:
+                if str(e) == "553 Could not create file.":
+                    print("Failed because FTP server is busy")
+                    time.sleep(5)
+                else:
+                    raise e
+
+
 def upload_requests(
     config: types.Config,
     queries: list[types.DownloadQuery],
@@ -26,41 +74,7 @@ def upload_requests(
             progress.print(f"Requesting {query}")
 
             t1 = time.time()
-
-            to_date: str
-            if atmospheric_profile_model == "GGG2020":
-                # Exclusive to date
-                to_date = (query.to_date + datetime.timedelta(days=1)).strftime("%Y%m%d")
-                filename = "input_file_2020.txt"
-            else:
-                # Inclusive to date
-                to_date = query.to_date_str
-                filename = "input_file.txt"
-
-            # Build request in-memory
-            with io.BytesIO(
-                "\n".join((
-                    "mu",
-                    query.from_date_str,
-                    to_date,
-                    str(query.lat),
-                    str(query.lon),
-                    config.profiles.server.email,
-                )).encode("utf-8")
-            ) as file_:
-                upload_start_time = time.time()
-
-                while (time.time() - upload_start_time) < 15:
-                    try:
-                        ftp.storbinary(f"STOR upload/{filename}", file_)
-                        progress.print(f"Success")
-                        break
-                    except ftplib.error_perm as e:
-                        if str(e) == "553 Could not create file.":
-                            progress.print("Failed because FTP server is busy")
-                            time.sleep(5)
-                        else:
-                            raise e
+            upload_request(config, query, ftp, atmospheric_profile_model)
 
             cache.add_query(atmospheric_profile_model, query)
             cache.dump()
@@ -25,7 +25,13 @@ def _log(msg: str) -> None:
 
 @click.command(help="Run proffast 1.0 for a given proffast session")
 @click.argument("session_string", type=str)
-def main(session_string: str) -> None:
+@click.option(
+    "--stage",
+    type=click.Choice(["all", "preprocess", "pcxs", "invers"]),
+    default="all",
+    help="Only run one stage of the retrieval",
+)
+def main(session_string: str, stage: str) -> None:
     os.makedirs(_LOGS_DIR, exist_ok=True)
 
     _log("Parsing session string")
@@ -35,29 +41,32 @@ def main(session_string: str) -> None:
         _log("Invalid session string")
         raise e
 
-    _log("preparing data")
-    create_input_files.move_profiles_and_ground_pressure_files(session)
+    if stage in ["all", "preprocess"]:
+        _log("preparing data")
+        create_input_files.move_profiles_and_ground_pressure_files(session)
 
-    _log("creating preprocess input file")
-    create_input_files.create_preprocess_input_file(session)
-    _log("run preprocess")
-    execute_proffast.execute_preprocess(session, _log)
-    _log("move BIN files")
-    move_data.move_bin_files(session)
+        _log("creating preprocess input file")
+        create_input_files.create_preprocess_input_file(session)
+        _log("run preprocess")
+        execute_proffast.execute_preprocess(session, _log)
+        _log("move BIN files")
+        move_data.move_bin_files(session)
 
-    _log("creating pcxs input file")
-    create_input_files.create_pcxs_input_file(session)
-    _log("run pcxs")
-    execute_proffast.execute_pcxs(session, _log)
+    if stage in ["all", "pcxs"]:
+        _log("creating pcxs input file")
+        create_input_files.create_pcxs_input_file(session)
+        _log("run pcxs")
+        execute_proffast.execute_pcxs(session, _log)
 
-    _log("creating invers input file")
-    create_input_files.create_invers_input_file(session)
-    _log("run invers")
-    execute_proffast.execute_invers(session, _log)
-    _log("merge invers output files")
-    move_data.merge_output_files(session)
+    if stage in ["all", "invers"]:
+        _log("creating invers input file")
+        create_input_files.create_invers_input_file(session)
+        _log("run invers")
+        execute_proffast.execute_invers(session, _log)
+        _log("merge invers output files")
+        move_data.merge_output_files(session)
 
-    _log("done")
+    _log("done" if stage == "all" else f"done with stage {stage}")
 
 
 if __name__ == "__main__":
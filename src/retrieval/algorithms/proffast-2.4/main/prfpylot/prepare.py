@@ -24,6 +24,7 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import prfpylot
 from prfpylot.pressure import PressureHandler
 import os
+import shutil
 import sys
 import yaml
 import datetime as dt
@@ -36,6 +37,7 @@ import pytz
 import fortranformat
 import inspect
 import codecs
+import hashlib
 from random import randint
 
 
@@ -77,6 +79,7 @@ class Preparation():
         "backup_results": True,
         "igram_pattern": "*.*",
         "instrument_parameters": "em27",
+        "interpolated_mapfile_cache": None,
     }
 
     instrument_templates = {
@@ -1226,10 +1229,29 @@ class Preparation():
 
         The folder interpolated_mapfiles is created in this function.
 
+        If `interpolated_mapfile_cache` is given, the interpolated file is
+        stored in that directory as "<local_noon_utc>_<checksum>.map" and
+        copied into the result folder if it has been computed before. The
+        checksum covers the contents of the map files the interpolation
+        reads, so changed map files are interpolated again. The cache
+        directory must only contain map files of one location.
+
         Parameters:
             local_date (dt.datetime): datetime in local time
         """
         local_noon_utc = self.get_local_noon_utc(local_date)
+
+        output_folder = os.path.join(
+            self.result_folder, "interpolated_mapfiles")
+        os.makedirs(output_folder, exist_ok=True)
+
+        output_filename = (
+            f"{self.site_abbrev}"
+            f"{local_noon_utc.strftime('%Y%m%d%H')}_Z.map"
+            )
+
+        output_mapfile = os.path.join(output_folder, output_filename)
+
         mapfiles = self.get_mapfiles(local_noon_utc)
 
         # find the correct map files: before and after the hour of noon_utc
@@ -1248,6 +1270,35 @@ class Preparation():
                 )
             sys.exit()
 
+        cached_mapfile = None
+        if self.interpolated_mapfile_cache is not None:
+            # the header is taken from the first map file of the day
+            checksum = hashlib.sha256()
+            for mapfile in [mapfiles[0], mapfiles[i_noon-1], mapfiles[i_noon]]:
+                with open(mapfile, "rb") as f:
+                    checksum.update(f.read())
+            cached_mapfile = os.path.join(
+                self.interpolated_mapfile_cache,
+                f"{local_noon_utc.strftime('%Y%m%d%H%M')}_"
+                f"{checksum.hexdigest()[:16]}.map")
+            if os.path.lexists(output_mapfile):
+                os.remove(output_mapfile)
+            try:
+                # copy the file because the result folder is published
+                # while the cache may be deleted at any time
+                shutil.copyfile(cached_mapfile, output_mapfile)
+                # the least recently used files are removed from the cache
+                os.utime(cached_mapfile)
+            except FileNotFoundError:
+                pass
+            else:
+                self.logger.debug(
+                    f"Using cached interpolated mapfile {cached_mapfile}")
+                with open(output_mapfile, "r") as f:
+                    header = f.readlines()[:12]
+                self._check_mapfile_coordinates(header)
+                return
+
         file1 = pd.read_csv(
             mapfiles[i_noon-1],
             skipinitialspace=True,
@@ -1265,21 +1316,9 @@ class Preparation():
         # date of file 1 for the requested time diff
         date_file1 = dt.datetime.strptime(
                     os.path.basename(mapfiles[i_noon-1])[-15:-5], "%Y%m%d%H")
-        for i in range(file1.shape[0]):
-            # do a linear interpolation, calculate everything in seconds:
-            file1[i, :] = file1[i, :] + (file2[i, :] - file1[i, :]) / tdiff \
-                * (local_noon_utc - date_file1).total_seconds()
-
-        output_folder = os.path.join(
-            self.result_folder, "interpolated_mapfiles")
-        os.makedirs(output_folder, exist_ok=True)
-
-        output_filename = (
-            f"{self.site_abbrev}"
-            f"{local_noon_utc.strftime('%Y%m%d%H')}_Z.map"
-            )
-
-        output_mapfile = os.path.join(output_folder, output_filename)
+        # do a linear interpolation, calculate everything in seconds:
+        file1 = file1 + (file2 - file1) / tdiff \
+            * (local_noon_utc - date_file1).total_seconds()
 
         # write header
         with open(mapfiles[0], "r") as f:
@@ -1299,6 +1338,12 @@ class Preparation():
             for line in file1:
                 f.write(frw.write(line) + "\n")
 
+        if cached_mapfile is not None:
+            os.makedirs(self.interpolated_mapfile_cache, exist_ok=True)
+            tmp_mapfile = f"{cached_mapfile}.{os.getpid()}.tmp"
+            shutil.copyfile(output_mapfile, tmp_mapfile)
+            os.replace(tmp_mapfile, cached_mapfile)
+
     def _check_mapfile_coordinates(self, header):
         """Check if the coordinates of the mapfile are consistent.
         Print a warning if not.
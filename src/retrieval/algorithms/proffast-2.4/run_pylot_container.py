@@ -4,9 +4,17 @@ Script to run a particular Pylot instance
 
 example:
 
-./run.py container_id config_path
+./run.py container_id config_path [stage [preprocess_shard_count]]
+
+The optional stage (`preprocess`, `pcxs` or `invers`) only runs one part
+of the Pylot. Every stage uses a new Pylot instance which picks up the
+files written by the previous stages in the container and skips the days
+dropped by them. With a shard count larger than one, the interferograms
+of a day are converted by multiple concurrent preprocess processes.
 """
 
+from typing import Any
+import glob
 import sys
 import os
 import importlib
@@ -16,13 +24,52 @@ _PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(
     __file__, current_depth=5
 )
 
+
+def _drop_pruned_dates(pylot_instance: Any, stage: str) -> None:
+    """Every stage uses a new Pylot instance, which would retry the days
+    dropped by the previous stages. Drop them again based on the files
+    written by these stages: measurement days without spectra (dropped
+    by the preprocess) and local days without a pT file (dropped by pcxs
+    because of a missing map file)."""
+
+    pylot_instance.meas_dates = [
+        date for date in pylot_instance.meas_dates if len(
+            glob.glob(
+                os.path.join(
+                    pylot_instance.analysis_instrument_path,
+                    date.strftime("%y%m%d"),
+                    "cal",
+                    "*SN.BIN",
+                )
+            )
+        ) > 0
+    ]
+    if stage != "invers":
+        return
+    wrk_fast_path = os.path.join(pylot_instance.proffast_path, "wrk_fast")
+    pylot_instance.localdate_spectra = {
+        local_date: spectra
+        for local_date, spectra in pylot_instance.get_localdate_spectra().items()
+        if os.path.isfile(
+            os.path.join(
+                wrk_fast_path,
+                f"{pylot_instance.site_name}{local_date.strftime('%y%m%d')}-pT_fast_out.dat",
+            )
+        )
+    }
+    pylot_instance.local_dates = list(pylot_instance.localdate_spectra.keys())
+
+
 if __name__ == "__main__":
-    assert len(sys.argv) == 3, (
+    assert len(sys.argv) in [3, 4, 5], (
         "wrong number of arguments provided to run.py. Example" +
-        ' call: "./run.py container_id pylot_config_path"'
+        ' call: "./run.py container_id pylot_config_path [stage [preprocess_shard_count]]"'
     )
 
-    container_id, pylot_config_path = sys.argv[1 :]
+    container_id, pylot_config_path = sys.argv[1 : 3]
+    stage = sys.argv[3] if len(sys.argv) >= 4 else "all"
+    preprocess_shard_count = int(sys.argv[4]) if len(sys.argv) == 5 else 1
+    assert stage in ["all", "preprocess", "pcxs", "invers"], f'unknown stage "{stage}"'
     container_path = os.path.join(
         _PROJECT_DIR,
         "data",
@@ -34,8 +81,43 @@ if __name__ == "__main__":
     print(
         f'executing in container_id "{container_id}" ' +
         f'at container_path "{container_path}" and ' +
-        f'pylot_config_path "{pylot_config_path}".'
+        f'pylot_config_path "{pylot_config_path}" (stage "{stage}").'
     )
     sys.path.append(container_path)
     pylot = importlib.import_module("prfpylot.pylot")
-    pylot.Pylot(pylot_config_path, logginglevel="debug").run(n_processes=1)
+    pylot_instance = pylot.Pylot(pylot_config_path, logginglevel="debug")
+    if preprocess_shard_count > 1:
+        sys.path.append(_PROJECT_DIR)
+        from src.retrieval.utils import preprocess_shards
+
+        pylot_instance.run_preprocess = lambda n_processes=1: (
+            preprocess_shards.run_sharded_preprocess(pylot_instance, preprocess_shard_count)
+        )
+
+    # like `Pylot.run`, clean up the files when a stage fails or when
+    # the last stage is done
+    if stage == "all":
+        pylot_instance.run(n_processes=1)
+    elif stage == "preprocess":
+        try:
+            pylot_instance.run_preprocess(n_processes=1)
+        except:
+            pylot_instance.clean_files()
+            raise
+    elif stage == "pcxs":
+        _drop_pruned_dates(pylot_instance, stage)
+        try:
+            pylot_instance.run_pcxs(n_processes=1)
+        except:
+            pylot_instance.clean_files()
+            raise
+    else:
+        # pcxs has been run by a previous Pylot instance, this makes
+        # `clean_files` handle its pT and VMR files
+        pylot_instance.executed_pcxs = True
+        _drop_pruned_dates(pylot_instance, stage)
+        try:
+            pylot_instance.run_inv(n_processes=1)
+            pylot_instance.combine_results()
+        finally:
+            pylot_instance.clean_files()
@@ -1,12 +1,20 @@
 from typing import Callable
 import os
+import queue
 import shutil
+import threading
+import time
 import tum_esm_utils
 from src import types, retrieval
 
 _RETRIEVAL_CODE_DIR = tum_esm_utils.files.rel_to_abs_path("../algorithms")
 _CONTAINER_DIR = tum_esm_utils.files.rel_to_abs_path("../../../data/containers")
 
+# removed containers are renamed into this directory and deleted in the
+# background; it lives inside the container directory so that renaming
+# never crosses a filesystem boundary
+_TRASH_DIRNAME = ".trash"
+
 
 class ContainerFactory:
     """Factory for creating pylot containers.
@@ -16,7 +24,10 @@ class ContainerFactory:
     have a unique id and is initialized with empty input and output
     directories.
 
-    The factory keeps track of all containers and can remove them."""
+    The factory keeps track of all containers and can remove them.
+    Removed containers are moved into a trash directory and deleted by a
+    low-priority background thread, so the dispatcher never waits for
+    large container directories to be deleted."""
     def __init__(
         self,
         config: types.Config,
@@ -32,6 +43,9 @@ class ContainerFactory:
         self.logger = logger
         self.containers: list[types.RetrievalContainer] = []
         self.label_generator = tum_esm_utils.text.RandomLabelGenerator()
+        self.trash_dir = os.path.join(_CONTAINER_DIR, _TRASH_DIRNAME)
+        self.trash_queue: queue.Queue[str] = queue.Queue()
+        threading.Thread(target=self._empty_trash, name="container-trash", daemon=True).start()
 
         assert self.config.retrieval is not None
         retrieval_algorithms = [job.retrieval_algorithm for job in self.config.retrieval.jobs]
@@ -46,8 +60,11 @@ class ContainerFactory:
                 )
 
         self.logger.info("Removing all old containers")
+        if os.path.isdir(self.trash_dir):
+            for d in os.listdir(self.trash_dir):
+                self.trash_queue.put(os.path.join(self.trash_dir, d))
         self.remove_all_containers(include_unknown=True)
-        self.logger.info("All old containers have been removed")
+        self.logger.info("All old containers have been moved to the trash")
 
         for algorithm, initializer in [
             ("proffast-1.0", ContainerFactory.init_proffast10_code),
@@ -126,9 +143,9 @@ class ContainerFactory:
         """
         try:
             container = [c for c in self.containers if c.container_id == container_id][0]
-            shutil.rmtree(container.container_path)
-            shutil.rmtree(container.data_input_path)
-            shutil.rmtree(container.data_output_path)
+            self._move_to_trash(container.container_path)
+            self._move_to_trash(container.data_input_path)
+            self._move_to_trash(container.data_output_path)
             self.containers.remove(container)
             self.label_generator.free(container_id)
         except IndexError:
@@ -139,14 +156,53 @@ class ContainerFactory:
         if include_unknown:
             for d in os.listdir(_CONTAINER_DIR):
                 subdir = os.path.join(_CONTAINER_DIR, d)
-                if os.path.isdir(subdir):
-                    shutil.rmtree(subdir)
+                if os.path.isdir(subdir) and (d != _TRASH_DIRNAME):
+                    self._move_to_trash(subdir)
         else:
             for container in self.containers:
-                shutil.rmtree(container.container_path)
+                self._move_to_trash(container.container_path)
+                self._move_to_trash(container.data_input_path)
+                self._move_to_trash(container.data_output_path)
         self.containers = []
         self.label_generator = tum_esm_utils.text.RandomLabelGenerator()
 
+    def wait_for_trash_removal(self) -> None:
+        """Block until all removed containers have been deleted."""
+
+        self.trash_queue.join()
+
+    def _move_to_trash(self, path: str) -> None:
+        """Rename a directory into the trash directory and queue it for
+        deletion. Falls back to deleting it directly if it cannot be
+        renamed."""
+
+        if not os.path.exists(path):
+            return
+        os.makedirs(self.trash_dir, exist_ok=True)
+        trash_path = os.path.join(self.trash_dir, f"{os.path.basename(path)}-{time.time_ns()}")
+        try:
+            os.rename(path, trash_path)
+        except OSError:
+            shutil.rmtree(path, ignore_errors=True)
+            return
+        self.trash_queue.put(trash_path)
+
+    def _empty_trash(self) -> None:
+        """Delete the queued trash items one by one. Runs in a daemon thread
+        with the lowest CPU priority; items which have not been deleted when
+        the automation stops are deleted on the next start."""
+
+        try:
+            # on Linux, the niceness of a single thread can be changed
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+        while True:
+            trash_path = self.trash_queue.get()
+            shutil.rmtree(trash_path, ignore_errors=True)
+            self.trash_queue.task_done()
+
     @staticmethod
     def init_proffast10_code(_print: Callable[[str], None]) -> None:
         """Initialize the Proffast 1.0 code"""
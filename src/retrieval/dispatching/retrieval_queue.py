@@ -29,7 +29,10 @@ def generate_retrieval_queue(
     em27_metadata_interface: em27_metadata.EM27MetadataInterface,
     retrieval_job_config: types.RetrievalJobConfig,
 ) -> list[em27_metadata.types.SensorDataContext]:
+    """Return the sensor data contexts which are ready to be retrieved."""
+
     assert config.retrieval is not None, "Config must have a retrieval section"
+    spectra_source = retrieval_job_config.settings.reprocess_from_spectra
 
     def _log_filtering_step_message(
         positive_message: str,
@@ -115,48 +118,56 @@ def generate_retrieval_queue(
             positive_items=dates_with_location,
         )
 
-        # Only keep dates with interferograms
+        # Only keep dates with interferograms (spectra are checked for each
+        # sensor data context when reprocessing from spectra)
 
-        dates_with_interferograms: set[datetime.date] = set()
-        dates_without_interferograms: set[datetime.date] = set()
-        for date in dates_with_location:
-            ifg_path = os.path.join(
-                config.general.data.interferograms.root, sensor.sensor_id, date.strftime("%Y%m%d")
+        dates_to_process: set[datetime.date] = dates_with_location
+        if spectra_source is None:
+            dates_with_interferograms: set[datetime.date] = set()
+            dates_without_interferograms: set[datetime.date] = set()
+            for date in dates_with_location:
+                ifg_path = os.path.join(
+                    config.general.data.interferograms.root,
+                    sensor.sensor_id,
+                    date.strftime("%Y%m%d"),
+                )
+                if os.path.isdir(ifg_path):
+                    dates_with_interferograms.add(date)
+                else:
+                    dates_without_interferograms.add(date)
+            _log_filtering_step_message(
+                positive_message="of these dates have interferograms",
+                positive_items=dates_with_interferograms,
+                negative_message="of these dates have no interferograms",
+                negative_items=dates_without_interferograms,
             )
-            if os.path.isdir(ifg_path):
-                dates_with_interferograms.add(date)
-            else:
-                dates_without_interferograms.add(date)
-        _log_filtering_step_message(
-            positive_message="of these dates have interferograms",
-            positive_items=dates_with_interferograms,
-            negative_message="of these dates have no interferograms",
-            negative_items=dates_without_interferograms,
-        )
 
-        dates_with_unlocked_interferograms: set[datetime.date] = set()
-        dates_with_locked_interferograms: set[datetime.date] = set()
-        for date in dates_with_interferograms:
-            ifg_path = os.path.join(
-                config.general.data.interferograms.root, sensor.sensor_id, date.strftime("%Y%m%d")
+            dates_with_unlocked_interferograms: set[datetime.date] = set()
+            dates_with_locked_interferograms: set[datetime.date] = set()
+            for date in dates_with_interferograms:
+                ifg_path = os.path.join(
+                    config.general.data.interferograms.root,
+                    sensor.sensor_id,
+                    date.strftime("%Y%m%d"),
+                )
+                assert os.path.isdir(ifg_path)
+                do_not_touch_indicator_file = os.path.join(ifg_path, ".do-not-touch")
+                if os.path.isfile(do_not_touch_indicator_file):
+                    dates_with_locked_interferograms.add(date)
+                else:
+                    dates_with_unlocked_interferograms.add(date)
+            _log_filtering_step_message(
+                positive_message="of these dates have unlocked interferograms",
+                positive_items=dates_with_unlocked_interferograms,
+                negative_message="of these dates have locked interferograms",
+                negative_items=dates_with_locked_interferograms,
             )
-            assert os.path.isdir(ifg_path)
-            do_not_touch_indicator_file = os.path.join(ifg_path, ".do-not-touch")
-            if os.path.isfile(do_not_touch_indicator_file):
-                dates_with_locked_interferograms.add(date)
-            else:
-                dates_with_unlocked_interferograms.add(date)
-        _log_filtering_step_message(
-            positive_message="of these dates have unlocked interferograms",
-            positive_items=dates_with_unlocked_interferograms,
-            negative_message="of these dates have locked interferograms",
-            negative_items=dates_with_locked_interferograms,
-        )
+            dates_to_process = dates_with_unlocked_interferograms
 
-        # Get sensor data contexts for all dates with interferograms
+        # Get sensor data contexts for all dates to process
 
         sensor_data_contexts: list[em27_metadata.types.SensorDataContext] = []
-        for date in dates_with_unlocked_interferograms:
+        for date in dates_to_process:
             from_datetime = datetime.datetime(
                 date.year, date.month, date.day, 0, 0, 0, tzinfo=datetime.timezone.utc
             )
@@ -171,30 +182,86 @@ def generate_retrieval_queue(
             positive_items=sensor_data_contexts,
         )
 
+        # Only keep the sensor data contexts with stored spectra
+
+        if spectra_source is not None:
+            sensor_data_contexts_with_spectra: list[em27_metadata.types.SensorDataContext] = []
+            sensor_data_contexts_without_spectra: list[em27_metadata.types.SensorDataContext
+                                                      ] = []
+            for sdc in sensor_data_contexts:
+                spectra_dir = retrieval.utils.spectra_cache.find_archived_spectra(
+                    config, retrieval_job_config.retrieval_algorithm, spectra_source, sdc
+                )
+                if spectra_dir is not None:
+                    sensor_data_contexts_with_spectra.append(sdc)
+                else:
+                    sensor_data_contexts_without_spectra.append(sdc)
+            _log_filtering_step_message(
+                positive_message="of these sensor data contexts have stored spectra",
+                positive_items=sensor_data_contexts_with_spectra,
+                negative_message="of these sensor data contexts have no stored spectra",
+                negative_items=sensor_data_contexts_without_spectra,
+            )
+            sensor_data_contexts = sensor_data_contexts_with_spectra
+
         # Filter out the sensor data contexts which have already been processed
-        # i.e. there is a results directory for them
+        # i.e. there is a results directory for them in the results catalog
 
         unprocessed_sensor_data_contexts: list[em27_metadata.types.SensorDataContext] = []
-        results_dir = os.path.join(
-            config.general.data.results.root, retrieval_job_config.retrieval_algorithm,
-            retrieval_job_config.atmospheric_profile_model, sensor.sensor_id
+        processed_sensor_data_contexts: dict[str, em27_metadata.types.SensorDataContext] = {}
+        existing_results = utils.results_catalog.get_results_by_slug(
+            config.general.data.results.root,
+            retrieval_job_config.retrieval_algorithm,
+            retrieval_job_config.atmospheric_profile_model,
+            sensor.sensor_id,
         )
         for sdc in sensor_data_contexts:
-            output_folder = sdc.from_datetime.strftime("%Y%m%d")
-            if not utils.functions.sdc_covers_the_full_day(sdc):
-                output_folder += sdc.from_datetime.strftime("_%H%M%S")
-                output_folder += sdc.to_datetime.strftime("_%H%M%S")
-            if retrieval_job_config.settings.output_suffix is not None:
-                output_folder += f"_{retrieval_job_config.settings.output_suffix}"
-            success_dir = os.path.join(results_dir, "successful", output_folder)
-            failure_dir = os.path.join(results_dir, "failed", output_folder)
-            if (not os.path.isdir(success_dir) and not os.path.isdir(failure_dir)):
+            output_folder = utils.functions.get_output_slug(
+                sdc, retrieval_job_config.settings.output_suffix
+            )
+            if output_folder in existing_results:
+                processed_sensor_data_contexts[existing_results[output_folder].directory] = sdc
+            else:
                 unprocessed_sensor_data_contexts.append(sdc)
         _log_filtering_step_message(
             positive_message="of these sensor data contexts have not been processed yet",
             positive_items=unprocessed_sensor_data_contexts,
         )
 
+        # Reprocess the sensor data contexts whose inputs have changed
+        # since their results have been generated
+
+        if config.retrieval.general.requeue_changed_inputs and (
+            len(processed_sensor_data_contexts) > 0
+        ):
+            stored_fingerprints = retrieval.utils.input_fingerprint.get_stored_fingerprints(
+                list(processed_sensor_data_contexts.keys())
+            )
+            changed_sensor_data_contexts: list[em27_metadata.types.SensorDataContext] = []
+            for result_dir, sdc in processed_sensor_data_contexts.items():
+                stored_fingerprint = stored_fingerprints[result_dir]
+                if stored_fingerprint is None:
+                    continue
+                current_fingerprint = retrieval.utils.input_fingerprint.compute_input_fingerprint(
+                    config,
+                    retrieval_job_config.retrieval_algorithm,
+                    retrieval_job_config.atmospheric_profile_model,
+                    sdc,
+                    retrieval_job_config.settings,
+                )
+                changed_inputs = stored_fingerprint.get_changed_inputs(current_fingerprint)
+                if len(changed_inputs) > 0:
+                    logger.debug(
+                        f"    Inputs of {sdc.from_datetime.date()} have changed: " +
+                        ", ".join(changed_inputs)
+                    )
+                    changed_sensor_data_contexts.append(sdc)
+            _log_filtering_step_message(
+                positive_message="of the processed sensor data contexts have changed inputs",
+                positive_items=changed_sensor_data_contexts,
+            )
+            unprocessed_sensor_data_contexts.extend(changed_sensor_data_contexts)
+
         # Only keep the sensor data contexts with ground pressure files
 
         unprocessed_sensor_data_contexts_with_ground_pressure_files: list[
@@ -224,30 +291,18 @@ def generate_retrieval_queue(
             em27_metadata.types.SensorDataContext] = []
         unprocessed_sensor_data_contexts_without_atmospheric_profiles: list[
             em27_metadata.types.SensorDataContext] = []
+        profile_store_index = utils.profile_store.get_profile_store_index(
+            config.general.data.atmospheric_profiles.root,
+            retrieval_job_config.atmospheric_profile_model,
+        )
         for sdc in unprocessed_sensor_data_contexts_with_ground_pressure_files:
-            profiles_dir = os.path.join(
-                config.general.data.atmospheric_profiles.root,
-                retrieval_job_config.atmospheric_profile_model
-            )
             cd = utils.text.get_coordinates_slug(
                 sdc.atmospheric_profile_location.lat, sdc.atmospheric_profile_location.lon
             )
-            date_slugs = sdc.from_datetime.strftime("%Y%m%d")
-            datetime_slugs: list[str]
-            if retrieval_job_config.atmospheric_profile_model == "GGG2014":
-                datetime_slugs = [date_slugs]
-            else:
-                datetime_slugs = [f"{date_slugs}{d:02}" for d in [0, 3, 6, 9, 12, 15, 18, 21]]
-
-            # Using this logic instead of something like `all([... for ...])`
-            # so that it stops looking on the first encountered missing file
-            profiles_complete: bool = True
-            for datetime_slug in datetime_slugs:
-                if not os.path.isfile(os.path.join(profiles_dir, f"{datetime_slug}_{cd}.map")):
-                    profiles_complete = False
-                    break
-            if profiles_complete:
+            if profile_store_index.has_date(cd, sdc.from_datetime.date()):
                 unprocessed_sensor_data_contexts_with_atmospheric_profiles.append(sdc)
+            else:
+                unprocessed_sensor_data_contexts_without_atmospheric_profiles.append(sdc)
         _log_filtering_step_message(
             positive_message="of these sensor data contexts have atmospheric profiles",
             positive_items=unprocessed_sensor_data_contexts_with_atmospheric_profiles,
@@ -268,3 +323,73 @@ def generate_retrieval_queue(
         key=lambda sdc: sdc.from_datetime,
         reverse=True
     )
+
+
+def group_into_batches(
+    config: types.Config,
+    sensor_data_contexts: list[em27_metadata.types.SensorDataContext],
+    batching_config: types.config.RetrievalJobSettingsBatchingConfig,
+) -> list[list[em27_metadata.types.SensorDataContext]]:
+    """Group the items of a retrieval queue into batches of consecutive
+    days, which are retrieved in one session.
+
+    Only sensor data contexts covering a full day are batched, and all
+    days of a batch have the same sensor, location and metadata. The
+    batches are limited to `max_days` days and `max_ifg_count`
+    interferograms (a day exceeding this limit forms a batch on its own).
+    The batches are returned in the order of the retrieval queue, the
+    days within a batch are in ascending order."""
+
+    assert config.retrieval is not None
+
+    def _get_batch_key(sdc: em27_metadata.types.SensorDataContext) -> dict[str, Any]:
+        return sdc.model_dump(exclude={"from_datetime", "to_datetime"})
+
+    def _count_interferograms(sdc: em27_metadata.types.SensorDataContext) -> int:
+        assert config.retrieval is not None
+        ifg_path = os.path.join(
+            config.general.data.interferograms.root,
+            sdc.sensor_id,
+            sdc.from_datetime.strftime("%Y%m%d"),
+        )
+        if not os.path.isdir(ifg_path):
+            return 0
+        _, ifg_file_pattern = utils.text.replace_regex_placeholders(
+            config.retrieval.general.ifg_file_regex, sdc.sensor_id, sdc.from_datetime.date()
+        )
+        return len([f for f in os.listdir(ifg_path) if ifg_file_pattern.match(f) is not None])
+
+    batches: list[list[em27_metadata.types.SensorDataContext]] = []
+    batch_ifg_counts: list[int] = []
+    for sdc in sorted(sensor_data_contexts, key=lambda sdc: (sdc.sensor_id, sdc.from_datetime)):
+        ifg_count = 0
+        if batching_config.max_ifg_count is not None:
+            ifg_count = _count_interferograms(sdc)
+        if len(batches) > 0:
+            previous_sdc = batches[-1][-1]
+            if (
+                utils.functions.sdc_covers_the_full_day(sdc) and
+                utils.functions.sdc_covers_the_full_day(previous_sdc) and
+                (previous_sdc.from_datetime.date() + datetime.timedelta(days=1)
+                 == sdc.from_datetime.date()) and
+                (_get_batch_key(previous_sdc) == _get_batch_key(sdc)) and
+                (len(batches[-1]) < batching_config.max_days) and (
+                    (batching_config.max_ifg_count is None) or
+                    (batch_ifg_counts[-1] + ifg_count <= batching_config.max_ifg_count)
+                )
+            ):
+                batches[-1].append(sdc)
+                batch_ifg_counts[-1] += ifg_count
+                continue
+        batches.append([sdc])
+        batch_ifg_counts.append(ifg_count)
+
+    return sorted(
+        sorted(
+            batches,
+            key=lambda batch: batch[0].sensor_id,
+            reverse=False,
+        ),
+        key=lambda batch: batch[0].from_datetime,
+        reverse=True
+    )
@@ -1,4 +1,5 @@
-from typing import Any
+from typing import Any, Optional
+import datetime
 import signal
 import sys
 import os
@@ -33,6 +34,15 @@ def run() -> None:
         config, main_logger
     )
     processes: list[multiprocessing.context.SpawnProcess] = []
+    prefetcher: Optional[retrieval.utils.input_prefetch.InputPrefetcher] = None
+    if config.retrieval.general.input_prefetch is not None:
+        prefetcher = retrieval.utils.input_prefetch.InputPrefetcher(config, main_logger)
+    running_days: dict[str, list[tuple[str, datetime.date]]] = {}
+    stage_slots: Optional[retrieval.utils.stage_slots.StageSlots] = None
+    if config.retrieval.general.stage_concurrency is not None:
+        stage_slots = retrieval.utils.stage_slots.StageSlots(
+            config.retrieval.general.stage_concurrency, multiprocessing.get_context("spawn")
+        )
 
     # tear down logger gracefully when process is killed
 
@@ -63,6 +73,9 @@ def run() -> None:
             main_logger.info(f'Process "{process.name}": removed container')
 
         main_logger.info(f"Killed all containers")
+        if prefetcher is not None:
+            prefetcher.teardown()
+            main_logger.info(f"Removed prefetched interferograms")
         retrieval.utils.retrieval_status.RetrievalStatusList.reset()
         main_logger.info(f"Reset retrieval status list")
         main_logger.info(f"Teardown is done")
@@ -103,13 +116,49 @@ def run() -> None:
             config, main_logger, em27_metadata_interface, job
         )
         main_logger.info(f"Found {len(retrieval_sdcs)} items for job {job_index+1}")
-        for sdc in retrieval_sdcs:
-            job_queue.push(
-                job.retrieval_algorithm,
-                job.atmospheric_profile_model,
-                sdc,
-                job.settings,
+        if job.settings.use_local_pressure_in_pcxs and (len(retrieval_sdcs) > 0):
+            try:
+                retrieval.utils.pressure_averaging.compute_solar_noon_times([
+                    (sdc.location.lat, sdc.location.lon, sdc.from_datetime.date())
+                    for sdc in retrieval_sdcs
+                ])
+                main_logger.info(f"Precomputed solar noon times for job {job_index+1}")
+            except Exception as e:
+                main_logger.exception(e, "Could not precompute solar noon times")
+        if job.retrieval_algorithm == "proffast-1.0" and (len(retrieval_sdcs) > 0):
+            ils_params = retrieval.utils.ils.get_ils_params_for_queue([
+                (sdc.serial_number, sdc.from_datetime.date()) for sdc in retrieval_sdcs
+            ])
+            missing_ils_params = sorted(k for k, v in ils_params.items() if v is None)
+            if len(missing_ils_params) > 0:
+                main_logger.warning(
+                    f"No ILS parameters found for {len(missing_ils_params)} item(s) of job " +
+                    f"{job_index+1}, these retrievals will fail: " +
+                    ", ".join(f"SN{sn:03d} on {d}" for sn, d in missing_ils_params)
+                )
+        if job.settings.batching is not None:
+            batches = retrieval.dispatching.retrieval_queue.group_into_batches(
+                config, retrieval_sdcs, job.settings.batching
             )
+            main_logger.info(
+                f"Grouped the items of job {job_index+1} into {len(batches)} batch(es)"
+            )
+            for batch in batches:
+                job_queue.push(
+                    job.retrieval_algorithm,
+                    job.atmospheric_profile_model,
+                    batch[0],
+                    job.settings,
+                    batch_sensor_data_contexts=(batch if len(batch) > 1 else None),
+                )
+        else:
+            for sdc in retrieval_sdcs:
+                job_queue.push(
+                    job.retrieval_algorithm,
+                    job.atmospheric_profile_model,
+                    sdc,
+                    job.settings,
+                )
         retrieval.utils.retrieval_status.RetrievalStatusList.add_items(
             retrieval_sdcs,
             retrieval_algorithm=job.retrieval_algorithm,
@@ -138,10 +187,11 @@ def run() -> None:
                     next_retrieval_job.retrieval_algorithm,
                     next_retrieval_job.atmospheric_profile_model,
                     next_retrieval_job.job_settings,
+                    next_retrieval_job.batch_sensor_data_contexts,
                 )
                 new_process = multiprocessing.get_context("spawn").Process(
                     target=retrieval.session.process_session.run,
-                    args=(config, new_session),
+                    args=(config, new_session, False, stage_slots),
                     name=(
                         f"retrieval-session-{new_session.ctx.sensor_id}-" +
                         f"{new_session.ctx.from_datetime.strftime('%Y-%m-%dT%H:%M:%S')}-" +
@@ -150,6 +200,9 @@ def run() -> None:
                     daemon=True,
                 )
                 processes.append(new_process)
+                running_days[new_process.name] = [(
+                    sdc.sensor_id, sdc.from_datetime.date()
+                ) for sdc in next_retrieval_job.get_sensor_data_contexts()]
                 main_logger.info(f'process "{new_process.name}": starting')
                 new_process.start()
 
@@ -157,10 +210,24 @@ def run() -> None:
             for finished_process in [p for p in processes if not p.is_alive()]:
                 finished_process.join()
                 processes.remove(finished_process)
+                running_days.pop(finished_process.name, None)
                 main_logger.info(f'process "{finished_process.name}": finished processing')
                 container_factory.remove_container("-".join(finished_process.name.split("-")[-2 :]))
                 main_logger.info(f'process "{finished_process.name}": removed container')
 
+            # copy the interferograms of the next jobs while the current ones are running
+            if prefetcher is not None:
+                upcoming_jobs = [
+                    j for j in job_queue.peek_many(prefetcher.lookahead)
+                    if j.job_settings.reprocess_from_spectra is None
+                ]
+                prefetcher.update(
+                    upcoming_days=[(sdc.sensor_id, sdc.from_datetime.date())
+                                   for j in upcoming_jobs
+                                   for sdc in j.get_sensor_data_contexts()],
+                    running_days=[d for days in running_days.values() for d in days],
+                )
+
             if job_queue.is_empty() and (len(processes) == 0):
                 main_logger.info(f"No more things to process")
                 break
@@ -173,6 +240,9 @@ def run() -> None:
         main_logger.exception(e, "Unexpected error")
 
     container_factory.remove_all_containers()
+    if prefetcher is not None:
+        prefetcher.teardown()
+    container_factory.wait_for_trash_removal()
     main_logger.info(f"Automation is finished")
     main_logger.horizontal_line(variant="=")
     main_logger.archive()
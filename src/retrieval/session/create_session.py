@@ -1,3 +1,4 @@
+from typing import Optional
 import datetime
 import os
 import em27_metadata
@@ -33,6 +34,8 @@ def _generate_pylot2_config(session: types.Proffast2RetrievalSession) -> None:
                 "DATA_INPUT_PATH": session.ctn.data_input_path,
                 "DATA_OUTPUT_PATH": session.ctn.data_output_path,
                 "PYLOT_LOG_FORMAT_PATH": session.ctn.pylot_log_format_path,
+                "INTERPOLATED_MAPFILE_CACHE":
+                    retrieval.utils.interpolated_mapfile_cache.get_cache_dir(session),
             },
         ),
     )
@@ -66,12 +69,16 @@ def run(
     sensor_data_context: em27_metadata.types.SensorDataContext,
     retrieval_algorithm: types.RetrievalAlgorithm,
     atmospheric_profile_model: types.AtmosphericProfileModel,
-    job_settings: types.config.RetrievalJobSettingsConfig
+    job_settings: types.config.RetrievalJobSettingsConfig,
+    batch_sensor_data_contexts: Optional[list[em27_metadata.types.SensorDataContext]] = None,
 ) -> types.RetrievalSession:
-    """Create a new container and the pylot config files"""
+    """Create a new container and the pylot config files. If
+    `batch_sensor_data_contexts` is given, the session retrieves all
+    of these days and `sensor_data_context` has to be the first one."""
     new_session: types.RetrievalSession
 
     if retrieval_algorithm == "proffast-1.0":
+        assert not batch_sensor_data_contexts, "proffast-1.0 does not support batching"
         new_session = types.Proffast1RetrievalSession(
             job_settings=job_settings,
             ctx=sensor_data_context,
@@ -84,19 +91,21 @@ def run(
             job_settings=job_settings,
             ctx=sensor_data_context,
             ctn=container_factory.create_container(retrieval_algorithm),
+            batch_ctxs=batch_sensor_data_contexts or [],
         )
         _generate_pylot2_config(new_session)
         _generate_pylot2_log_format(new_session)
     else:
         raise NotImplementedError(f"Retrieval algorithm {retrieval_algorithm} not implemented")
 
-    retrieval.utils.retrieval_status.RetrievalStatusList.update_item(
-        retrieval_algorithm=retrieval_algorithm,
-        atmospheric_profile_model=atmospheric_profile_model,
-        sensor_id=sensor_data_context.sensor_id,
-        from_datetime=sensor_data_context.from_datetime,
-        output_suffix=job_settings.output_suffix,
-        container_id=new_session.ctn.container_id,
-        process_start_time=datetime.datetime.now(datetime.timezone.utc),
-    )
+    for sdc in (batch_sensor_data_contexts or [sensor_data_context]):
+        retrieval.utils.retrieval_status.RetrievalStatusList.update_item(
+            retrieval_algorithm=retrieval_algorithm,
+            atmospheric_profile_model=atmospheric_profile_model,
+            sensor_id=sdc.sensor_id,
+            from_datetime=sdc.from_datetime,
+            output_suffix=job_settings.output_suffix,
+            container_id=new_session.ctn.container_id,
+            process_start_time=datetime.datetime.now(datetime.timezone.utc),
+        )
     return new_session
@@ -2,7 +2,6 @@ import json
 import os
 import re
 import subprocess
-import tum_esm_utils
 from src import types, utils, retrieval
 
 
@@ -28,6 +27,15 @@ def run(
         session.ctx.sensor_id,
         session.ctx.from_datetime.strftime("%Y%m%d"),
     )
+    # the interferograms are read from a local copy if they have been prefetched,
+    # the caches of the corruption filter are still keyed by the original directory
+    ifg_read_directory = retrieval.utils.input_prefetch.get_prefetched_directory(
+        config, session.ctx.sensor_id, session.ctx.from_datetime.date()
+    )
+    if ifg_read_directory is not None:
+        logger.info(f"Using prefetched ifg files in {ifg_read_directory}")
+    else:
+        ifg_read_directory = ifg_src_directory
     _, ifg_file_pattern = utils.text.replace_regex_placeholders(
         config.retrieval.general.ifg_file_regex, session.ctx.sensor_id,
         session.ctx.from_datetime.date()
@@ -35,10 +43,10 @@ def run(
     logger.debug(f"used regex for ifg files: {ifg_file_pattern.pattern}")
 
     ifg_filenames = list(
-        sorted([f for f in os.listdir(ifg_src_directory) if ifg_file_pattern.match(f) is not None])
+        sorted([f for f in os.listdir(ifg_read_directory) if ifg_file_pattern.match(f) is not None])
     )
     logger.debug(
-        f"{len(ifg_filenames)} ifg files found in " + f"src directory ({ifg_src_directory})"
+        f"{len(ifg_filenames)} ifg files found in " + f"src directory ({ifg_read_directory})"
     )
     assert len(ifg_filenames) > 0, "no ifg input files"
     retrieval.utils.retrieval_status.RetrievalStatusList.update_item(
@@ -50,6 +58,52 @@ def run(
         ifg_count=len(ifg_filenames),
     )
 
+    # OPTIONALLY EXCLUDE INTERFEROGRAMS WITH A HIGH SOLAR ZENITH ANGLE
+
+    if session.job_settings.max_sza is not None:
+        logger.info(f"Using solar zenith angle filter (max. {session.job_settings.max_sza}°)")
+        sza_result = retrieval.utils.ifg_prescreen.screen_solar_zenith_angles(
+            ifg_read_directory,
+            ifg_filenames,
+            lat=session.ctx.location.lat,
+            lon=session.ctx.location.lon,
+            alt=session.ctx.location.alt,
+            utc_offset=session.ctx.utc_offset,
+            max_sza=session.job_settings.max_sza,
+        )
+        logger.info(
+            f"Solar zenith angle filter rejected {len(sza_result)} of " +
+            f"{len(ifg_filenames)} ifg files"
+        )
+        if len(sza_result) > 0:
+            logger.debug(
+                "Excluding files with a high solar zenith angle: " +
+                json.dumps(sza_result, indent=4)
+            )
+            ifg_filenames = [f for f in ifg_filenames if f not in sza_result]
+        assert len(ifg_filenames) > 0, "all ifg files have a too high solar zenith angle"
+
+    # OPTIONALLY EXCLUDE INTERFEROGRAMS WITH A LOW SIGNAL
+
+    if session.job_settings.use_ifg_prescreen:
+        logger.info("Using ifg pre-screen")
+        prescreen_result = retrieval.utils.ifg_prescreen.screen_interferograms(
+            ifg_read_directory,
+            ifg_filenames,
+            dc_min_threshold=session.job_settings.dc_min_threshold,
+            dc_var_threshold=session.job_settings.dc_var_threshold,
+        )
+        logger.info(
+            f"Pre-screen rejected {len(prescreen_result)} of {len(ifg_filenames)} ifg files"
+        )
+        if len(prescreen_result) > 0:
+            logger.debug(
+                "Excluding files rejected by the pre-screen: " +
+                json.dumps(prescreen_result, indent=4)
+            )
+            ifg_filenames = [f for f in ifg_filenames if f not in prescreen_result]
+        assert len(ifg_filenames) > 0, "all ifg files have been rejected by the pre-screen"
+
     # SYMLINK ALL VALID INTERFEROGRAM FILES AND
     # RENAME THEM TO THE FORMAT EXPECTED BY THE
     # PYLOT
@@ -59,7 +113,7 @@ def run(
     os.mkdir(dst_date_path)
     for ifg_index, filename in enumerate(ifg_filenames):
         os.symlink(
-            os.path.join(ifg_src_directory, filename),
+            os.path.join(ifg_read_directory, filename),
             os.path.join(dst_date_path, f"{date_string[2:]}SN.{ifg_index + 1}"),
         )
 
@@ -67,9 +121,17 @@ def run(
 
     if session.job_settings.use_ifg_corruption_filter:
         logger.info("Using ifg corruption filter")
+        # the sessions are already running in parallel, so the filter
+        # only gets the cores which are not used by other sessions
+        filter_process_count = max(
+            1, (os.cpu_count() or 1) // config.retrieval.general.max_process_count
+        )
         try:
-            corruption_result = tum_esm_utils.em27.detect_corrupt_opus_files(
-                ifg_directory=dst_date_path
+            corruption_result = retrieval.utils.ifg_corruption_filter.detect_corrupt_files(
+                ifg_read_directory,
+                ifg_filenames,
+                max_process_count=filter_process_count,
+                cache_directory=ifg_src_directory,
             )
         except subprocess.CalledProcessError:
             raise AssertionError("corrupt-files-detection has failed during execution")
@@ -81,8 +143,9 @@ def run(
                 f"Excluding {len(corruption_result)} corrupt file(s) from retrieval: " +
                 json.dumps(corruption_result, indent=4)
             )
-            for f in corruption_result.keys():
-                os.remove(os.path.join(dst_date_path, f))
+            for ifg_index, filename in enumerate(ifg_filenames):
+                if filename in corruption_result:
+                    os.remove(os.path.join(dst_date_path, f"{date_string[2:]}SN.{ifg_index + 1}"))
 
         if len(ifg_filenames) == len(corruption_result):
             raise AssertionError(
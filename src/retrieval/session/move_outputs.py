@@ -1,3 +1,4 @@
+from typing import Optional
 import datetime
 import json
 import os
@@ -11,7 +12,15 @@ def run(
     logger: retrieval.utils.logger.Logger,
     session: types.RetrievalSession,
     test_mode: bool = False,
+    pt_directory: Optional[str] = None,
+    input_fingerprint: Optional[retrieval.utils.input_fingerprint.InputFingerprint] = None,
 ) -> None:
+    """Move the outputs of a session into the results directory. For
+    Proffast 2.X, `pt_directory` replaces `prf/wrk_fast` as the source
+    of the pT and VMR files (used for the days of batched sessions).
+    `input_fingerprint` is stored in the `about.json` of the result. The
+    result is added to the results catalog once it is complete."""
+
     assert config.retrieval is not None
 
     date_string = session.ctx.from_datetime.strftime("%Y%m%d")
@@ -51,12 +60,9 @@ def run(
         logger.debug(f"Retrieval output csv is missing")
 
     # DETERMINE OUTPUT DIRECTORY PATHS
-    output_slug = session.ctx.from_datetime.strftime("%Y%m%d")
-    if not utils.functions.sdc_covers_the_full_day(session.ctx):
-        output_slug += session.ctx.from_datetime.strftime("_%H%M%S")
-        output_slug += session.ctx.to_datetime.strftime("_%H%M%S")
-    if session.job_settings.output_suffix is not None:
-        output_slug += f"_{session.job_settings.output_suffix}"
+    output_slug = utils.functions.get_output_slug(
+        session.ctx, session.job_settings.output_suffix
+    )
 
     output_dst = os.path.join(
         config.general.data.results.root, session.retrieval_algorithm,
@@ -82,8 +88,11 @@ def run(
 
     os.makedirs(os.path.dirname(output_dst), exist_ok=True)
 
+    # the container is removed after this step, so its outputs are moved
+    # instead of copied (a rename if the results are on the same filesystem)
+
     if os.path.isdir(output_src_dir):
-        shutil.copytree(output_src_dir, output_dst)
+        utils.transfer.move_tree(output_src_dir, output_dst)
 
         # STORE PT OUTPUT DIRECTORY
 
@@ -105,20 +114,20 @@ def run(
 
         os.makedirs(os.path.join(output_dst, "analysis"), exist_ok=True)
         if session.retrieval_algorithm == "proffast-1.0":
-            shutil.copytree(
+            utils.transfer.move_tree(
                 os.path.join(analysis_dir, "pT"),
                 os.path.join(output_dst, "analysis", "pT"),
             )
         else:
-            shutil.copytree(
-                os.path.join(session.ctn.container_path, "prf", "wrk_fast"),
+            utils.transfer.move_tree(
+                pt_directory or os.path.join(session.ctn.container_path, "prf", "wrk_fast"),
                 os.path.join(output_dst, "analysis", "pT"),
             )
 
         # (OPTIONAL) STORE BINARY SPECTRA
 
         if session.job_settings.store_binary_spectra:
-            shutil.copytree(
+            utils.transfer.move_tree(
                 os.path.join(analysis_dir, "cal"),
                 os.path.join(output_dst, "analysis", "cal"),
             )
@@ -127,7 +136,7 @@ def run(
                 "proffast-2.2", "proffast-2.3", "proffast-2.4", "proffast-2.4.1"
             ]:
                 os.makedirs(os.path.join(output_dst, "analysis", "cal"))
-                shutil.copyfile(
+                utils.transfer.move_file(
                     os.path.join(analysis_dir, "cal", "logfile.dat"),
                     os.path.join(output_dst, "analysis", "cal", "logfile.dat"),
                 )
@@ -164,5 +173,15 @@ def run(
                 "retrieval": dumped_config.retrieval.model_dump(mode="json"),
             },
             "session": session.model_dump(mode="json"),
+            "inputFingerprint": (
+                None if input_fingerprint is None else input_fingerprint.model_dump(mode="json")
+            ),
         }
         json.dump(about_dict, f, indent=4)
+
+    # ADD THE RESULT TO THE RESULTS CATALOG
+
+    try:
+        utils.results_catalog.add_result(config.general.data.results.root, output_dst)
+    except Exception as e:
+        logger.exception(e, label="Could not add the result to the results catalog")
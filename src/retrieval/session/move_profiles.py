@@ -1,5 +1,4 @@
 import os
-import shutil
 from src import types, utils
 
 
@@ -27,12 +26,12 @@ def run(
         ) for t in range(0, 22, 3)]
     try:
         for src, dst in files_to_copy:
-            shutil.copy(
+            utils.profile_store.copy_profile_file(
                 os.path.join(
                     config.general.data.atmospheric_profiles.root,
                     session.atmospheric_profile_model,
-                    src,
                 ),
+                src,
                 os.path.join(
                     session.ctn.data_input_path,
                     "map",
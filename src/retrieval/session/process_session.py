@@ -1,5 +1,8 @@
-from typing import Any
+from typing import Any, ContextManager, Literal, Optional
+import contextlib
 import datetime
+import os
+import shutil
 import signal
 from src import types, retrieval
 from . import (
@@ -9,10 +12,16 @@ from . import (
     move_outputs,
     update_templates,
     run_retrieval,
+    split_outputs,
 )
 
 
-def run(config: types.Config, session: types.RetrievalSession, test_mode: bool = False) -> None:
+def run(
+    config: types.Config,
+    session: types.RetrievalSession,
+    test_mode: bool = False,
+    stage_slots: Optional[retrieval.utils.stage_slots.StageSlots] = None,
+) -> None:
     signal.signal(signal.SIGINT, signal.SIG_IGN)
     logger = retrieval.utils.logger.Logger(
         container_id=session.ctn.container_id,
@@ -25,15 +34,26 @@ def run(config: types.Config, session: types.RetrievalSession, test_mode: bool =
     )
     logger.debug(f"Session object: {session.model_dump_json(indent=4)}")
 
+    # the inputs and outputs of batched sessions are handled like the ones
+    # of separate sessions for each day
+    day_sessions: list[types.RetrievalSession] = [session]
+    if isinstance(session, types.Proffast2RetrievalSession) and len(session.batch_ctxs) > 0:
+        logger.info(f"Batch of {len(session.batch_ctxs)} days")
+        day_sessions = [
+            session.model_copy(update={"ctx": sdc, "batch_ctxs": []})
+            for sdc in session.batch_ctxs
+        ]
+
     def _last_will() -> None:
-        retrieval.utils.retrieval_status.RetrievalStatusList.update_item(
-            session.retrieval_algorithm,
-            session.atmospheric_profile_model,
-            session.ctx.sensor_id,
-            session.ctx.from_datetime,
-            session.job_settings.output_suffix,
-            process_end_time=datetime.datetime.now(tz=datetime.timezone.utc),
-        )
+        for day_session in day_sessions:
+            retrieval.utils.retrieval_status.RetrievalStatusList.update_item(
+                day_session.retrieval_algorithm,
+                day_session.atmospheric_profile_model,
+                day_session.ctx.sensor_id,
+                day_session.ctx.from_datetime,
+                day_session.job_settings.output_suffix,
+                process_end_time=datetime.datetime.now(tz=datetime.timezone.utc),
+            )
         logger.archive()
 
     def _graceful_teardown(*args: Any) -> None:
@@ -45,15 +65,72 @@ def run(config: types.Config, session: types.RetrievalSession, test_mode: bool =
     signal.signal(signal.SIGTERM, _graceful_teardown)
     logger.info("Established graceful teardown hook")
 
+    def _stage(stage: retrieval.utils.stage_slots.RetrievalStage) -> ContextManager[None]:
+        if stage_slots is None:
+            return contextlib.nullcontext()
+        logger.debug(f"Waiting for a free slot of stage {stage}")
+        return stage_slots.acquire(stage)
+
+    # fingerprint the inputs before they are read so that inputs changing
+    # during the retrieval lead to a reprocessing later on
+    input_fingerprints: dict[datetime.date, retrieval.utils.input_fingerprint.InputFingerprint] = {}
+    for day_session in day_sessions:
+        try:
+            fingerprint = retrieval.utils.input_fingerprint.compute_input_fingerprint(
+                config,
+                day_session.retrieval_algorithm,
+                day_session.atmospheric_profile_model,
+                day_session.ctx,
+                day_session.job_settings,
+            )
+            input_fingerprints[day_session.ctx.from_datetime.date()] = fingerprint
+        except Exception as e:
+            logger.exception(e, label="Failed to compute the input fingerprint")
+
+    valid_ifg_count = 0
     try:
-        logger.debug("Moving atmospheric profiles")
-        move_profiles.run(config, session)
+        with _stage("inputs"):
+            valid_day_sessions: list[types.RetrievalSession] = []
+            for day_session in day_sessions:
+                try:
+                    if len(day_sessions) > 1:
+                        logger.debug(f"Moving inputs of {day_session.ctx.from_datetime.date()}")
+
+                    logger.debug("Moving atmospheric profiles")
+                    move_profiles.run(config, day_session)
 
-        logger.debug("Moving ground pressure files")
-        move_log_files.run(config, logger, session)
+                    logger.debug("Moving ground pressure files")
+                    move_log_files.run(config, logger, day_session)
 
-        logger.debug("Moving interferograms")
-        valid_ifg_count = move_ifg_files.run(config, logger, session)
+                    if day_session.job_settings.reprocess_from_spectra is None:
+                        logger.debug("Moving interferograms")
+                        valid_ifg_count += move_ifg_files.run(config, logger, day_session)
+                    else:
+                        logger.debug("Staging stored spectra")
+                        assert isinstance(day_session, types.Proffast2RetrievalSession)
+                        day_ifg_count = retrieval.utils.spectra_cache.stage_archived_spectra(
+                            config, day_session
+                        )
+                        logger.info(f"Reprocessing {day_ifg_count} stored spectra")
+                        valid_ifg_count += day_ifg_count
+                    valid_day_sessions.append(day_session)
+                except Exception as e:
+                    if len(day_sessions) == 1:
+                        raise e
+
+                    # the pylot retrieves every day with an interferogram directory
+                    logger.warning(
+                        f"Inputs of {day_session.ctx.from_datetime.date()} incomplete, " +
+                        f"removing this day from the batch: {e}"
+                    )
+                    shutil.rmtree(
+                        os.path.join(
+                            day_session.ctn.data_input_path, "ifg",
+                            day_session.ctx.from_datetime.strftime("%y%m%d")
+                        ),
+                        ignore_errors=True,
+                    )
+            assert len(valid_day_sessions) > 0, "no day of the batch has complete inputs"
     except Exception as e:
         logger.warning(f"Inputs incomplete: {e}")
         _last_will()
@@ -68,12 +145,76 @@ def run(config: types.Config, session: types.RetrievalSession, test_mode: bool =
             _last_will()
             return
 
+        spectra_cache_key: Optional[str] = None
+        if (config.retrieval is not None) and config.retrieval.general.use_spectra_cache and (
+            isinstance(session, types.Proffast2RetrievalSession)
+        ) and (session.job_settings.reprocess_from_spectra is None) and (
+            len(session.batch_ctxs) == 0
+        ):
+            try:
+                spectra_cache_key = retrieval.utils.spectra_cache.get_cache_key(session)
+                logger.debug(f"Spectra cache key: {spectra_cache_key}")
+                if retrieval.utils.spectra_cache.restore_spectra(session, spectra_cache_key):
+                    logger.info("Using cached spectra, skipping the preprocessing")
+                    spectra_cache_key = None
+            except Exception as e:
+                logger.exception(e, label="Failed to look up cached spectra")
+                spectra_cache_key = None
+
         logger.info(f"Running proffast")
+        assert config.retrieval is not None
+        preprocess_shard_count = config.retrieval.general.preprocess_shard_count
         try:
-            run_retrieval.run(session, test_mode=test_mode)
+            if stage_slots is None:
+                run_retrieval.run(
+                    session, test_mode=test_mode, preprocess_shard_count=preprocess_shard_count
+                )
+            else:
+                stages: list[Literal["preprocess", "pcxs", "invers"]] = [
+                    "preprocess", "pcxs", "invers"
+                ]
+                for stage in stages:
+                    with _stage(stage):
+                        logger.debug(f"Running stage {stage}")
+                        run_retrieval.run(
+                            session,
+                            test_mode=test_mode,
+                            stage=stage,
+                            preprocess_shard_count=preprocess_shard_count,
+                        )
             logger.debug("Pylot execution was successful")
         except Exception as e:
             logger.exception(e, label="Proffast execution failed")
+            # the spectra of failed executions might be incomplete
+            spectra_cache_key = None
+
+        if spectra_cache_key is not None:
+            assert isinstance(session, types.Proffast2RetrievalSession)
+            try:
+                if retrieval.utils.spectra_cache.store_spectra(session, spectra_cache_key):
+                    logger.debug("Stored spectra in cache")
+                    max_cache_size = config.retrieval.general.spectra_cache_max_size
+                    if max_cache_size is not None:
+                        removed_keys = retrieval.utils.spectra_cache.prune_cache(
+                            max_cache_size * 1_000_000_000
+                        )
+                        if len(removed_keys) > 0:
+                            logger.debug(f"Removed {len(removed_keys)} entries from the cache")
+            except Exception as e:
+                logger.exception(e, label="Failed to store spectra in cache")
+
+        max_mapfile_cache_size = config.retrieval.general.interpolated_mapfile_cache_max_size
+        if (session.retrieval_algorithm in ["proffast-2.4", "proffast-2.4.1"]) and (
+            session.atmospheric_profile_model == "GGG2020"
+        ) and (max_mapfile_cache_size is not None):
+            try:
+                removed_count = retrieval.utils.interpolated_mapfile_cache.prune_cache(
+                    max_mapfile_cache_size * 1_000_000_000
+                )
+                if removed_count > 0:
+                    logger.debug(f"Removed {removed_count} interpolated map files from the cache")
+            except Exception as e:
+                logger.exception(e, label="Failed to prune the interpolated map file cache")
     else:
         logger.info(f"Skipping proffast execution because there are no valid interferograms")
 
@@ -81,11 +222,33 @@ def run(config: types.Config, session: types.RetrievalSession, test_mode: bool =
     # proffast outputs of one day in this working directory
     # return
 
+    pt_directories: dict[datetime.date, str] = {}
+    if isinstance(session, types.Proffast2RetrievalSession) and len(session.batch_ctxs) > 0:
+        logger.info(f"Splitting the outputs of the batch")
+        try:
+            split_outputs.run(logger, session)
+            pt_directories = {
+                sdc.from_datetime.date():
+                split_outputs.get_pt_directory(session, sdc.from_datetime.date())
+                for sdc in session.batch_ctxs
+            }
+        except Exception as e:
+            logger.exception(e, label="Splitting the outputs failed")
+
     logger.info(f"Moving the outputs")
-    try:
-        move_outputs.run(config, logger, session, test_mode=test_mode)
-        logger.info(f"Finished")
-    except Exception as e:
-        logger.exception(e, label="Moving outputs failed")
+    with _stage("outputs"):
+        for day_session in valid_day_sessions:
+            try:
+                move_outputs.run(
+                    config,
+                    logger,
+                    day_session,
+                    test_mode=test_mode,
+                    pt_directory=pt_directories.get(day_session.ctx.from_datetime.date()),
+                    input_fingerprint=input_fingerprints.get(day_session.ctx.from_datetime.date()),
+                )
+                logger.info(f"Finished")
+            except Exception as e:
+                logger.exception(e, label="Moving outputs failed")
 
     _last_will()
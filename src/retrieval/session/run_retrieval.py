@@ -1,3 +1,4 @@
+from typing import Literal, Optional
 import json
 import os
 import sys
@@ -7,9 +8,20 @@ from src import types
 _PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(__file__, current_depth=4)
 
 
-def run(session: types.RetrievalSession, test_mode: bool = False) -> None:
+def run(
+    session: types.RetrievalSession,
+    test_mode: bool = False,
+    stage: Optional[Literal["preprocess", "pcxs", "invers"]] = None,
+    preprocess_shard_count: int = 1,
+) -> None:
+    """Run the retrieval algorithm in the container. If `stage` is given,
+    only that part of the retrieval is run; the stages have to be run in
+    the order preprocess, pcxs, invers. `preprocess_shard_count` is
+    ignored by Proffast 1.0."""
+
     if test_mode:
-        _create_mock_outputs(session)
+        if stage in [None, "invers"]:
+            _create_mock_outputs(session)
         return
 
     if isinstance(session, types.Proffast1RetrievalSession):
@@ -18,9 +30,14 @@ def run(session: types.RetrievalSession, test_mode: bool = False) -> None:
                 sys.executable,
                 os.path.join(session.ctn.container_path, "prfpylot", "main.py"),
                 '"' + json.dumps(session.model_dump()).replace('"', '\\"') + '"',
-            ])
+            ] + ([] if stage is None else [f"--stage {stage}"]))
         )
     elif isinstance(session, types.Proffast2RetrievalSession):
+        optional_arguments: list[str] = []
+        if (stage is not None) or (preprocess_shard_count > 1):
+            optional_arguments.append("all" if stage is None else stage)
+        if preprocess_shard_count > 1:
+            optional_arguments.append(str(preprocess_shard_count))
         tum_esm_utils.shell.run_shell_command(
             " ".join([
                 sys.executable,
@@ -30,31 +47,39 @@ def run(session: types.RetrievalSession, test_mode: bool = False) -> None:
                 ),
                 session.ctn.container_id,
                 session.ctn.pylot_config_path,
-            ])
+            ] + optional_arguments)
         )
     else:
         raise NotImplementedError(f"Retrieval session type {type(session)} not implemented")
 
 
 def _create_mock_outputs(session: types.RetrievalSession) -> None:
+    sdcs = [session.ctx]
+    if isinstance(session, types.Proffast2RetrievalSession) and len(session.batch_ctxs) > 0:
+        sdcs = session.batch_ctxs
     date_string = session.ctx.from_datetime.strftime("%Y%m%d")
+    last_date_string = sdcs[-1].from_datetime.strftime("%Y%m%d")
 
-    # determine analysis path
-    analysis_dir: str
+    # determine analysis paths
+    analysis_dirs: list[str]
     if session.retrieval_algorithm == "proffast-1.0":
-        analysis_dir = os.path.join(
-            session.ctn.data_output_path,
-            "analysis",
-            session.ctx.sensor_id,
-            session.ctx.from_datetime.strftime("%y%m%d"),
-        )
+        analysis_dirs = [
+            os.path.join(
+                session.ctn.data_output_path,
+                "analysis",
+                session.ctx.sensor_id,
+                session.ctx.from_datetime.strftime("%y%m%d"),
+            )
+        ]
     else:
-        analysis_dir = os.path.join(
-            session.ctn.data_output_path,
-            "analysis",
-            f"{session.ctx.sensor_id}_SN{session.ctx.serial_number:03d}",
-            session.ctx.from_datetime.strftime("%y%m%d"),
-        )
+        analysis_dirs = [
+            os.path.join(
+                session.ctn.data_output_path,
+                "analysis",
+                f"{session.ctx.sensor_id}_SN{session.ctx.serial_number:03d}",
+                sdc.from_datetime.strftime("%y%m%d"),
+            ) for sdc in sdcs
+        ]
 
     # create output directory
     output_dir: str
@@ -63,7 +88,7 @@ def _create_mock_outputs(session: types.RetrievalSession) -> None:
     else:
         output_dir = os.path.join(
             session.ctn.data_output_path, f"{session.ctx.sensor_id}_" +
-            f"SN{str(session.ctx.serial_number).zfill(3)}_{date_string[2:]}-{date_string[2:]}"
+            f"SN{str(session.ctx.serial_number).zfill(3)}_{date_string[2:]}-{last_date_string[2:]}"
         )
     os.makedirs(os.path.join(output_dir, "logfiles"), exist_ok=True)
 
@@ -82,7 +107,7 @@ def _create_mock_outputs(session: types.RetrievalSession) -> None:
         filepaths = [
             (
                 f"comb_invparms_{session.ctx.sensor_id}_SN{str(session.ctx.serial_number).zfill(3)}"
-                + f"_{date_string[2:]}-{date_string[2:]}.csv"
+                + f"_{date_string[2:]}-{last_date_string[2:]}.csv"
             ),
             "pylot_config.yml",
             "pylot_log_format.yml",
@@ -95,14 +120,19 @@ def _create_mock_outputs(session: types.RetrievalSession) -> None:
 
     for i, filepath in enumerate(filepaths):
         with open(os.path.join(output_dir, filepath), "w") as f:
-            if i == 0:
+            if i > 0:
+                f.write("...")
+            elif session.retrieval_algorithm == "proffast-1.0":
                 f.write("UTC, XAIR\nsome,0.9983")
             else:
-                f.write("...")
+                f.write("UTC, LocalTime, spectrum, XAIR")
+                for sdc in sdcs:
+                    spectrum = sdc.from_datetime.strftime("%y%m%d") + "_120000SN.BIN"
+                    f.write(f"\nsome, some, {spectrum}, 0.9983")
 
     for p in [
-        os.path.join(analysis_dir, "pT"),
-        os.path.join(analysis_dir, "cal"),
+        *[os.path.join(analysis_dir, "pT") for analysis_dir in analysis_dirs],
+        *[os.path.join(analysis_dir, "cal") for analysis_dir in analysis_dirs],
         os.path.join(session.ctn.container_path, "prf", "wrk_fast")
     ]:
         os.makedirs(p, exist_ok=True)
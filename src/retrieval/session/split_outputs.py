@@ -0,0 +1,118 @@
+import datetime
+import os
+import re
+import shutil
+from src import types, utils, retrieval
+
+
+def get_pt_directory(session: types.Proffast2RetrievalSession, date: datetime.date) -> str:
+    """Directory with the pT and VMR files of one day of a batched session.
+    It replaces `prf/wrk_fast` when moving the outputs of this day."""
+
+    return os.path.join(session.ctn.container_path, "prf", f"wrk_fast_{date.strftime('%y%m%d')}")
+
+
+def _filter_combined_csv(src: str, dst: str, date_string: str) -> None:
+    """Copy the combined output csv of the Pylot and only keep the rows
+    whose spectrum name starts with `date_string` (`YYMMDD`)."""
+
+    with open(src, "r") as f:
+        lines = f.read().split("\n")
+    spectrum_column = [c.strip() for c in lines[0].split(",")].index("spectrum")
+    with open(dst, "w") as f:
+        f.write(lines[0] + "\n")
+        for line in lines[1 :]:
+            columns = line.split(",")
+            if (len(columns) > spectrum_column
+               ) and columns[spectrum_column].strip().startswith(date_string):
+                f.write(line + "\n")
+
+
+def run(
+    logger: retrieval.utils.logger.Logger,
+    session: types.Proffast2RetrievalSession,
+) -> None:
+    """Split the outputs of a batched session into the outputs a session
+    of each single day would have produced.
+
+    The Pylot writes the results of all days into one directory
+    `SENSOR_SNXXX_YYMMDD-YYMMDD`, which is split into one such directory
+    per day. Files named after a day are moved to the directory of that
+    day, files named after the whole batch (like the combined output csv)
+    are copied to every day and renamed, and all other files (like the
+    Pylot config) are copied to every day. The pT and VMR files in
+    `prf/wrk_fast` are split into the `get_pt_directory` of each day."""
+
+    date_strings = [sdc.from_datetime.strftime("%y%m%d") for sdc in session.batch_ctxs]
+    prefix = f"{session.ctx.sensor_id}_SN{session.ctx.serial_number:03d}_"
+
+    def _get_day_directory(date_string: str) -> str:
+        return os.path.join(
+            session.ctn.data_output_path, f"{prefix}{date_string}-{date_string}"
+        )
+
+    def _distribute_file(src: str, dsts: list[str]) -> None:
+        for dst in dsts[1 :]:
+            utils.transfer.copy_file(src, dst)
+        os.replace(src, dsts[0])
+
+    batch_directories = [
+        d for d in os.listdir(session.ctn.data_output_path)
+        if re.match(rf"^{re.escape(prefix)}\d{{6}}-\d{{6}}$", d) is not None
+    ]
+    if len(batch_directories) != 1:
+        logger.warning(f"Found {len(batch_directories)} result directories of the batch")
+    elif len(set(batch_directories[0][len(prefix):].split("-"))) == 1:
+        logger.debug("Only one day of the batch has results, nothing to split")
+    else:
+        batch_directory = os.path.join(session.ctn.data_output_path, batch_directories[0])
+        batch_span = batch_directories[0][len(prefix):]
+        logger.debug(f"Splitting the results in {batch_directory}")
+        for root, _, filenames in os.walk(batch_directory):
+            relative_root = os.path.relpath(root, batch_directory)
+            for filename in filenames:
+                filepath = os.path.join(root, filename)
+                if batch_span in filename:
+                    for date_string in date_strings:
+                        dst = os.path.join(
+                            _get_day_directory(date_string),
+                            relative_root,
+                            filename.replace(batch_span, f"{date_string}-{date_string}"),
+                        )
+                        os.makedirs(os.path.dirname(dst), exist_ok=True)
+                        if filename.startswith("comb_invparms_") and filename.endswith(".csv"):
+                            _filter_combined_csv(filepath, dst, date_string)
+                        else:
+                            utils.transfer.copy_file(filepath, dst)
+                else:
+                    matching_date_strings = [d for d in date_strings if d in filename]
+                    dsts: list[str] = []
+                    for date_string in (matching_date_strings or date_strings):
+                        dst_directory = os.path.join(
+                            _get_day_directory(date_string), relative_root
+                        )
+                        os.makedirs(dst_directory, exist_ok=True)
+                        dsts.append(os.path.join(dst_directory, filename))
+                    _distribute_file(filepath, dsts)
+        shutil.rmtree(batch_directory)
+
+    wrk_fast_directory = os.path.join(session.ctn.container_path, "prf", "wrk_fast")
+    for sdc in session.batch_ctxs:
+        os.makedirs(get_pt_directory(session, sdc.from_datetime.date()), exist_ok=True)
+    if os.path.isdir(wrk_fast_directory):
+        for filename in os.listdir(wrk_fast_directory):
+            filepath = os.path.join(wrk_fast_directory, filename)
+            if not os.path.isfile(filepath):
+                continue
+            matching_sdcs = [
+                sdc for sdc in session.batch_ctxs if filename.startswith(
+                    session.ctx.sensor_id + sdc.from_datetime.strftime("%y%m%d")
+                )
+            ]
+            _distribute_file(
+                filepath,
+                [
+                    os.path.join(get_pt_directory(session, sdc.from_datetime.date()), filename)
+                    for sdc in (matching_sdcs or session.batch_ctxs)
+                ],
+            )
@@ -1,10 +1,19 @@
 from . import (
     ils,
+    input_fingerprint,
+    input_prefetch,
+    ifg_corruption_filter,
+    ifg_prescreen,
+    interpolated_mapfile_cache,
     invparms_files,
     logger,
+    opus_files,
+    preprocess_shards,
     pressure_averaging,
     pressure_loading,
     queue_watcher,
     retrieval_status,
+    spectra_cache,
+    stage_slots,
     job_queue,
 )
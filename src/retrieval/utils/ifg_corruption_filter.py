@@ -0,0 +1,125 @@
+from __future__ import annotations
+from typing import Optional
+import concurrent.futures
+import hashlib
+import importlib.metadata
+import os
+import tempfile
+import filelock
+import pydantic
+import tum_esm_utils
+
+_CACHE_DIR = tum_esm_utils.files.rel_to_abs_path("../../../data/ifg_corruption_cache")
+
+# verdicts of other versions of the filter are discarded
+_FILTER_VERSION = f"tum-esm-utils=={importlib.metadata.version('tum_esm_utils')}"
+
+# below this number of interferograms per shard, starting another
+# parser process costs more than it saves
+_MIN_SHARD_SIZE = 50
+
+
+class IfgVerdictCache(pydantic.BaseModel):
+    """Verdicts of the corruption filter for the interferograms of one
+    directory. Keyed by `filename:size:mtime_ns`, the values are the error
+    messages of the filter (an empty list means the file is not corrupt)."""
+
+    filter_version: str
+    verdicts: dict[str, list[str]]
+
+    @staticmethod
+    def get_path(ifg_directory: str) -> str:
+        directory_hash = hashlib.sha256(os.path.realpath(ifg_directory).encode()).hexdigest()
+        return os.path.join(_CACHE_DIR, f"{directory_hash[:24]}.json")
+
+    @staticmethod
+    def get_key(ifg_directory: str, filename: str) -> str:
+        stat = os.stat(os.path.join(ifg_directory, filename))
+        return f"{filename}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    @staticmethod
+    def with_filelock(ifg_directory: str) -> filelock.FileLock:
+        return filelock.FileLock(IfgVerdictCache.get_path(ifg_directory) + ".lock", timeout=30)
+
+    @staticmethod
+    def load(ifg_directory: str) -> IfgVerdictCache:
+        """Load the cache of a directory from disk."""
+
+        try:
+            with open(IfgVerdictCache.get_path(ifg_directory), "r") as f:
+                cache = IfgVerdictCache.model_validate_json(f.read())
+            if cache.filter_version == _FILTER_VERSION:
+                return cache
+        except (FileNotFoundError, pydantic.ValidationError):
+            pass
+        return IfgVerdictCache(filter_version=_FILTER_VERSION, verdicts={})
+
+    def dump(self, ifg_directory: str) -> None:
+        """Save the cache of a directory to disk."""
+
+        path = IfgVerdictCache.get_path(ifg_directory)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.model_dump_json())
+        os.replace(tmp_path, path)
+
+
+def _detect_corrupt_files_in_shard(
+    ifg_directory: str,
+    filenames: list[str],
+) -> dict[str, list[str]]:
+    with tempfile.TemporaryDirectory(prefix="ifg-corruption-filter-") as shard_directory:
+        for filename in filenames:
+            os.symlink(
+                os.path.join(ifg_directory, filename), os.path.join(shard_directory, filename)
+            )
+        return tum_esm_utils.em27.detect_corrupt_opus_files(ifg_directory=shard_directory)
+
+
+def detect_corrupt_files(
+    ifg_directory: str,
+    filenames: list[str],
+    max_process_count: int = 1,
+    use_cache: bool = True,
+    cache_directory: Optional[str] = None,
+) -> dict[str, list[str]]:
+    """Run the corruption filter of `tum_esm_utils` on the given files of a
+    directory and return the error messages of all corrupt files.
+
+    Files which have been checked before (same directory, name, size and
+    modification time, and same filter version) are not checked again. The
+    other files are split into up to `max_process_count` shards which are
+    checked by parallel parser processes.
+
+    The verdicts are cached under `cache_directory` if given, e.g. when
+    `ifg_directory` is a local copy of the original directory."""
+
+    if cache_directory is None:
+        cache_directory = ifg_directory
+    verdicts: dict[str, list[str]] = {}
+    keys = {f: IfgVerdictCache.get_key(ifg_directory, f) for f in filenames}
+    if use_cache:
+        cache = IfgVerdictCache.load(cache_directory)
+        verdicts = {f: cache.verdicts[k] for f, k in keys.items() if k in cache.verdicts}
+
+    unchecked_filenames = [f for f in filenames if f not in verdicts]
+    if len(unchecked_filenames) > 0:
+        shard_count = max(1, min(max_process_count, len(unchecked_filenames) // _MIN_SHARD_SIZE))
+        shards = [unchecked_filenames[i :: shard_count] for i in range(shard_count)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=shard_count) as executor:
+            shard_results = list(
+                executor.map(lambda s: _detect_corrupt_files_in_shard(ifg_directory, s), shards)
+            )
+        for shard, shard_result in zip(shards, shard_results):
+            for filename in shard:
+                verdicts[filename] = shard_result.get(filename, [])
+
+        if use_cache:
+            os.makedirs(_CACHE_DIR, exist_ok=True)
+            with IfgVerdictCache.with_filelock(cache_directory):
+                cache = IfgVerdictCache.load(cache_directory)
+                cache.verdicts.update({keys[f]: verdicts[f] for f in unchecked_filenames})
+                cache.dump(cache_directory)
+
+    return {f: verdicts[f] for f in filenames if len(verdicts[f]) > 0}
+
@@ -0,0 +1,134 @@
+from typing import Optional
+import datetime
+import math
+import os
+import numpy as np
+from . import opus_files, pressure_averaging
+
+# the preprocess smoothes each interferogram 400 times with a [1/4, 1/2, 1/4]
+# kernel before checking its DC level and variation (`DCtoACifg`); this is
+# equal to a single convolution of the mirrored interferogram with a binomial
+# kernel, which is much faster for interferograms with ~100k points
+_SMOOTHING_ITERATIONS = 400
+_SMOOTHING_KERNEL = np.array(
+    [math.comb(2 * _SMOOTHING_ITERATIONS, k) for k in range(2 * _SMOOTHING_ITERATIONS + 1)],
+    dtype=np.float64,
+) / 2.0**(2 * _SMOOTHING_ITERATIONS)
+
+# the preprocess computes in single precision, so files which are only just
+# outside of the thresholds are not rejected
+_MARGIN = 0.01
+
+
+def _smooth(scan: np.ndarray) -> np.ndarray:
+    """Smooth one direction of an interferogram like the preprocess. At the
+    edges, the preprocess uses the mean of the two outermost values, which
+    equals mirroring the interferogram without repeating the edge value."""
+
+    padded = np.pad(scan.astype(np.float64), _SMOOTHING_ITERATIONS, mode="reflect")
+    fft_size = 1 << (len(padded) + len(_SMOOTHING_KERNEL) - 2).bit_length()
+    smoothed = np.fft.irfft(
+        np.fft.rfft(padded, fft_size) * np.fft.rfft(_SMOOTHING_KERNEL, fft_size), fft_size
+    )
+    return smoothed[2 * _SMOOTHING_ITERATIONS : 2 * _SMOOTHING_ITERATIONS + len(scan)]
+
+
+def _read_dc_statistics(filepath: str) -> Optional[list[tuple[float, float]]]:
+    """Compute the DC level and DC variation of the forward and the backward
+    interferogram of the first channel of an OPUS file in the same way as the
+    preprocess. Returns `None` if the file could not be parsed."""
+
+    try:
+        data = np.memmap(filepath, dtype=np.uint8, mode="r")
+    except (OSError, ValueError):
+        return None
+    directory = opus_files.read_block_directory(data)
+    if directory is None:
+        return None
+    ifg_block = opus_files.get_block(data, directory, opus_files.IFG_BLOCK_TYPE)
+    if (ifg_block is None) or (len(ifg_block) % 8 != 0):
+        return None
+    ifg = ifg_block.view("<f4")
+    point_count = len(ifg) // 2
+    if point_count <= _SMOOTHING_ITERATIONS:
+        return None
+
+    statistics: list[tuple[float, float]] = []
+    for direction in [ifg[: point_count], ifg[point_count :]]:
+        smoothed = _smooth(direction)
+        min_value = smoothed[np.argmin(np.abs(smoothed))]
+        max_value = smoothed[np.argmax(np.abs(smoothed))]
+        if min_value == 0:
+            statistics.append((0.0, float("inf")))
+        else:
+            statistics.append((float(smoothed.mean()), float(max_value / min_value - 1)))
+    return statistics
+
+
+def screen_interferograms(
+    ifg_directory: str,
+    filenames: list[str],
+    dc_min_threshold: float,
+    dc_var_threshold: float,
+) -> dict[str, str]:
+    """Find the interferograms which the preprocess would reject because
+    their DC level is below `dc_min_threshold` or their DC variation is
+    above `dc_var_threshold`, e.g. scans during cloudy periods.
+
+    Files which cannot be parsed are never rejected here since the
+    corruption filter and the preprocess handle them.
+
+    Returns a dict mapping the rejected filenames to the reason."""
+
+    rejected: dict[str, str] = {}
+    for filename in filenames:
+        statistics = _read_dc_statistics(os.path.join(ifg_directory, filename))
+        if statistics is None:
+            continue
+        for dc_mean, dc_var in statistics:
+            if abs(dc_mean) < dc_min_threshold * (1 - _MARGIN):
+                rejected[filename] = f"DC level {abs(dc_mean):.4f} below {dc_min_threshold}"
+                break
+            if abs(dc_var) > dc_var_threshold * (1 + _MARGIN):
+                rejected[filename] = f"DC variation {abs(dc_var):.4f} above {dc_var_threshold}"
+                break
+    return rejected
+
+
+def screen_solar_zenith_angles(
+    ifg_directory: str,
+    filenames: list[str],
+    lat: float,
+    lon: float,
+    alt: float,
+    utc_offset: float,
+    max_sza: float,
+) -> dict[str, str]:
+    """Find the interferograms recorded at a solar zenith angle above
+    `max_sza`. The measurement times are read from the OPUS headers (local
+    instrument time, converted to UTC with `utc_offset` like in the Proffast
+    preprocess) and the solar zenith angles of all files are computed at
+    once. Files without a readable measurement time are never rejected.
+
+    Returns a dict mapping the rejected filenames to the reason."""
+
+    measurement_times: dict[str, datetime.datetime] = {}
+    for filename in filenames:
+        try:
+            data = np.memmap(os.path.join(ifg_directory, filename), dtype=np.uint8, mode="r")
+        except (OSError, ValueError):
+            continue
+        local_time = opus_files.read_local_measurement_time(data)
+        if local_time is not None:
+            measurement_times[filename] = (
+                local_time - datetime.timedelta(hours=utc_offset)
+            ).replace(tzinfo=datetime.timezone.utc)
+
+    solar_zenith_angles = pressure_averaging.compute_solar_zenith_angles(
+        lat, lon, alt, list(measurement_times.values())
+    )
+    return {
+        filename: f"solar zenith angle {sza:.2f} above {max_sza}"
+        for filename, sza in zip(measurement_times.keys(), solar_zenith_angles)
+        if sza > max_sza
+    }
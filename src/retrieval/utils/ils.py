@@ -1,3 +1,6 @@
+from typing import Optional
+import bisect
+import functools
 import os
 import polars as pl
 import pydantic
@@ -13,7 +16,12 @@ class ILSParams(pydantic.BaseModel):
     channel2_pe: float
 
 
-def get_ils_params(serial_number: int, date: datetime.date) -> ILSParams:
+@functools.lru_cache(maxsize=1)
+def _load_ils_table() -> dict[str, tuple[list[datetime.date], list[ILSParams]]]:
+    """Load the ILS parameters once per process. Returns a mapping from the
+    serial number (`SN061`) to the sorted list of `VALID_SINCE` dates and
+    the list of ILS parameters valid from each of these dates on."""
+
     df = pl.read_csv(
         _ILS_PARAMS_PATH,
         columns=[
@@ -40,17 +48,43 @@ def get_ils_params(serial_number: int, date: datetime.date) -> ILSParams:
             "CHANNEL2_PE": pl.Float64,
             "VALID_SINCE": pl.Date,
         },
-    )
+    ).sort("VALID_SINCE", maintain_order=True)
+
+    table: dict[str, tuple[list[datetime.date], list[ILSParams]]] = {}
+    for row in df.iter_rows(named=True):
+        valid_since_dates, ils_params = table.setdefault(row["SERIAL_NUMBER"], ([], []))
+        valid_since_dates.append(row["VALID_SINCE"])
+        ils_params.append(
+            ILSParams(
+                channel1_me=row["CHANNEL1_ME"],
+                channel1_pe=row["CHANNEL1_PE"],
+                channel2_me=row["CHANNEL2_ME"],
+                channel2_pe=row["CHANNEL2_PE"],
+            )
+        )
+    return table
+
+
+def _lookup_ils_params(serial_number: int, date: datetime.date) -> Optional[ILSParams]:
+    entry = _load_ils_table().get(f"SN{serial_number:03d}")
+    if entry is None:
+        return None
+    valid_since_dates, ils_params = entry
+    index = bisect.bisect_right(valid_since_dates, date) - 1
+    return ils_params[index] if index >= 0 else None
+
+
+def get_ils_params(serial_number: int, date: datetime.date) -> ILSParams:
+    ils_params = _lookup_ils_params(serial_number, date)
+    assert ils_params is not None, f"No ILS parameters found for {serial_number} at {date}"
+    return ils_params
 
-    df = df.filter(pl.col("SERIAL_NUMBER") == f"SN{serial_number:03d}")
-    df = df.filter(pl.col("VALID_SINCE") <= date)
-    df = df.sort("VALID_SINCE", descending=True)
 
-    assert len(df) > 0, f"No ILS parameters found for {serial_number} at {date}"
+def get_ils_params_for_queue(
+    items: list[tuple[int, datetime.date]],
+) -> dict[tuple[int, datetime.date], Optional[ILSParams]]:
+    """Resolve the ILS parameters for many `(serial_number, date)` pairs at
+    once, e.g. for a whole retrieval queue. Pairs without ILS parameters
+    are mapped to `None`."""
 
-    return ILSParams(
-        channel1_me=df["CHANNEL1_ME"][0],
-        channel1_pe=df["CHANNEL1_PE"][0],
-        channel2_me=df["CHANNEL2_ME"][0],
-        channel2_pe=df["CHANNEL2_PE"][0],
-    )
+    return {item: _lookup_ils_params(*item) for item in set(items)}
@@ -0,0 +1,294 @@
+from __future__ import annotations
+from typing import Any, Optional
+import hashlib
+import json
+import os
+import zlib
+import em27_metadata
+import filelock
+import pydantic
+import tum_esm_utils
+from src import types, utils
+from . import pressure_loading, spectra_cache
+
+_DATA_DIR = tum_esm_utils.files.rel_to_abs_path("../../../data")
+_FILE_CHECKSUM_CACHE_PATH = os.path.join(_DATA_DIR, "input_file_checksum_cache.json")
+_RESULT_FINGERPRINT_INDEX_PATH = os.path.join(_DATA_DIR, "result_fingerprint_index.json")
+
+# only the metadata and job settings which change the results are part of
+# the fingerprint, so new (or upgraded) fields of the metadata or settings
+# do not requeue all results; extending these lists does
+_METADATA_FIELDS: dict[str, Any] = {
+    "serial_number": True,
+    "from_datetime": True,
+    "to_datetime": True,
+    "utc_offset": True,
+    "pressure_data_source": True,
+    "location": {"lat", "lon", "alt"},
+    "atmospheric_profile_location": {"lat", "lon", "alt"},
+}
+_JOB_SETTINGS_FIELDS: set[str] = {
+    "dc_min_threshold",
+    "dc_var_threshold",
+    "use_local_pressure_in_pcxs",
+    "use_ifg_corruption_filter",
+    "use_ifg_prescreen",
+    "max_sza",
+    "custom_ils",
+    "reprocess_from_spectra",
+}
+
+
+def _digest(value: Any) -> str:
+    """Short sha256 of the JSON representation of a value."""
+
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[: 16]
+
+
+class InputFingerprint(pydantic.BaseModel):
+    """Short hashes of everything a retrieval result of one sensor data
+    context depends on: the names, sizes and modification times of the
+    interferograms (or of the stored spectra when reprocessing from
+    spectra), the contents of the ground pressure and map files, and the
+    parts of the sensor data context and the job settings which affect the
+    results. Stored in the `about.json` of every result."""
+
+    interferograms: str
+    ground_pressure: str
+    atmospheric_profiles: str
+    metadata: str
+    job_settings: str
+
+    def get_changed_inputs(self, other: InputFingerprint) -> list[str]:
+        """Names of the inputs that differ between two fingerprints."""
+
+        return [
+            field for field in InputFingerprint.model_fields.keys()
+            if getattr(self, field) != getattr(other, field)
+        ]
+
+
+class _FileChecksum(pydantic.BaseModel):
+    size: int
+    mtime_ns: int
+    checksum: str
+
+
+class FileChecksumCache(pydantic.RootModel[dict[str, _FileChecksum]]):
+    """Checksums of input files keyed by their path. A checksum is reused
+    as long as the size and the modification time of the file do not
+    change, so every file is only read once."""
+
+    root: dict[str, _FileChecksum]
+
+    @staticmethod
+    def with_filelock() -> filelock.FileLock:
+        return filelock.FileLock(_FILE_CHECKSUM_CACHE_PATH + ".lock", timeout=15)
+
+    @staticmethod
+    def load() -> FileChecksumCache:
+        """Load the cache from disk."""
+
+        try:
+            with open(_FILE_CHECKSUM_CACHE_PATH, "r") as f:
+                return FileChecksumCache.model_validate_json(f.read())
+        except (FileNotFoundError, pydantic.ValidationError):
+            return FileChecksumCache(root={})
+
+    def dump(self) -> None:
+        """Save the cache to disk."""
+
+        tmp_path = f"{_FILE_CHECKSUM_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.model_dump_json())
+        os.replace(tmp_path, _FILE_CHECKSUM_CACHE_PATH)
+
+
+def get_file_checksums(filepaths: list[str]) -> list[str]:
+    """CRC32 and size of many files, in the same format as
+    `utils.profile_store.get_packed_profile_file_checksum`. Results are
+    memoised in `data/input_file_checksum_cache.json` which is shared
+    between all processes."""
+
+    cache = FileChecksumCache.load()
+    new_checksums: dict[str, _FileChecksum] = {}
+    checksums: list[str] = []
+    for filepath in filepaths:
+        stat = os.stat(filepath)
+        cached_checksum = cache.root.get(filepath)
+        if (cached_checksum is None) or (cached_checksum.size != stat.st_size
+                                        ) or (cached_checksum.mtime_ns != stat.st_mtime_ns):
+            crc = 0
+            with open(filepath, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    crc = zlib.crc32(chunk, crc)
+            cached_checksum = _FileChecksum(
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                checksum=f"crc32:{crc:08x}:{stat.st_size}",
+            )
+            new_checksums[filepath] = cached_checksum
+        checksums.append(cached_checksum.checksum)
+
+    if len(new_checksums) > 0:
+        with FileChecksumCache.with_filelock():
+            latest_cache = FileChecksumCache.load()
+            latest_cache.root.update(new_checksums)
+            latest_cache.dump()
+
+    return checksums
+
+
+def compute_input_fingerprint(
+    config: types.Config,
+    retrieval_algorithm: types.RetrievalAlgorithm,
+    atmospheric_profile_model: types.AtmosphericProfileModel,
+    sdc: em27_metadata.types.SensorDataContext,
+    job_settings: types.config.RetrievalJobSettingsConfig,
+) -> InputFingerprint:
+    """Compute the fingerprint of the current inputs of a sensor data
+    context. The interferograms are only listed, not read; missing inputs
+    lead to an empty list of files in their part of the fingerprint."""
+
+    assert config.retrieval is not None
+    date = sdc.from_datetime.date()
+
+    # interferograms or stored spectra
+
+    ifg_files: list[tuple[str, int, int]] = []
+    if job_settings.reprocess_from_spectra is None:
+        ifg_directory = os.path.join(
+            config.general.data.interferograms.root, sdc.sensor_id, date.strftime("%Y%m%d")
+        )
+        _, ifg_file_pattern = utils.text.replace_regex_placeholders(
+            config.retrieval.general.ifg_file_regex, sdc.sensor_id, date
+        )
+    else:
+        ifg_directory = spectra_cache.find_archived_spectra(
+            config, retrieval_algorithm, job_settings.reprocess_from_spectra, sdc
+        ) or ""
+        ifg_file_pattern = None
+    if os.path.isdir(ifg_directory):
+        with os.scandir(ifg_directory) as entries:
+            for entry in entries:
+                if (ifg_file_pattern is None) or (ifg_file_pattern.match(entry.name) is not None):
+                    stat = entry.stat()
+                    ifg_files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+
+    # ground pressure files
+
+    c = config.general.data.ground_pressure
+    _, _, pressure_filenames = pressure_loading.find_pressure_files(
+        c.path.root, sdc.pressure_data_source, c.file_regex, date
+    )
+    pressure_filepaths = [
+        os.path.join(c.path.root, sdc.pressure_data_source, f) for f in pressure_filenames
+    ]
+
+    # atmospheric profiles (the checksums of packed files are read from their archive)
+
+    profiles_directory = os.path.join(
+        config.general.data.atmospheric_profiles.root, atmospheric_profile_model
+    )
+    coordinates_slug = utils.text.get_coordinates_slug(
+        sdc.atmospheric_profile_location.lat, sdc.atmospheric_profile_location.lon
+    )
+    profile_filenames: list[str]
+    if atmospheric_profile_model == "GGG2014":
+        profile_filenames = [f"{date.strftime('%Y%m%d')}_{coordinates_slug}.map"]
+    else:
+        profile_filenames = [
+            f"{date.strftime('%Y%m%d')}{t:02d}_{coordinates_slug}.map" for t in range(0, 22, 3)
+        ]
+    profile_checksums: dict[str, Optional[str]] = {}
+    loose_profile_filenames: list[str] = []
+    for filename in profile_filenames:
+        profile_checksums[filename] = utils.profile_store.get_packed_profile_file_checksum(
+            profiles_directory, filename
+        )
+        if profile_checksums[filename] is None and os.path.isfile(
+            os.path.join(profiles_directory, filename)
+        ):
+            loose_profile_filenames.append(filename)
+    for filename, checksum in zip(
+        loose_profile_filenames,
+        get_file_checksums([os.path.join(profiles_directory, f) for f in loose_profile_filenames]),
+    ):
+        profile_checksums[filename] = checksum
+
+    return InputFingerprint(
+        interferograms=_digest(sorted(ifg_files)),
+        ground_pressure=_digest(
+            list(zip(pressure_filenames, get_file_checksums(pressure_filepaths)))
+        ),
+        atmospheric_profiles=_digest(profile_checksums),
+        metadata=_digest(sdc.model_dump(mode="json", include=_METADATA_FIELDS)),
+        job_settings=_digest(job_settings.model_dump(mode="json", include=_JOB_SETTINGS_FIELDS)),
+    )
+
+
+class _ResultFingerprint(pydantic.BaseModel):
+    mtime_ns: int
+    fingerprint: Optional[InputFingerprint]
+
+
+class ResultFingerprintIndex(pydantic.RootModel[dict[str, _ResultFingerprint]]):
+    """Input fingerprints of existing results keyed by the path of their
+    `about.json`. An entry is valid as long as the modification time of
+    the `about.json` does not change, so the queue generation only reads
+    the `about.json` files of new or reprocessed results."""
+
+    root: dict[str, _ResultFingerprint]
+
+    @staticmethod
+    def load() -> ResultFingerprintIndex:
+        """Load the index from disk."""
+
+        try:
+            with open(_RESULT_FINGERPRINT_INDEX_PATH, "r") as f:
+                return ResultFingerprintIndex.model_validate_json(f.read())
+        except (FileNotFoundError, pydantic.ValidationError):
+            return ResultFingerprintIndex(root={})
+
+    def dump(self) -> None:
+        """Save the index to disk."""
+
+        tmp_path = f"{_RESULT_FINGERPRINT_INDEX_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.model_dump_json())
+        os.replace(tmp_path, _RESULT_FINGERPRINT_INDEX_PATH)
+
+
+def get_stored_fingerprints(result_directories: list[str]) -> dict[str, Optional[InputFingerprint]]:
+    """Input fingerprints stored in the `about.json` of the given result
+    directories. `None` for results without an `about.json` or without a
+    fingerprint (e.g. results of older pipeline versions)."""
+
+    index = ResultFingerprintIndex.load()
+    index_was_updated = False
+    fingerprints: dict[str, Optional[InputFingerprint]] = {}
+    for result_directory in result_directories:
+        about_path = os.path.join(result_directory, "about.json")
+        try:
+            mtime_ns = os.stat(about_path).st_mtime_ns
+        except FileNotFoundError:
+            fingerprints[result_directory] = None
+            continue
+        entry = index.root.get(about_path)
+        if (entry is None) or (entry.mtime_ns != mtime_ns):
+            fingerprint: Optional[InputFingerprint] = None
+            try:
+                raw_fingerprint = tum_esm_utils.files.load_json_file(about_path
+                                                                    ).get("inputFingerprint")
+                if raw_fingerprint is not None:
+                    fingerprint = InputFingerprint.model_validate(raw_fingerprint)
+            except (ValueError, pydantic.ValidationError):
+                pass
+            entry = _ResultFingerprint(mtime_ns=mtime_ns, fingerprint=fingerprint)
+            index.root[about_path] = entry
+            index_was_updated = True
+        fingerprints[result_directory] = entry.fingerprint
+
+    if index_was_updated:
+        index.dump()
+    return fingerprints
@@ -0,0 +1,180 @@
+from typing import Optional
+import concurrent.futures
+import datetime
+import hashlib
+import os
+import shutil
+import threading
+import time
+import tum_esm_utils
+from src import types, utils
+from .logger import Logger
+
+_PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(__file__, current_depth=4)
+
+# the scratch directory may be shared by several installations of the
+# pipeline, each of them removes its own prefetch directory on startup
+_SUBDIRECTORY = "em27-retrieval-prefetch-" + hashlib.sha256(
+    os.path.realpath(_PROJECT_DIR).encode()
+).hexdigest()[: 12]
+
+# sensor days which could not be prefetched are tried again after this time
+_RETRY_INTERVAL = 600
+
+
+def _get_prefetch_root(config: types.Config) -> Optional[str]:
+    if (config.retrieval is None) or (config.retrieval.general.input_prefetch is None):
+        return None
+    return os.path.join(config.retrieval.general.input_prefetch.scratch_dir.root, _SUBDIRECTORY)
+
+
+def get_prefetched_directory(
+    config: types.Config,
+    sensor_id: str,
+    date: datetime.date,
+) -> Optional[str]:
+    """Return the local copy of the interferogram directory of a sensor day
+    if it has been prefetched completely."""
+
+    prefetch_root = _get_prefetch_root(config)
+    if prefetch_root is None:
+        return None
+    directory = os.path.join(prefetch_root, sensor_id, date.strftime("%Y%m%d"))
+    return directory if os.path.isdir(directory) else None
+
+
+class InputPrefetcher:
+    """Copies the interferograms of upcoming retrievals to a local scratch
+    directory in background threads. Runs in the main process; the sessions
+    pick up the copies using `get_prefetched_directory`.
+
+    A sensor day is copied into a temporary directory which is renamed
+    once all files have been copied, so sessions never see partial copies.
+    The total size of all prefetched and currently copied sensor days is
+    bounded by `max_size_gb`."""
+
+    def __init__(self, config: types.Config, logger: Logger) -> None:
+        assert config.retrieval is not None
+        prefetch_config = config.retrieval.general.input_prefetch
+        prefetch_root = _get_prefetch_root(config)
+        assert (prefetch_config is not None) and (prefetch_root is not None)
+
+        self.config = config
+        self.logger = logger
+        self.root = prefetch_root
+        self.lookahead = prefetch_config.lookahead
+        self.max_bytes = int(prefetch_config.max_size_gb * 1e9)
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=prefetch_config.thread_count, thread_name_prefix="prefetch"
+        )
+        self.lock = threading.Lock()
+        self.reserved_bytes: dict[tuple[str, datetime.date], int] = {}
+        self.futures: dict[tuple[str, datetime.date], concurrent.futures.Future[None]] = {}
+        # time at which a sensor day has been skipped
+        self.skipped: dict[tuple[str, datetime.date], float] = {}
+
+        # remove leftovers of previous runs
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root)
+
+    def _list_interferograms(self, sensor_id: str, date: datetime.date) -> list[str]:
+        assert self.config.retrieval is not None
+        ifg_src_directory = os.path.join(
+            self.config.general.data.interferograms.root, sensor_id, date.strftime("%Y%m%d")
+        )
+        _, ifg_file_pattern = utils.text.replace_regex_placeholders(
+            self.config.retrieval.general.ifg_file_regex, sensor_id, date
+        )
+        return [
+            os.path.join(ifg_src_directory, f)
+            for f in sorted(os.listdir(ifg_src_directory))
+            if ifg_file_pattern.match(f) is not None
+        ]
+
+    def _copy(self, sensor_id: str, date: datetime.date, filepaths: list[str]) -> None:
+        dst_directory = os.path.join(self.root, sensor_id, date.strftime("%Y%m%d"))
+        tmp_directory = dst_directory + ".tmp"
+        try:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            os.makedirs(tmp_directory)
+            for filepath in filepaths:
+                # the copies keep the modification times, so the caches
+                # of the corruption filter stay valid for them
+                utils.transfer.copy_file(
+                    filepath, os.path.join(tmp_directory, os.path.basename(filepath))
+                )
+            os.rename(tmp_directory, dst_directory)
+        except Exception as e:
+            self.logger.exception(e, label=f"Could not prefetch interferograms of {sensor_id}")
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            with self.lock:
+                self.skipped[(sensor_id, date)] = time.monotonic()
+                self.reserved_bytes.pop((sensor_id, date), None)
+                self.futures.pop((sensor_id, date), None)
+
+    def update(
+        self,
+        upcoming_days: list[tuple[str, datetime.date]],
+        running_days: list[tuple[str, datetime.date]],
+    ) -> None:
+        """Remove the copies which are not needed anymore and start copying
+        the next upcoming sensor days (in queue order) while they fit into
+        the byte budget. Days larger than the whole budget or which could
+        not be copied are skipped; they are tried again after
+        `_RETRY_INTERVAL` seconds or when they are queued again later."""
+
+        next_days = list(dict.fromkeys(upcoming_days))[: self.lookahead]
+        needed_days = set(next_days).union(running_days)
+
+        with self.lock:
+            for key in list(self.reserved_bytes.keys()):
+                if (key not in needed_days) and self.futures[key].done():
+                    shutil.rmtree(
+                        os.path.join(self.root, key[0], key[1].strftime("%Y%m%d")),
+                        ignore_errors=True,
+                    )
+                    del self.reserved_bytes[key]
+                    del self.futures[key]
+            now = time.monotonic()
+            for key, skip_time in list(self.skipped.items()):
+                if (key not in needed_days) or (now - skip_time >= _RETRY_INTERVAL):
+                    del self.skipped[key]
+
+            for sensor_id, date in next_days:
+                key = (sensor_id, date)
+                if (key in self.reserved_bytes) or (key in self.skipped):
+                    continue
+                try:
+                    filepaths = self._list_interferograms(sensor_id, date)
+                    size = sum(os.stat(f).st_size for f in filepaths)
+                except OSError:
+                    self.skipped[key] = now
+                    continue
+                if size > self.max_bytes:
+                    self.logger.debug(
+                        f"Not prefetching interferograms of {sensor_id} on {date} " +
+                        f"({size / 1e9:.2f} GB exceed the budget)"
+                    )
+                    self.skipped[key] = now
+                    continue
+                if sum(self.reserved_bytes.values()) + size > self.max_bytes:
+                    break
+                self.logger.debug(
+                    f"Prefetching {len(filepaths)} interferograms of {sensor_id} on {date} " +
+                    f"({size / 1e9:.2f} GB)"
+                )
+                self.reserved_bytes[key] = size
+                self.futures[key] = self.executor.submit(self._copy, sensor_id, date, filepaths)
+
+    def wait(self) -> None:
+        """Block until all started copies are finished."""
+
+        with self.lock:
+            futures = list(self.futures.values())
+        concurrent.futures.wait(futures)
+
+    def teardown(self) -> None:
+        """Stop copying and remove all prefetched files."""
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(self.root, ignore_errors=True)
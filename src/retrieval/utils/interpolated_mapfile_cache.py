@@ -0,0 +1,56 @@
+import os
+import tum_esm_utils
+from src import types, utils
+
+# noon-interpolated GGG2020 map files, shared between all containers and
+# keyed by location, local noon in UTC and the contents of the map files
+_CACHE_DIR = tum_esm_utils.files.rel_to_abs_path("../../../data/interpolated_mapfiles")
+
+
+def get_cache_dir(session: types.Proffast2RetrievalSession) -> str:
+    """The directory in which the Pylot caches the interpolated map files
+    of the session's location."""
+
+    return os.path.join(
+        _CACHE_DIR,
+        session.atmospheric_profile_model,
+        utils.text.get_coordinates_slug(
+            session.ctx.atmospheric_profile_location.lat,
+            session.ctx.atmospheric_profile_location.lon,
+        ),
+    )
+
+
+def prune_cache(max_size: int) -> int:
+    """Remove the least recently used map files until the cache takes up
+    at most `max_size` bytes. The Pylot touches every cached file it
+    uses. Returns the number of removed files."""
+
+    if not os.path.isdir(_CACHE_DIR):
+        return 0
+
+    mapfiles: list[tuple[int, str, int]] = []
+    for root, _, filenames in os.walk(_CACHE_DIR):
+        for filename in filenames:
+            if not filename.endswith(".map"):
+                continue
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # removed by another session in the meantime
+                continue
+            mapfiles.append((stat.st_mtime_ns, path, stat.st_size))
+
+    total_size = sum(size for _, _, size in mapfiles)
+    removed_count = 0
+    for _, path, size in sorted(mapfiles):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+            removed_count += 1
+        except FileNotFoundError:
+            pass
+        total_size -= size
+    return removed_count
@@ -1,73 +1,64 @@
 from typing import Optional
-import tempfile
+import concurrent.futures
+import io
+import re
 import polars as pl
-import os
 
+_WHITESPACE_PATTERN = re.compile(r"[\t ]+")
 
-def read_and_merge_invparms_files(paths: list[str]) -> Optional[pl.DataFrame]:
-    dfs: list[pl.DataFrame] = []
+_INVPARMS_SCHEMA: dict[str, type[pl.DataType]] = {
+    "JulianDate": pl.Float64,
+    "HHMMSS_ID": pl.Utf8,
+    "SX": pl.Utf8,
+    "gndP": pl.Float64,
+    "gndT": pl.Float64,
+    "latdeg": pl.Float64,
+    "londeg": pl.Float64,
+    "altim": pl.Float64,
+    "appSZA": pl.Float64,
+    "azimuth": pl.Float64,
+    "XH2O": pl.Float64,
+    "XAIR": pl.Float64,
+    "XCO2": pl.Float64,
+    "XCH4": pl.Float64,
+    "XCH4_S5P": pl.Float64,
+    "XCO": pl.Float64,
+}
 
-    for path in paths:
-        # this tempfile is necessary because the `invparms.dat` are
-        # have to be adjusted in order to be read by polars
-        with tempfile.TemporaryDirectory() as d:
-            with open(path, "r") as f:
-                file_content = f.read()
 
-            while "\t" in file_content:
-                file_content = file_content.replace("\t", " ")
+def read_invparms_file(path: str) -> pl.DataFrame:
+    """Read a single `invparms.dat` file. The columns of these files are
+    separated by a varying number of tabs and spaces, so all whitespace
+    runs are collapsed into a single space in one pass before polars
+    parses the content from memory."""
 
-            while "  " in file_content:
-                file_content = file_content.replace("  ", " ")
+    with open(path, "r") as f:
+        file_content = _WHITESPACE_PATTERN.sub(" ", f.read())
 
-            with open(os.path.join(d, os.path.basename(path)), "w") as f:
-                f.write(file_content)
+    return pl.read_csv(
+        io.BytesIO(file_content.encode()),
+        has_header=True,
+        separator=" ",
+        columns=list(_INVPARMS_SCHEMA.keys()),
+        schema_overrides=_INVPARMS_SCHEMA,
+    )
 
-            dfs.append(
-                pl.read_csv(
-                    os.path.join(d, os.path.basename(path)),
-                    has_header=True,
-                    separator=" ",
-                    columns=[
-                        "JulianDate",
-                        "HHMMSS_ID",
-                        "SX",
-                        "gndP",
-                        "gndT",
-                        "latdeg",
-                        "londeg",
-                        "altim",
-                        "appSZA",
-                        "azimuth",
-                        "XH2O",
-                        "XAIR",
-                        "XCO2",
-                        "XCH4",
-                        "XCH4_S5P",
-                        "XCO",
-                    ],
-                    schema_overrides={
-                        "JulianDate": pl.Float64,
-                        "HHMMSS_ID": str,  # type: ignore
-                        "SX": str,  # type: ignore
-                        "gndP": pl.Float64,
-                        "gndT": pl.Float64,
-                        "latdeg": pl.Float64,
-                        "londeg": pl.Float64,
-                        "altim": pl.Float64,
-                        "appSZA": pl.Float64,
-                        "azimuth": pl.Float64,
-                        "XH2O": pl.Float64,
-                        "XAIR": pl.Float64,
-                        "XCO2": pl.Float64,
-                        "XCH4": pl.Float64,
-                        "XCH4_S5P": pl.Float64,
-                        "XCO": pl.Float64,
-                    },
-                )
-            )
 
-    if len(dfs) == 0:
+def read_and_merge_invparms_files(
+    paths: list[str],
+    max_workers: Optional[int] = None,
+) -> Optional[pl.DataFrame]:
+    """Read and concatenate multiple `invparms.dat` files. The files are
+    parsed in parallel threads, the order of the rows follows the order
+    of `paths`."""
+
+    if len(paths) == 0:
         return None
 
+    if len(paths) == 1:
+        return read_invparms_file(paths[0])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        dfs = list(executor.map(read_invparms_file, paths))
+
     return pl.concat(dfs, how="vertical")
@@ -9,6 +9,13 @@ class RetrievalJob(pydantic.BaseModel):
     atmospheric_profile_model: types.AtmosphericProfileModel
     sensor_data_context: em27_metadata.types.SensorDataContext
     job_settings: types.config.RetrievalJobSettingsConfig
+    batch_sensor_data_contexts: list[em27_metadata.types.SensorDataContext] = []
+
+    def get_sensor_data_contexts(self) -> list[em27_metadata.types.SensorDataContext]:
+        """All days processed by this job (one unless the job is a batch)."""
+        if len(self.batch_sensor_data_contexts) > 0:
+            return self.batch_sensor_data_contexts
+        return [self.sensor_data_context]
 
 
 class RetrievalJobQueue():
@@ -22,6 +29,7 @@ class RetrievalJobQueue():
         atmospheric_profile_model: types.AtmosphericProfileModel,
         sensor_data_context: em27_metadata.types.SensorDataContext,
         job_settings: types.config.RetrievalJobSettingsConfig,
+        batch_sensor_data_contexts: Optional[list[em27_metadata.types.SensorDataContext]] = None,
     ) -> None:
         self.queue.append(
             RetrievalJob(
@@ -29,6 +37,7 @@ class RetrievalJobQueue():
                 atmospheric_profile_model=atmospheric_profile_model,
                 sensor_data_context=sensor_data_context,
                 job_settings=job_settings,
+                batch_sensor_data_contexts=batch_sensor_data_contexts or [],
             )
         )
 
@@ -38,6 +47,9 @@ class RetrievalJobQueue():
         else:
             return None
 
+    def peek_many(self, n: int) -> list[RetrievalJob]:
+        return self.queue[self.current_job_index : self.current_job_index + n]
+
     def pop(self) -> Optional[RetrievalJob]:
         if self.current_job_index < len(self.queue):
             self.current_job_index += 1
@@ -0,0 +1,106 @@
+from typing import Optional
+import datetime
+import re
+import numpy as np
+
+# header and directory layout of OPUS files as read by the Proffast preprocess
+_OPUS_MAGIC = -16905718
+_MAX_BLOCK_COUNT = 40
+
+IFG_BLOCK_TYPE = 2055
+ACQUISITION_PARAMETERS_BLOCK_TYPE = 32
+IFG_PARAMETERS_BLOCK_TYPE = 2071
+
+
+def read_block_directory(data: np.ndarray) -> Optional[np.ndarray]:
+    """Read the block directory of a memory-mapped OPUS file. Returns an
+    array with one row `(block type, length in bytes, pointer)` per block
+    or `None` if the data is not an OPUS file."""
+
+    try:
+        magic = int(data[0 : 4].view("<i4")[0])
+        first_directory_pointer, _, block_count = [int(v) for v in data[12 : 24].view("<i4")]
+        if (magic != _OPUS_MAGIC) or (not (0 < block_count <= _MAX_BLOCK_COUNT)):
+            return None
+        directory = data[first_directory_pointer:first_directory_pointer +
+                         (12 * block_count)].view("<i4").reshape(-1, 3).astype(np.int64)
+    except (ValueError, IndexError):
+        return None
+    if len(directory) != block_count:
+        return None
+    directory[:, 0] = np.fmod(directory[:, 0], 2**16)
+    directory[:, 1] *= 4
+    return directory
+
+
+def get_block(data: np.ndarray, directory: np.ndarray, block_type: int) -> Optional[np.ndarray]:
+    """Return the bytes of the last block of the given type."""
+
+    blocks = directory[directory[:, 0] == block_type]
+    if len(blocks) == 0:
+        return None
+    block_length, block_pointer = int(blocks[-1][1]), int(blocks[-1][2])
+    if block_pointer < 0:
+        return None
+    block = data[block_pointer:block_pointer + block_length]
+    if len(block) != block_length:
+        return None
+    return block
+
+
+def read_parameter(block: np.ndarray, name: str) -> Optional[str | float | int]:
+    """Read a parameter like `DAT`, `TIM` or `DUR` from a parameter block.
+    Returns `None` if the parameter does not exist."""
+
+    content = block.tobytes()
+    position = content.find(name.encode() + b"\0")
+    if (position < 0) or (position + 8 > len(content)):
+        return None
+    parameter_type, parameter_size = np.frombuffer(
+        content[position + 4 : position + 8], dtype="<i2"
+    )
+    value = content[position + 8 : position + 8 + 2 * int(parameter_size)]
+    if parameter_type == 0:
+        return int(np.frombuffer(value[: 4], dtype="<i4")[0])
+    if parameter_type == 1:
+        return float(np.frombuffer(value[: 8], dtype="<f8")[0])
+    return value.split(b"\0")[0].decode(errors="replace")
+
+
+def read_local_measurement_time(data: np.ndarray) -> Optional[datetime.datetime]:
+    """Read the time of the measurement in the local time of the instrument.
+    Like the Proffast preprocess, this is the middle of the scan if the
+    scan duration is recorded in the file."""
+
+    directory = read_block_directory(data)
+    if directory is None:
+        return None
+    ifg_parameters = get_block(data, directory, IFG_PARAMETERS_BLOCK_TYPE)
+    if ifg_parameters is None:
+        return None
+    date_string = read_parameter(ifg_parameters, "DAT")
+    time_string = read_parameter(ifg_parameters, "TIM")
+    if not (isinstance(date_string, str) and isinstance(time_string, str)):
+        return None
+    date_match = re.search(r"(\d{2})/(\d{2})/(\d{4})", date_string)
+    time_match = re.search(r"(\d{2}):(\d{2}):(\d{2}(\.\d+)?)", time_string)
+    if (date_match is None) or (time_match is None):
+        return None
+
+    try:
+        measurement_time = datetime.datetime(
+            int(date_match.group(3)),
+            int(date_match.group(2)),
+            int(date_match.group(1)),
+            int(time_match.group(1)),
+            int(time_match.group(2)),
+        ) + datetime.timedelta(seconds=float(time_match.group(3)))
+    except ValueError:
+        return None
+
+    acquisition_parameters = get_block(data, directory, ACQUISITION_PARAMETERS_BLOCK_TYPE)
+    if acquisition_parameters is not None:
+        duration = read_parameter(acquisition_parameters, "DUR")
+        if isinstance(duration, float) and (0 <= duration < 3600):
+            measurement_time += datetime.timedelta(seconds=duration / 2)
+    return measurement_time
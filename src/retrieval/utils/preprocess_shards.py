@@ -0,0 +1,133 @@
+from typing import Any
+import concurrent.futures
+import math
+import os
+import shutil
+
+
+def split_into_shards(items: list[str], shard_count: int) -> list[list[str]]:
+    """Split a list into at most `shard_count` contiguous, non-empty parts
+    of nearly equal length."""
+
+    if len(items) == 0:
+        return []
+    shard_size = math.ceil(len(items) / max(1, shard_count))
+    return [items[i : i + shard_size] for i in range(0, len(items), shard_size)]
+
+
+def merge_shard_outputs(shard_directories: list[str], cal_directory: str) -> None:
+    """Move the spectra of all preprocess shards into `cal_directory` and
+    concatenate their `logfile.dat` in the order of the shards. The first
+    column of the logfile (the running number of the interferogram) is
+    renumbered, so the result looks like the output of a single preprocess
+    run over all interferograms. The shard directories are removed."""
+
+    os.makedirs(cal_directory, exist_ok=True)
+    logfile_lines: list[str] = []
+    for shard_directory in shard_directories:
+        if not os.path.isdir(shard_directory):
+            continue
+        for filename in sorted(os.listdir(shard_directory)):
+            filepath = os.path.join(shard_directory, filename)
+            if filename == "logfile.dat":
+                with open(filepath, "r") as f:
+                    logfile_lines.extend([l for l in f.read().split("\n") if l.strip() != ""])
+            else:
+                os.replace(filepath, os.path.join(cal_directory, filename))
+        shutil.rmtree(shard_directory)
+
+    # the running number is written with the Fortran format I7
+    with open(os.path.join(cal_directory, "logfile.dat"), "w") as f:
+        for i, line in enumerate(logfile_lines):
+            f.write(f"{i + 1:7d}{line[7:]}\n")
+
+
+def run_sharded_preprocess(pylot: Any, shard_count: int) -> None:
+    """Replacement for `Pylot.run_preprocess` of Proffast 2.X, which
+    converts all interferograms of a day in one preprocess process.
+
+    The interferograms of each day are split into `shard_count` parts,
+    which are converted by concurrent preprocess processes. Every shard
+    writes into its own directory next to the `cal` directory because the
+    preprocess rewrites `logfile.dat` in its output directory. The outputs
+    are merged into the `cal` directory afterwards.
+
+    Supports the Pylots of Proffast 2.2 and 2.3 (measurement days in
+    `dates`, TCCON input file of 2.2) and of Proffast 2.4 (measurement
+    days in `meas_dates`)."""
+
+    if pylot.start_with_spectra is True:
+        pylot.logger.info(
+            "Running with option: 'start_with_spectra', skipping preprocessing. ...\n"
+        )
+        return
+
+    pylot.logger.info(f"Running preprocess with up to {shard_count} shard(s) per day ...")
+
+    # like `Pylot.run_preprocess` of Proffast 2.2
+    if hasattr(pylot, "tccon_mode"):
+        if pylot.tccon_mode:
+            pylot.logger.debug("...create tccon file...")
+            pylot.generate_prf_input("tccon")
+        else:
+            tccon_file = pylot.get_prf_input_path("tccon")
+            if os.path.exists(tccon_file):
+                os.remove(tccon_file)
+                pylot.logger.warning(
+                    "Found TCCON file, which was not expected. Delete it for normal processing."
+                )
+
+    meas_dates: list[Any] = pylot.meas_dates if hasattr(pylot, "meas_dates") else pylot.dates
+    prep_exe = pylot._get_executable("prep")
+    exec_path = os.path.dirname(prep_exe)
+
+    def _run(inputfile: str) -> Any:
+        return pylot.run_prf_with_inputfile(
+            inputfile, prep_exe, popen_kwargs={"cwd": exec_path}
+        )
+
+    output: list[Any] = []
+    for meas_date in meas_dates[:]:
+        parameters = pylot.get_prep_parameters(meas_date)
+        igrams = [i for i in parameters["igrams"].split("\n") if i != ""]
+        if len(igrams) == 0:
+            pylot.logger.warning(
+                f"No suitable iterferogram was found for day {meas_date}!"
+                "Skip processing of this day."
+            )
+            meas_dates.remove(meas_date)
+            continue
+
+        cal_directory = parameters["path_spectra"]
+        prf_input_file = pylot.get_prf_input_path("prep", meas_date)
+        shard_directories: list[str] = []
+        inputfiles: list[str] = []
+        for i, shard in enumerate(split_into_shards(igrams, shard_count)):
+            shard_directory = f"{cal_directory}-shard-{i}"
+            shutil.rmtree(shard_directory, ignore_errors=True)
+            os.makedirs(shard_directory)
+            inputfile = prf_input_file.replace(".inp", f"_shard{i}.inp")
+            pylot.replace_params_in_template(
+                {
+                    **parameters,
+                    "igrams": "\n".join(shard),
+                    "path_spectra": shard_directory,
+                },
+                "prep",
+                inputfile,
+            )
+            pylot.global_inputfile_list.append(inputfile)
+            shard_directories.append(shard_directory)
+            inputfiles.append(inputfile)
+
+        pylot.logger.debug(
+            f"Running {len(inputfiles)} preprocess shard(s) for {len(igrams)} " +
+            f"interferograms of {meas_date}"
+        )
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(inputfiles)) as executor:
+            output.extend(executor.map(_run, inputfiles))
+        merge_shard_outputs(shard_directories, cal_directory)
+
+    pylot._write_logfile("preprocess", output)
+    pylot.executed_preprocess = True
+    pylot.logger.info("Finished preprocessing.\n")
@@ -1,5 +1,10 @@
+from __future__ import annotations
 from typing import Any, Optional
 import datetime
+import functools
+import os
+import filelock
+import pydantic
 import skyfield.iokit
 import skyfield.api
 import skyfield.timelib
@@ -8,34 +13,191 @@ import polars as pl
 import tum_esm_utils
 from .logger import Logger
 
+_DATA_DIR = tum_esm_utils.files.rel_to_abs_path("../../../data")
+_SOLAR_NOON_CACHE_PATH = os.path.join(_DATA_DIR, "solar_noon_cache.json")
+
+# locations are rounded to this many decimals before computing solar noon
+# times so that sessions, the queue generator and the cache agree on the
+# results (0.01° longitude shifts solar noon by ~2.4 seconds)
+_LOCATION_DECIMALS = 2
+
+# dates further apart than this are computed in separate `find_discrete`
+# calls instead of scanning all the days in between
+_MAX_DATE_GAP = datetime.timedelta(days=14)
+
+# the oldest entries are dropped when the cache grows beyond this size
+# (~60 bytes per entry on disk)
+_MAX_CACHE_ENTRIES = 100_000
+
+# the cache of this process with the path and modification time of the
+# file it has been loaded from
+_loaded_cache: Optional[tuple[str, int, SolarNoonCache]] = None
+
+
+@functools.lru_cache(maxsize=1)
+def _load_skyfield_objects() -> tuple[Any, Any]:
+    """Load the timescale and the `de421.bsp` ephemeris only once per process."""
+
+    timescale = skyfield.api.load.timescale()
+    ephemeris: Any = skyfield.iokit.Loader(_DATA_DIR)('de421.bsp')
+    return timescale, ephemeris
+
+
+class SolarNoonCache(pydantic.RootModel[dict[str, datetime.datetime]]):
+    """Solar noon times keyed by `lat,lon,YYYY-MM-DD` (rounded location)."""
+
+    root: dict[str, datetime.datetime]
+
+    @staticmethod
+    def get_key(lat: float, lon: float, date: datetime.date) -> str:
+        return f"{lat:.{_LOCATION_DECIMALS}f},{lon:.{_LOCATION_DECIMALS}f},{date.isoformat()}"
+
+    @staticmethod
+    def with_filelock() -> filelock.FileLock:
+        return filelock.FileLock(_SOLAR_NOON_CACHE_PATH + ".lock", timeout=15)
+
+    @staticmethod
+    def load() -> SolarNoonCache:
+        """Load the cache from disk. The file is only parsed again when it
+        has been modified since this process last loaded it."""
+
+        global _loaded_cache
+        try:
+            mtime_ns = os.stat(_SOLAR_NOON_CACHE_PATH).st_mtime_ns
+            if (_loaded_cache is not None
+               ) and (_loaded_cache[: 2] == (_SOLAR_NOON_CACHE_PATH, mtime_ns)):
+                return SolarNoonCache(root=dict(_loaded_cache[2].root))
+            with open(_SOLAR_NOON_CACHE_PATH, "r") as f:
+                cache = SolarNoonCache.model_validate_json(f.read())
+            _loaded_cache = (_SOLAR_NOON_CACHE_PATH, mtime_ns, cache)
+            return SolarNoonCache(root=dict(cache.root))
+        except (FileNotFoundError, pydantic.ValidationError):
+            return SolarNoonCache(root={})
+
+    def dump(self) -> None:
+        """Save the cache to disk. Only the `_MAX_CACHE_ENTRIES` most
+        recently added entries are kept."""
+
+        if len(self.root) > _MAX_CACHE_ENTRIES:
+            self.root = dict(list(self.root.items())[-_MAX_CACHE_ENTRIES :])
+        tmp_path = f"{_SOLAR_NOON_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.model_dump_json())
+        os.replace(tmp_path, _SOLAR_NOON_CACHE_PATH)
+
+
+def _compute_solar_noon_times_at_location(
+    lat: float,
+    lon: float,
+    dates: list[datetime.date],
+) -> dict[datetime.date, datetime.datetime]:
+    """Compute the solar noon times for many dates at one location. Runs
+    one `find_discrete` search per block of dates that lie close together."""
+
+    timescale, ephemeris = _load_skyfield_objects()
+    transit_function = skyfield.almanac.meridian_transits(
+        ephemeris,
+        ephemeris['Sun'],
+        skyfield.api.wgs84.latlon(latitude_degrees=lat, longitude_degrees=lon),
+    )
+
+    sorted_dates = sorted(set(dates))
+    date_blocks: list[list[datetime.date]] = []
+    for date in sorted_dates:
+        if (len(date_blocks) > 0) and ((date - date_blocks[-1][-1]) <= _MAX_DATE_GAP):
+            date_blocks[-1].append(date)
+        else:
+            date_blocks.append([date])
+
+    solar_noon_times: dict[datetime.date, datetime.datetime] = {}
+    for date_block in date_blocks:
+        start_time = datetime.datetime.combine(
+            date_block[0], datetime.time.min, tzinfo=datetime.timezone.utc
+        )
+        end_time = datetime.datetime.combine(
+            date_block[-1], datetime.time.min, tzinfo=datetime.timezone.utc
+        ) + datetime.timedelta(days=1)
+        times, events = skyfield.almanac.find_discrete(
+            timescale.from_datetime(start_time),
+            timescale.from_datetime(end_time),
+            transit_function,
+        )
+
+        # Select transits instead of antitransits. Use the
+        # first transit of each day (like a per-day search).
+        requested_dates = set(date_block)
+        for t in times[events == 1].utc_datetime():
+            t_date = t.date()
+            if (t_date in requested_dates) and (t_date not in solar_noon_times):
+                solar_noon_times[t_date] = t
+
+    missing_dates = set(sorted_dates).difference(solar_noon_times.keys())
+    assert len(missing_dates) == 0, f"No solar noon found at ({lat}, {lon}) on {missing_dates}"
+    return solar_noon_times
+
+
+def compute_solar_noon_times(
+    queries: list[tuple[float, float, datetime.date]],
+    use_cache: bool = True,
+) -> list[datetime.datetime]:
+    """Compute the solar noon times (UTC) for many `(lat, lon, date)` tuples
+    at once. Locations are rounded to two decimals. Results are memoised in
+    `data/solar_noon_cache.json` which is shared between all processes."""
+
+    rounded_queries = [(round(lat, _LOCATION_DECIMALS), round(lon, _LOCATION_DECIMALS), date)
+                       for lat, lon, date in queries]
+    keys = [SolarNoonCache.get_key(*q) for q in rounded_queries]
+
+    cache = SolarNoonCache.load() if use_cache else SolarNoonCache(root={})
+    missing_dates_per_location: dict[tuple[float, float], list[datetime.date]] = {}
+    for key, (lat, lon, date) in zip(keys, rounded_queries):
+        if key not in cache.root:
+            missing_dates_per_location.setdefault((lat, lon), []).append(date)
+
+    new_results: dict[str, datetime.datetime] = {}
+    for (lat, lon), dates in missing_dates_per_location.items():
+        for date, t in _compute_solar_noon_times_at_location(lat, lon, dates).items():
+            new_results[SolarNoonCache.get_key(lat, lon, date)] = t
+
+    if len(new_results) > 0:
+        cache.root.update(new_results)
+        if use_cache:
+            with SolarNoonCache.with_filelock():
+                latest_cache = SolarNoonCache.load()
+                latest_cache.root.update(new_results)
+                latest_cache.dump()
+
+    return [cache.root[key].astimezone(datetime.timezone.utc) for key in keys]
+
 
 def compute_solar_noon_time(
     lat: float,
     lon: float,
     date: datetime.date,
 ) -> datetime.datetime:
-    start_time = datetime.datetime.combine(date, datetime.time.min, tzinfo=datetime.timezone.utc)
-    end_time = start_time + datetime.timedelta(days=1)
-    timescale = skyfield.api.load.timescale()
-    ephemeris: Any = skyfield.iokit.Loader(tum_esm_utils.files.rel_to_abs_path("../../../data")
-                                          )('de421.bsp')
-
-    times, events = skyfield.almanac.find_discrete(
-        timescale.from_datetime(start_time),
-        timescale.from_datetime(end_time),
-        skyfield.almanac.meridian_transits(
-            ephemeris, ephemeris['Sun'],
-            skyfield.api.wgs84.latlon(
-                latitude_degrees=lat,
-                longitude_degrees=lon,
-            )
-        ),
-    )
+    return compute_solar_noon_times([(lat, lon, date)])[0]
 
-    # Select transits instead of antitransits.
-    t = times[events == 1][0].astimezone(datetime.timezone.utc)
-    assert isinstance(t, datetime.datetime)
-    return t
+
+def compute_solar_zenith_angles(
+    lat: float,
+    lon: float,
+    alt: float,
+    times: list[datetime.datetime],
+) -> list[float]:
+    """Compute the solar zenith angles (in degrees, without refraction) at
+    one location for many UTC times in a single vectorised call."""
+
+    if len(times) == 0:
+        return []
+    timescale, ephemeris = _load_skyfield_objects()
+    observer = ephemeris['Earth'] + skyfield.api.wgs84.latlon(
+        latitude_degrees=lat, longitude_degrees=lon, elevation_m=alt
+    )
+    t = timescale.from_datetimes([
+        (t if t.tzinfo is not None else t.replace(tzinfo=datetime.timezone.utc)) for t in times
+    ])
+    altitude, _, _ = observer.at(t).observe(ephemeris['Sun']).apparent().altaz()
+    return [float(90 - a) for a in altitude.degrees]
 
 
 def compute_mean_pressure_around_noon(
@@ -0,0 +1,263 @@
+from typing import Optional
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import em27_metadata
+import tum_esm_utils
+from src import types, utils
+
+_CACHE_DIR = tum_esm_utils.files.rel_to_abs_path("../../../data/spectra_cache")
+
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _get_cal_dir(session: types.Proffast2RetrievalSession) -> str:
+    return os.path.join(
+        session.ctn.data_output_path,
+        "analysis",
+        f"{session.ctx.sensor_id}_SN{session.ctx.serial_number:03d}",
+        session.ctx.from_datetime.strftime("%y%m%d"),
+        "cal",
+    )
+
+
+def get_cache_key(session: types.Proffast2RetrievalSession) -> str:
+    """Compute the cache key of the spectra of a session. Must be called
+    after the interferograms have been moved into the container and
+    the templates have been updated.
+
+    The key is a hash of the preprocess binary, the preprocess template
+    (which includes the DC thresholds and custom ILS values), the ILS
+    list, the instrument parameters, the sensor location and the set of
+    interferograms (name, source path, size and modification time)."""
+
+    container_path = session.ctn.container_path
+    date_string = session.ctx.from_datetime.strftime("%y%m%d")
+    ifg_dir = os.path.join(session.ctn.data_input_path, "ifg", date_string)
+
+    interferograms: list[tuple[str, str, int, int]] = []
+    for filename in sorted(os.listdir(ifg_dir)):
+        path = os.path.join(ifg_dir, filename)
+        stat = os.stat(path)
+        interferograms.append((filename, os.path.realpath(path), stat.st_size, stat.st_mtime_ns))
+
+    hashed_files = sorted([
+        p for pattern in [
+            "prf/preprocess/preprocess[0-9]",
+            "prfpylot/templates/template_preprocess*.inp",
+            "prfpylot/ILSList.csv",
+            "prfpylot/templates/instrument_templates/*",
+        ] for p in glob.glob(os.path.join(container_path, pattern))
+    ])
+    assert len(hashed_files) > 0, "preprocess binary not found"
+
+    key_content = {
+        "retrieval_algorithm": session.retrieval_algorithm,
+        "files": {os.path.relpath(p, container_path): _hash_file(p) for p in hashed_files},
+        "sensor_id": session.ctx.sensor_id,
+        "serial_number": session.ctx.serial_number,
+        "location": [
+            session.ctx.location.lat, session.ctx.location.lon, session.ctx.location.alt
+        ],
+        "utc_offset": session.ctx.utc_offset,
+        "interferograms": interferograms,
+    }
+    return hashlib.sha256(json.dumps(key_content, sort_keys=True).encode()).hexdigest()
+
+
+def _stage_spectra(session: types.Proffast2RetrievalSession, src_dir: str) -> int:
+    """Link (or copy) the contents of a spectra directory into the analysis
+    directory of the container and configure the Pylot to skip the
+    preprocessing. Returns the number of staged spectra."""
+
+    cal_dir = _get_cal_dir(session)
+    os.makedirs(cal_dir, exist_ok=True)
+    spectra_count = 0
+    for filename in os.listdir(src_dir):
+        src = os.path.join(src_dir, filename)
+        dst = os.path.join(cal_dir, filename)
+        utils.transfer.link_or_copy_file(src, dst)
+        if filename.endswith("SN.BIN"):
+            spectra_count += 1
+
+    pylot_config = tum_esm_utils.files.load_file(session.ctn.pylot_config_path)
+    tum_esm_utils.files.dump_file(
+        session.ctn.pylot_config_path,
+        re.sub(
+            r"^start_with_spectra:.*$",
+            "start_with_spectra: True",
+            pylot_config,
+            flags=re.MULTILINE,
+        ),
+    )
+    return spectra_count
+
+
+def restore_spectra(session: types.Proffast2RetrievalSession, cache_key: str) -> bool:
+    """If the cache contains spectra for the given key, copy them into
+    the analysis directory of the container and configure the Pylot to
+    skip the preprocessing. Returns whether the cache has been hit."""
+
+    cache_entry = os.path.join(_CACHE_DIR, cache_key)
+    if not os.path.isdir(cache_entry):
+        return False
+
+    try:
+        _stage_spectra(session, cache_entry)
+    except Exception:
+        # e.g. the entry has been evicted by another session while staging it
+        shutil.rmtree(_get_cal_dir(session), ignore_errors=True)
+        raise
+
+    # the modification time of an entry is its last use (see `prune_cache`)
+    os.utime(cache_entry)
+    return True
+
+
+def store_spectra(session: types.Proffast2RetrievalSession, cache_key: str) -> bool:
+    """Add the spectra of a finished preprocessing to the cache. The cache
+    entry is written to a temporary directory first and then renamed, so
+    concurrent sessions never see incomplete entries. Returns whether any
+    spectra have been stored."""
+
+    cal_dir = _get_cal_dir(session)
+    cache_entry = os.path.join(_CACHE_DIR, cache_key)
+    if (not os.path.isdir(cal_dir)) or os.path.isdir(cache_entry):
+        return False
+    if len([f for f in os.listdir(cal_dir) if f.endswith("SN.BIN")]) == 0:
+        return False
+
+    os.makedirs(_CACHE_DIR, exist_ok=True)
+    tmp_entry = os.path.join(_CACHE_DIR, f".{cache_key}.{os.getpid()}.tmp")
+    try:
+        # the spectra are not modified in the container, so the cache entry
+        # can share them with it; `move_outputs` copies shared files when
+        # publishing the results, so the results never share them
+        shutil.copytree(cal_dir, tmp_entry, copy_function=utils.transfer.link_or_copy_file)
+        os.rename(tmp_entry, cache_entry)
+    except OSError:
+        # another session has stored the same spectra in the meantime
+        if not os.path.isdir(cache_entry):
+            raise
+    finally:
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+    _get_entry_size(cache_entry)
+    return True
+
+
+def _get_entry_size(cache_entry: str) -> int:
+    """Size of a cache entry in bytes. Entries never change once they have
+    been stored, so the size is memoised in `<entry>.size`."""
+
+    size_file = cache_entry + ".size"
+    try:
+        with open(size_file, "r") as f:
+            return int(f.read())
+    except (FileNotFoundError, ValueError):
+        pass
+    size = 0
+    for root, _, filenames in os.walk(cache_entry):
+        for filename in filenames:
+            size += os.path.getsize(os.path.join(root, filename))
+    tmp_size_file = f"{size_file}.{os.getpid()}.tmp"
+    tum_esm_utils.files.dump_file(tmp_size_file, str(size))
+    os.replace(tmp_size_file, size_file)
+    return size
+
+
+def prune_cache(max_size: int) -> list[str]:
+    """Remove the least recently used entries until the cache takes up at
+    most `max_size` bytes. Entries are renamed before they are deleted,
+    so concurrent sessions never stage partially deleted entries. Returns
+    the keys of the removed entries."""
+
+    if not os.path.isdir(_CACHE_DIR):
+        return []
+
+    entries: list[tuple[int, str, int]] = []
+    with os.scandir(_CACHE_DIR) as scanned_entries:
+        for entry in scanned_entries:
+            if entry.name.startswith(".") or (not entry.is_dir()):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime_ns, entry.name, _get_entry_size(entry.path)))
+            except FileNotFoundError:
+                # removed by another session in the meantime
+                continue
+
+    total_size = sum(size for _, _, size in entries)
+    removed_keys: list[str] = []
+    for _, cache_key, size in sorted(entries):
+        if total_size <= max_size:
+            break
+        cache_entry = os.path.join(_CACHE_DIR, cache_key)
+        evicted_entry = os.path.join(_CACHE_DIR, f".{cache_key}.{os.getpid()}.evicted")
+        try:
+            os.rename(cache_entry, evicted_entry)
+        except FileNotFoundError:
+            continue
+        shutil.rmtree(evicted_entry, ignore_errors=True)
+        try:
+            os.remove(cache_entry + ".size")
+        except FileNotFoundError:
+            pass
+        total_size -= size
+        removed_keys.append(cache_key)
+    return removed_keys
+
+
+def find_archived_spectra(
+    config: types.Config,
+    retrieval_algorithm: types.RetrievalAlgorithm,
+    spectra_source: types.config.RetrievalJobSettingsSpectraSourceConfig,
+    sdc: em27_metadata.types.SensorDataContext,
+) -> Optional[str]:
+    """Return the directory of the binary spectra stored by the retrieval job
+    described by `spectra_source` for the given sensor data context, or
+    `None` if that job has not stored any spectra for it."""
+
+    spectra_dir = os.path.join(
+        config.general.data.results.root,
+        retrieval_algorithm,
+        spectra_source.atmospheric_profile_model,
+        sdc.sensor_id,
+        "successful",
+        utils.functions.get_output_slug(sdc, spectra_source.output_suffix),
+        "analysis",
+        "cal",
+    )
+    if not os.path.isdir(spectra_dir):
+        return None
+    if not any(f.endswith("SN.BIN") for f in os.listdir(spectra_dir)):
+        return None
+    return spectra_dir
+
+
+def stage_archived_spectra(
+    config: types.Config,
+    session: types.Proffast2RetrievalSession,
+) -> int:
+    """Stage the stored spectra configured in the job settings of the
+    session into the container, so that the Pylot only runs PCXS and
+    INVERS. Returns the number of staged spectra."""
+
+    spectra_source = session.job_settings.reprocess_from_spectra
+    assert spectra_source is not None, "Session does not reprocess spectra"
+    spectra_dir = find_archived_spectra(
+        config, session.retrieval_algorithm, spectra_source, session.ctx
+    )
+    if spectra_dir is None:
+        raise FileNotFoundError(
+            f"No stored spectra found for {spectra_source.atmospheric_profile_model}" +
+            (f" with suffix {spectra_source.output_suffix}" if spectra_source.output_suffix else "")
+        )
+    return _stage_spectra(session, spectra_dir)
@@ -0,0 +1,49 @@
+from typing import Any, Generator, Literal, Optional
+import contextlib
+from src import types
+
+RetrievalStage = Literal["inputs", "preprocess", "pcxs", "invers", "outputs"]
+
+# inputs and outputs share one pool because both are limited by the disks
+_STAGE_POOLS: dict[RetrievalStage, str] = {
+    "inputs": "input_output",
+    "preprocess": "preprocess",
+    "pcxs": "pcxs",
+    "invers": "invers",
+    "outputs": "input_output",
+}
+
+
+class StageSlots:
+    """Limits how many sessions can run each stage at the same time.
+
+    The main process creates one semaphore per limited pool and passes the
+    `StageSlots` to the session processes, which wrap each of their stages
+    in `StageSlots.acquire`. Slots are released when the stage finishes
+    or fails, including when the session process is terminated. A session
+    waiting for a slot keeps its process and its container."""
+    def __init__(
+        self,
+        stage_concurrency: types.config.RetrievalStageConcurrencyConfig,
+        context: Any,
+    ) -> None:
+        """`context` is the multiprocessing context the session processes
+        are started with."""
+
+        self.semaphores: dict[str, Any] = {}
+        for pool in set(_STAGE_POOLS.values()):
+            limit: Optional[int] = getattr(stage_concurrency, pool)
+            if limit is not None:
+                self.semaphores[pool] = context.BoundedSemaphore(limit)
+
+    @contextlib.contextmanager
+    def acquire(self, stage: RetrievalStage) -> Generator[None, None, None]:
+        """Block until a slot of the stage's pool is free and hold it
+        until the context is left. Unlimited stages do not block."""
+
+        semaphore = self.semaphores.get(_STAGE_POOLS[stage])
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            yield
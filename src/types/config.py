@@ -193,6 +193,27 @@ class ProfilesServerConfig(pydantic.BaseModel):
         description=
         "Maximum number of requests to put in the queue on the ccycle server at the same time. Only when a request is finished, a new one can enter the queue.",
     )
+    max_parallel_downloads: int = pydantic.Field(
+        4,
+        ge=1,
+        le=16,
+        description=
+        "Maximum number of FTP connections used to download tarballs from the ccycle server concurrently. Each connection logs in separately.",
+    )
+    listing_cache_ttl: int = pydantic.Field(
+        10,
+        ge=0,
+        le=1440,
+        description=
+        "Number of minutes for which the directory listings of the ccycle server are reused before listing the directories again. Set to `0` to list the directories on every download.",
+    )
+    max_query_length: int = pydantic.Field(
+        7,
+        ge=1,
+        le=31,
+        description=
+        "Maximum number of days covered by a single request. Nearby missing days of a location are merged into as few requests as possible, each spanning at most this many days.",
+    )
 
 
 class ProfilesScopeConfig(pydantic.BaseModel):
@@ -253,6 +274,66 @@ class ProfilesGGG2020StandardSitesItemConfig(pydantic.BaseModel):
         return self
 
 
+class RetrievalInputPrefetchConfig(pydantic.BaseModel):
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    scratch_dir: tum_esm_utils.validators.StrictDirectoryPath = pydantic.Field(
+        ...,
+        description=
+        "Local directory to copy the interferograms of upcoming retrievals to. The pipeline uses the subdirectory `em27-retrieval-prefetch-$hash`, where the hash is unique for each installation of the pipeline, and removes it when the retrievals are finished.",
+    )
+    max_size_gb: float = pydantic.Field(
+        20,
+        gt=0,
+        description="Maximum size of all prefetched interferograms in GB.",
+    )
+    lookahead: int = pydantic.Field(
+        4,
+        ge=1,
+        le=128,
+        description="Number of queued retrievals for which the interferograms are prefetched.",
+    )
+    thread_count: int = pydantic.Field(
+        2,
+        ge=1,
+        le=32,
+        description="Number of sensor days which are copied in parallel.",
+    )
+
+
+class RetrievalStageConcurrencyConfig(pydantic.BaseModel):
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    input_output: Optional[int] = pydantic.Field(
+        2,
+        ge=1,
+        le=128,
+        description=
+        "How many sensor-days can move their inputs into or their outputs out of the containers at the same time. Set to `null` to not limit this stage.",
+    )
+    preprocess: Optional[int] = pydantic.Field(
+        None,
+        ge=1,
+        le=128,
+        description=
+        "How many sensor-days can run the preprocessing at the same time. Set to `null` to not limit this stage.",
+    )
+    pcxs: Optional[int] = pydantic.Field(
+        None,
+        ge=1,
+        le=128,
+        description=
+        "How many sensor-days can run pcxs at the same time. Set to `null` to not limit this stage.",
+    )
+    invers: Optional[int] = pydantic.Field(
+        None,
+        ge=1,
+        le=128,
+        description=
+        "How many sensor-days can run invers at the same time. Set to `null` to not limit this stage.",
+    )
+
+
 class RetrievalGeneralConfig(pydantic.BaseModel):
     model_config = pydantic.ConfigDict(extra="forbid")
 
@@ -279,6 +360,45 @@ class RetrievalGeneralConfig(pydantic.BaseModel):
         description=
         "How much information the retrieval queue should print out. In `verbose` mode it will print out the full list of sensor-days for each step of the filtering process. This can help when figuring out why a certain sensor-day is not processed.",
     )
+    requeue_changed_inputs: bool = pydantic.Field(
+        False,
+        description=
+        "Every result stores a fingerprint of its inputs in its `about.json`: the names, sizes and modification times of the interferograms, the contents of the ground pressure and map files, the metadata of the sensor-day and the job settings which affect the results (e.g. not `output_suffix` or `store_binary_spectra`). If this is set, the retrieval queue compares these fingerprints with the current inputs and processes the sensor-days again whose inputs have changed since, e.g. because of late-arriving interferograms or corrected pressure files. The old results of these sensor-days are replaced. Results without a fingerprint (from older versions of the pipeline) are never reprocessed. If not set, every sensor-day with a result is considered done.",
+    )
+    input_prefetch: Optional[RetrievalInputPrefetchConfig] = pydantic.Field(
+        None,
+        description=
+        "If set, the interferograms of the next queued retrievals are copied to a local scratch directory in the background while other retrievals are running. The retrievals then read the local copies instead of the interferogram directory. This helps when the interferograms are stored on slow network storage. If not set, the retrievals read the interferograms directly from `config.general.data.interferograms`.",
+    )
+    stage_concurrency: Optional[RetrievalStageConcurrencyConfig] = pydantic.Field(
+        None,
+        description=
+        "If set, each sensor-day runs through the stages inputs, preprocess, pcxs, invers and outputs, and every stage has its own limit of how many sensor-days can run it at the same time. The sensor-days still run in separate processes (up to `max_process_count`), but they wait for a free slot before each stage. A waiting sensor-day keeps its process and its retrieval container, so it still counts towards `max_process_count` and no other sensor-day starts in its place. Therefore, `max_process_count` should be larger than the stage limits, otherwise the sensor-days waiting for one stage leave the other stages idle. With more processes than CPU cores, this lets the inputs and outputs of some sensor-days be moved while others are computing, and avoids that all processes hit the disk at the same time. If not set, every process runs all stages without waiting.",
+    )
+    preprocess_shard_count: int = pydantic.Field(
+        1,
+        ge=1,
+        le=64,
+        description=
+        "Only used by Proffast 2.X. Into how many parts the interferograms of one sensor-day are split for the preprocessing. The parts are converted by concurrent preprocess processes and their spectra are merged afterwards, so each retrieval process uses up to this many cores during the preprocessing. This shortens the preprocessing of days with many interferograms.",
+    )
+    use_spectra_cache: bool = pydantic.Field(
+        False,
+        description=
+        "Whether to cache the binary spectra generated by the preprocessing of Proffast 2.X in `data/spectra_cache`. The preprocessing does not depend on the atmospheric profile model or the ground pressure, so jobs processing the same sensor days with the same interferograms, preprocess version, DC thresholds and ILS parameters reuse the spectra of the first job and skip the preprocessing. Each cached day takes up as much disk space as the spectra stored with `store_binary_spectra`.",
+    )
+    spectra_cache_max_size: Optional[int] = pydantic.Field(
+        100,
+        ge=1,
+        description=
+        "Maximum size of `data/spectra_cache` in GB. Whenever new spectra are stored, the cached spectra that have not been used for the longest time are removed until the cache is below this size again. Set to `null` to never remove spectra from the cache.",
+    )
+    interpolated_mapfile_cache_max_size: Optional[int] = pydantic.Field(
+        1,
+        ge=1,
+        description=
+        "Only used by Proffast 2.4. Maximum size of `data/interpolated_mapfiles` in GB. After each retrieval, the interpolated map files that have not been used for the longest time are removed until the cache is below this size again. One interpolated map file takes up about 10 KB. Set to `null` to never remove map files from the cache.",
+    )
 
 
 class RetrievalJobSettingsILSConfig(pydantic.BaseModel):
@@ -290,6 +410,36 @@ class RetrievalJobSettingsILSConfig(pydantic.BaseModel):
     channel2_pe: float = pydantic.Field(...)
 
 
+class RetrievalJobSettingsSpectraSourceConfig(pydantic.BaseModel):
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    atmospheric_profile_model: AtmosphericProfileModel = pydantic.Field(
+        ...,
+        description="Atmospheric profile model of the retrieval job that stored the spectra.",
+    )
+    output_suffix: Optional[str] = pydantic.Field(
+        None,
+        description="Output suffix of the retrieval job that stored the spectra.",
+    )
+
+
+class RetrievalJobSettingsBatchingConfig(pydantic.BaseModel):
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    max_days: int = pydantic.Field(
+        7,
+        ge=2,
+        le=31,
+        description="Maximum number of days processed in one batch.",
+    )
+    max_ifg_count: Optional[int] = pydantic.Field(
+        None,
+        ge=1,
+        description=
+        "Maximum number of interferograms processed in one batch. A day with more interferograms than this is processed on its own. If not set, the batches are only limited by `max_days`.",
+    )
+
+
 class RetrievalJobSettingsConfig(pydantic.BaseModel):
     model_config = pydantic.ConfigDict(extra="forbid")
 
@@ -322,6 +472,18 @@ class RetrievalJobSettingsConfig(pydantic.BaseModel):
         description=
         "Whether to use the ifg corruption filter. This filter is a program based on `preprocess4` and is part of the `tum-esm-utils` library: https://tum-esm-utils.netlify.app/api-reference#tum_esm_utilsinterferograms. If activated, we will only pass the interferograms to the retrieval algorithm that pass the filter - i.e. that won't cause it to crash.",
     )
+    use_ifg_prescreen: bool = pydantic.Field(
+        False,
+        description=
+        "Whether to pre-screen the interferograms before passing them to the retrieval algorithm. The pre-screen computes the DC level and DC variation of each interferogram in the same way as the preprocessing and excludes the interferograms which are below `dc_min_threshold` or above `dc_var_threshold`, e.g. scans during cloudy periods. These would be rejected by the preprocessing anyway, but skipping them saves preprocessing time.",
+    )
+    max_sza: Optional[float] = pydantic.Field(
+        None,
+        ge=0,
+        le=90,
+        description=
+        "If set, interferograms recorded at a solar zenith angle (in degrees) above this value are not passed to the retrieval algorithm. The solar zenith angle is computed from the measurement time in the OPUS file header and the location of the sensor. Interferograms without a readable measurement time are always passed on.",
+    )
     custom_ils: Optional[dict[str, RetrievalJobSettingsILSConfig]] = pydantic.Field(
         None,
         description=
@@ -332,6 +494,16 @@ class RetrievalJobSettingsConfig(pydantic.BaseModel):
         description=
         "Suffix to append to the output folders. If not set, the pipeline output folders are named `sensorid/YYYYMMDD/`. If set, the folders are named `sensorid/YYYYMMDD_suffix/`. This is useful when having multiple retrieval jobs processing the same sensor dates with different settings.",
     )
+    reprocess_from_spectra: Optional[RetrievalJobSettingsSpectraSourceConfig] = pydantic.Field(
+        None,
+        description=
+        "If set, the job does not use any interferograms but reprocesses the binary spectra stored by an earlier job with the same retrieval algorithm and `store_binary_spectra` enabled. The spectra are read from the successful results of that job (`results/<algorithm>/<model>/<sensor>/successful/YYYYMMDD[_suffix]/analysis/cal/`) and only PCXS and INVERS are run, which makes reprocessing with new ground pressure data or another atmospheric profile model much faster. Only sensor days with stored spectra are processed. Only available for Proffast 2.X, and the earlier job must have a different atmospheric profile model or output suffix than this job.",
+    )
+    batching: Optional[RetrievalJobSettingsBatchingConfig] = pydantic.Field(
+        None,
+        description=
+        "If set, consecutive days of the same sensor with the same location and metadata are retrieved together in one container, i.e. with a single run of the Proffast Pylot. This saves the fixed costs of each retrieval session (creating the container, starting the Pylot, moving the outputs) for every day but the first. The outputs are split up again afterwards, so every day still gets its own `successful/YYYYMMDD` or `failed/YYYYMMDD` directory. The rows of the combined output csv are assigned to the days by the date in the name of their spectrum. Days whose inputs are incomplete are left out of the batch and stay unprocessed. Batches do not use the spectra cache. Only available for Proffast 2.X, and not together with `use_local_pressure_in_pcxs` or `reprocess_from_spectra`.",
+    )
 
 
 class RetrievalJobConfig(pydantic.BaseModel):
@@ -370,6 +542,24 @@ class RetrievalJobConfig(pydantic.BaseModel):
             raise ValueError('from_date must be before to_date')
         if self.retrieval_algorithm == "proffast-1.0" and self.atmospheric_profile_model == "GGG2020":
             raise ValueError("proffast-1.0 does not support GGG2020 profiles")
+        if self.settings.batching is not None:
+            if self.retrieval_algorithm == "proffast-1.0":
+                raise ValueError("proffast-1.0 does not support batching")
+            if self.settings.use_local_pressure_in_pcxs:
+                raise ValueError("batching cannot be used with use_local_pressure_in_pcxs")
+            if self.settings.reprocess_from_spectra is not None:
+                raise ValueError("batching cannot be used with reprocess_from_spectra")
+        spectra_source = self.settings.reprocess_from_spectra
+        if spectra_source is not None:
+            if self.retrieval_algorithm == "proffast-1.0":
+                raise ValueError("proffast-1.0 does not support reprocessing from spectra")
+            if (
+                spectra_source.atmospheric_profile_model == self.atmospheric_profile_model
+            ) and (spectra_source.output_suffix == self.settings.output_suffix):
+                raise ValueError(
+                    "reprocess_from_spectra must point to the outputs of another job " +
+                    "(different atmospheric profile model or output suffix)"
+                )
         return self
 
 
@@ -399,6 +589,22 @@ class ProfilesConfig(pydantic.BaseModel):
         description=
         "List of standard sites to request from the ccycle ftp server. The requests for these standard sites are done before any other requests so that data available for these is not rerequested for other sensors. See https://tccon-wiki.caltech.edu/Main/ObtainingGinputData#Requesting_to_be_added_as_a_standard_site for more information.",
     )
+    file_types: list[Literal["map", "mod", "vmr"]] = pydantic.Field(
+        ["map", "mod", "vmr"],
+        description=
+        "File types to extract from the downloaded tarballs. The retrievals only use the `.map` files, so you can set this to `[\"map\"]` to save disk space and inodes. GGG2014 tarballs do not contain `.vmr` files. Days are considered as downloaded when all files of these types exist.",
+    )
+    storage_format: Literal["files", "packed"] = pydantic.Field(
+        "files",
+        description=
+        "How to store the extracted profiles. `files` stores every file in the profiles directory. `packed` stores the files of one location and month in a single zip archive `<model>/YYYYMM_<coordinates>.zip`, which saves inodes and makes scanning the profiles directory much faster. The retrievals can read both formats, so you can switch at any time.",
+    )
+
+    @pydantic.model_validator(mode='after')
+    def check_file_types(self) -> ProfilesConfig:
+        if "map" not in self.file_types:
+            raise ValueError('file_types must include "map"')
+        return self
 
 
 class RetrievalConfig(pydantic.BaseModel):
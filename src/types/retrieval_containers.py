@@ -82,13 +82,18 @@ class Proffast1RetrievalSession(pydantic.BaseModel):
 
 class Proffast2RetrievalSession(pydantic.BaseModel):
     """This combines a `SensorDataContext` with a `Proffast22Container`/
-    `Proffast23Container`/`Proffast24Container`/`Proffast24Container`"""
+    `Proffast23Container`/`Proffast24Container`/`Proffast24Container`.
+
+    Batched sessions retrieve several consecutive days at once: `batch_ctxs`
+    contains the contexts of all these days and `ctx` is the first one. It
+    is empty for sessions of a single day."""
 
     retrieval_algorithm: Literal["proffast-2.2", "proffast-2.3", "proffast-2.4", "proffast-2.4.1"]
     atmospheric_profile_model: Literal["GGG2014", "GGG2020"]
     job_settings: RetrievalJobSettingsConfig
     ctx: em27_metadata.types.SensorDataContext
     ctn: Proffast22Container | Proffast23Container | Proffast24Container | Proffast241Container
+    batch_ctxs: list[em27_metadata.types.SensorDataContext] = []
 
 
 RetrievalSession = Proffast1RetrievalSession | Proffast2RetrievalSession
@@ -1 +1,4 @@
-from . import functions, metadata, report, semaphores, text
+from . import (
+    date_intervals, functions, metadata, profile_store, report, results_catalog, semaphores, text,
+    transfer
+)
@@ -0,0 +1,137 @@
+from __future__ import annotations
+from typing import Any, Iterable, Iterator
+import bisect
+import datetime
+
+
+class DateIntervalSet:
+    """An immutable set of dates stored as sorted, disjoint and
+    non-adjacent inclusive ranges of day ordinals. A year of consecutive
+    days is stored as one range instead of 365 `datetime.date` objects.
+
+    ```python
+    s = DateIntervalSet.from_range(datetime.date(2024, 1, 1), datetime.date(2024, 1, 31))
+    s = s - DateIntervalSet.from_dates([datetime.date(2024, 1, 10)])
+    s.to_intervals()  # [(2024-01-01, 2024-01-09), (2024-01-11, 2024-01-31)]
+    ```"""
+
+    __slots__ = ("_ranges", )
+
+    def __init__(self, ranges: Iterable[tuple[int, int]] = ()) -> None:
+        """Create a set from inclusive `(from_ordinal, to_ordinal)` ranges.
+        The ranges may overlap and do not have to be sorted."""
+
+        merged: list[tuple[int, int]] = []
+        for start, end in sorted(ranges):
+            if start > end:
+                continue
+            if (len(merged) > 0) and (start <= merged[-1][1] + 1):
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        self._ranges: tuple[tuple[int, int], ...] = tuple(merged)
+
+    @staticmethod
+    def from_range(from_date: datetime.date, to_date: datetime.date) -> DateIntervalSet:
+        """All dates from `from_date` to `to_date` (inclusive). Empty if
+        `from_date > to_date`."""
+
+        return DateIntervalSet([(from_date.toordinal(), to_date.toordinal())])
+
+    @staticmethod
+    def from_dates(dates: Iterable[datetime.date]) -> DateIntervalSet:
+        return DateIntervalSet([(d.toordinal(), d.toordinal()) for d in dates])
+
+    @property
+    def ranges(self) -> tuple[tuple[int, int], ...]:
+        """The inclusive `(from_ordinal, to_ordinal)` ranges."""
+
+        return self._ranges
+
+    def to_intervals(self) -> list[tuple[datetime.date, datetime.date]]:
+        """The inclusive `(from_date, to_date)` intervals."""
+
+        return [(datetime.date.fromordinal(s), datetime.date.fromordinal(e))
+                for s, e in self._ranges]
+
+    def to_dates(self) -> set[datetime.date]:
+        return set(self)
+
+    def union(self, other: DateIntervalSet) -> DateIntervalSet:
+        return DateIntervalSet(self._ranges + other._ranges)
+
+    def intersection(self, other: DateIntervalSet) -> DateIntervalSet:
+        result: list[tuple[int, int]] = []
+        i, j = 0, 0
+        while (i < len(self._ranges)) and (j < len(other._ranges)):
+            a_start, a_end = self._ranges[i]
+            b_start, b_end = other._ranges[j]
+            start, end = max(a_start, b_start), min(a_end, b_end)
+            if start <= end:
+                result.append((start, end))
+            if a_end < b_end:
+                i += 1
+            else:
+                j += 1
+        return DateIntervalSet(result)
+
+    def difference(self, other: DateIntervalSet) -> DateIntervalSet:
+        result: list[tuple[int, int]] = []
+        j = 0
+        for start, end in self._ranges:
+            # skip ranges of `other` that end before this range
+            while (j < len(other._ranges)) and (other._ranges[j][1] < start):
+                j += 1
+            k = j
+            while (k < len(other._ranges)) and (other._ranges[k][0] <= end):
+                o_start, o_end = other._ranges[k]
+                if o_start > start:
+                    result.append((start, o_start - 1))
+                start = max(start, o_end + 1)
+                if start > end:
+                    break
+                k += 1
+            if start <= end:
+                result.append((start, end))
+        return DateIntervalSet(result)
+
+    def __or__(self, other: DateIntervalSet) -> DateIntervalSet:
+        return self.union(other)
+
+    def __and__(self, other: DateIntervalSet) -> DateIntervalSet:
+        return self.intersection(other)
+
+    def __sub__(self, other: DateIntervalSet) -> DateIntervalSet:
+        return self.difference(other)
+
+    def __len__(self) -> int:
+        """Number of dates in the set."""
+
+        return sum(e - s + 1 for s, e in self._ranges)
+
+    def __bool__(self) -> bool:
+        return len(self._ranges) > 0
+
+    def __iter__(self) -> Iterator[datetime.date]:
+        for s, e in self._ranges:
+            for o in range(s, e + 1):
+                yield datetime.date.fromordinal(o)
+
+    def __contains__(self, date: object) -> bool:
+        if not isinstance(date, datetime.date):
+            return False
+        o = date.toordinal()
+        i = bisect.bisect_right(self._ranges, o, key=lambda r: r[0]) - 1
+        return (i >= 0) and (o <= self._ranges[i][1])
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, DateIntervalSet) and (self._ranges == other._ranges)
+
+    def __hash__(self) -> int:
+        return hash(self._ranges)
+
+    def __repr__(self) -> str:
+        return "DateIntervalSet([" + ", ".join(
+            f"{s.isoformat()}..{e.isoformat()}" for s, e in self.to_intervals()
+        ) + "])"
@@ -1,3 +1,4 @@
+from typing import Optional
 import datetime
 import em27_metadata
 import tum_esm_utils
@@ -13,6 +14,22 @@ def sdc_covers_the_full_day(sdc: em27_metadata.types.SensorDataContext, ) -> boo
            (sdc.to_datetime.time().replace(microsecond=0)   == datetime.time.max.replace(microsecond=0))
 
 
+def get_output_slug(
+    sdc: em27_metadata.types.SensorDataContext,
+    output_suffix: Optional[str] = None,
+) -> str:
+    """Returns the name of the results directory of a sensor data context,
+    i.e. `YYYYMMDD[_HHMMSS_HHMMSS][_suffix]`."""
+
+    output_slug = sdc.from_datetime.strftime("%Y%m%d")
+    if not sdc_covers_the_full_day(sdc):
+        output_slug += sdc.from_datetime.strftime("_%H%M%S")
+        output_slug += sdc.to_datetime.strftime("_%H%M%S")
+    if output_suffix is not None:
+        output_slug += f"_{output_suffix}"
+    return output_slug
+
+
 def get_pipeline_version() -> str:
     """Returns the current version (`x.y.z`) of the pipeline."""
 
@@ -0,0 +1,304 @@
+from __future__ import annotations
+from typing import Annotated, Any, Iterable, Optional
+import datetime
+import os
+import re
+import shutil
+import threading
+import time
+import zipfile
+import filelock
+import pydantic
+import tum_esm_utils
+from src import types
+from . import transfer
+from .date_intervals import DateIntervalSet
+
+_INDEX_FILE = tum_esm_utils.files.rel_to_abs_path("../../data/profile_store_index.json")
+
+# bit `i` of a bitmap represents the day `_BASE_DATE + i days`
+_BASE_DATE = datetime.date(1970, 1, 1)
+_BASE_ORDINAL = _BASE_DATE.toordinal()
+
+# 2022010100_48N011E.map (GGG2020) or 20220101_48N011E.map (GGG2014)
+_FILENAME_PATTERN = re.compile(r"^(\d{8})(\d{2})?_(\d{2}[NS]\d{3}[EW])\.(map|mod|vmr)$")
+
+# 202201_48N011E.zip contains all files of this location and month
+_PACKED_ARCHIVE_PATTERN = re.compile(r"^(\d{6})_(\d{2}[NS]\d{3}[EW])\.zip$")
+
+_GGG2020_HOURS = list(range(0, 24, 3))
+_COMPLETE_GGG2020_HOUR_MASK = sum(1 << (h // 3) for h in _GGG2020_HOURS)
+
+
+
+def _parse_bitmap(value: Any) -> Any:
+    return int(value, 16) if isinstance(value, str) else value
+
+
+# bitmaps of real dates have thousands of digits, which JSON parsers reject
+# as numbers, so they are stored as hexadecimal strings
+_Bitmap = Annotated[int,
+                    pydantic.BeforeValidator(_parse_bitmap),
+                    pydantic.PlainSerializer(lambda b: format(b, "x"), return_type=str)]
+
+_index_cache: dict[str, ProfileStoreIndex] = {}
+_index_cache_lock = threading.Lock()
+
+
+class ProfileStoreIndex(pydantic.BaseModel):
+    """Index of the profiles directory of one atmospheric profile model.
+
+    For every `(coordinates slug, file type)` it holds a bitmap of the days
+    for which all files of that type exist (all eight 3-hourly files for
+    GGG2020, one file for GGG2014), either as loose files or as members of
+    a packed archive (see `pack_files`). The index is built with a single
+    `os.scandir` and is valid as long as the modification time of the
+    directory does not change."""
+
+    directory: str
+    atmospheric_profile_model: types.AtmosphericProfileModel
+    mtime_ns: int
+    build_time_ns: int
+    bitmaps: dict[str, _Bitmap]
+
+    @staticmethod
+    def build(
+        directory: str,
+        atmospheric_profile_model: types.AtmosphericProfileModel,
+    ) -> ProfileStoreIndex:
+        """Scan the directory and build a new index."""
+
+        build_time_ns = time.time_ns()
+        try:
+            # reading the mtime before scanning so that files added during
+            # the scan invalidate the index
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return ProfileStoreIndex(
+                directory=directory,
+                atmospheric_profile_model=atmospheric_profile_model,
+                mtime_ns=-1,
+                build_time_ns=build_time_ns,
+                bitmaps={},
+            )
+
+        complete_days: dict[str, list[int]] = {}
+        hour_masks: dict[tuple[str, int], int] = {}
+
+        def _add_file(name: str) -> None:
+            match = _FILENAME_PATTERN.match(name)
+            if match is None:
+                return
+            date_string, hour_string, slug, file_type = match.groups()
+            try:
+                offset = datetime.date(
+                    int(date_string[0 : 4]),
+                    int(date_string[4 : 6]),
+                    int(date_string[6 : 8]),
+                ).toordinal() - _BASE_ORDINAL
+            except ValueError:
+                return
+            if offset < 0:
+                return
+            key = f"{slug}.{file_type}"
+            if atmospheric_profile_model == "GGG2014":
+                if hour_string is None:
+                    complete_days.setdefault(key, []).append(offset)
+            else:
+                if (hour_string is not None) and (int(hour_string) in _GGG2020_HOURS):
+                    hour_masks[(key, offset)] = hour_masks.get(
+                        (key, offset), 0
+                    ) | (1 << (int(hour_string) // 3))
+
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if _PACKED_ARCHIVE_PATTERN.match(entry.name) is not None:
+                    try:
+                        with zipfile.ZipFile(entry.path) as archive:
+                            for name in archive.namelist():
+                                _add_file(name)
+                    except zipfile.BadZipFile:
+                        continue
+                else:
+                    _add_file(entry.name)
+
+        for (key, offset), hour_mask in hour_masks.items():
+            if hour_mask == _COMPLETE_GGG2020_HOUR_MASK:
+                complete_days.setdefault(key, []).append(offset)
+
+        bitmaps: dict[str, int] = {}
+        for key, offsets in complete_days.items():
+            bitmap = bytearray(max(offsets) // 8 + 1)
+            for offset in offsets:
+                bitmap[offset // 8] |= 1 << (offset % 8)
+            bitmaps[key] = int.from_bytes(bitmap, "little")
+
+        return ProfileStoreIndex(
+            directory=directory,
+            atmospheric_profile_model=atmospheric_profile_model,
+            mtime_ns=mtime_ns,
+            build_time_ns=build_time_ns,
+            bitmaps=bitmaps,
+        )
+
+    def is_up_to_date(self) -> bool:
+        """Whether the directory has not been modified since the index was
+        built. Indices built within two seconds of the last modification
+        are never trusted because of coarse filesystem timestamps."""
+
+        try:
+            mtime_ns = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return self.mtime_ns == -1
+        return (mtime_ns == self.mtime_ns) and ((self.build_time_ns - mtime_ns) > 2_000_000_000)
+
+    def get_slugs(self) -> set[str]:
+        """All coordinates slugs with at least one complete day of any file type."""
+
+        return set(key.split(".")[0] for key in self.bitmaps.keys())
+
+    def get_bitmap(self, slug: str, file_types: Iterable[str] = ("map", )) -> int:
+        """Bitmap of the days for which all given file types are complete."""
+
+        bitmap: Optional[int] = None
+        for file_type in file_types:
+            b = self.bitmaps.get(f"{slug}.{file_type}", 0)
+            bitmap = b if (bitmap is None) else (bitmap & b)
+        return bitmap or 0
+
+    def get_dates(self, slug: str, file_types: Iterable[str] = ("map", )) -> DateIntervalSet:
+        """The days for which all given file types are complete."""
+
+        bits = bin(self.get_bitmap(slug, file_types))[2 :][::-1]
+        return DateIntervalSet([(m.start() + _BASE_ORDINAL, m.end() - 1 + _BASE_ORDINAL)
+                                for m in re.finditer("1+", bits)])
+
+    def has_date(
+        self,
+        slug: str,
+        date: datetime.date,
+        file_types: Iterable[str] = ("map", ),
+    ) -> bool:
+        """Whether all given file types are complete for the given day."""
+
+        offset = date.toordinal() - _BASE_ORDINAL
+        return (offset >= 0) and bool((self.get_bitmap(slug, file_types) >> offset) & 1)
+
+
+def _get_packed_archive_path(directory: str, filename: str) -> str:
+    """`<directory>/YYYYMM_<slug>.zip` for a file named like
+    `YYYYMMDD(HH)_<slug>.<ext>`."""
+
+    return os.path.join(directory, f"{filename[: 6]}_{filename.split('_')[1].split('.')[0]}.zip")
+
+
+def pack_files(directory: str, filepaths: list[str]) -> None:
+    """Add the given files to the packed archives in `directory`. Each
+    archive holds the files of one location and month; existing members
+    with the same name are replaced. The archives are rewritten to a
+    temporary file and then moved into place, so readers never see a
+    partially written archive. The source files are not removed."""
+
+    files_by_archive: dict[str, list[str]] = {}
+    for filepath in filepaths:
+        files_by_archive.setdefault(
+            _get_packed_archive_path(directory, os.path.basename(filepath)), []
+        ).append(filepath)
+
+    with filelock.FileLock(os.path.join(directory, ".packing.lock"), timeout=300):
+        for archive_path, archive_filepaths in sorted(files_by_archive.items()):
+            new_names = set(os.path.basename(f) for f in archive_filepaths)
+            tmp_path = f"{archive_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as dst:
+                    if os.path.isfile(archive_path):
+                        with zipfile.ZipFile(archive_path) as src:
+                            for info in src.infolist():
+                                if info.filename not in new_names:
+                                    dst.writestr(info, src.read(info))
+                    for filepath in sorted(archive_filepaths):
+                        dst.write(filepath, arcname=os.path.basename(filepath))
+                os.replace(tmp_path, archive_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+
+def copy_profile_file(directory: str, filename: str, dst_filepath: str) -> None:
+    """Copy a profile file from the packed archive of its location and
+    month or, if it is not packed, from the loose file in `directory`.
+    Loose files are hardlinked if possible. Raises a `FileNotFoundError`
+    if it exists in neither."""
+
+    archive_path = _get_packed_archive_path(directory, filename)
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            with archive.open(filename) as src, open(dst_filepath, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            return
+    except (FileNotFoundError, KeyError):
+        pass
+    transfer.link_or_copy_file(os.path.join(directory, filename), dst_filepath)
+
+
+def get_packed_profile_file_checksum(directory: str, filename: str) -> Optional[str]:
+    """Checksum of a profile file in the packed archive of its location
+    and month (`crc32:<crc>:<size>`). It is read from the directory of the
+    archive without extracting the file. `None` if the file is not packed."""
+
+    try:
+        with zipfile.ZipFile(_get_packed_archive_path(directory, filename)) as archive:
+            info = archive.getinfo(filename)
+            return f"crc32:{info.CRC:08x}:{info.file_size}"
+    except (FileNotFoundError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+class _PersistedProfileStoreIndices(pydantic.RootModel[dict[str, ProfileStoreIndex]]):
+    root: dict[str, ProfileStoreIndex]
+
+
+def _load_persisted_index(directory: str) -> Optional[ProfileStoreIndex]:
+    try:
+        with open(_INDEX_FILE, "r") as f:
+            return _PersistedProfileStoreIndices.model_validate_json(f.read()).root.get(directory)
+    except (FileNotFoundError, pydantic.ValidationError):
+        return None
+
+
+def _persist_index(index: ProfileStoreIndex) -> None:
+    with filelock.FileLock(_INDEX_FILE + ".lock", timeout=15):
+        try:
+            with open(_INDEX_FILE, "r") as f:
+                indices = _PersistedProfileStoreIndices.model_validate_json(f.read())
+        except (FileNotFoundError, pydantic.ValidationError):
+            indices = _PersistedProfileStoreIndices(root={})
+        indices.root[index.directory] = index
+        indices.root = {d: i for d, i in indices.root.items() if os.path.isdir(d)}
+        tmp_file = f"{_INDEX_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(indices.model_dump_json())
+        os.replace(tmp_file, _INDEX_FILE)
+
+
+def get_profile_store_index(
+    atmospheric_profiles_dir: str,
+    atmospheric_profile_model: types.AtmosphericProfileModel,
+    persist: bool = True,
+) -> ProfileStoreIndex:
+    """Return the index of `<atmospheric_profiles_dir>/<model>`. The index
+    is kept in memory and, if `persist` is set, in `data/` so that other
+    processes can reuse it. It is only rebuilt when the directory has been
+    modified since the index was built."""
+
+    directory = os.path.join(os.path.abspath(atmospheric_profiles_dir), atmospheric_profile_model)
+    with _index_cache_lock:
+        index = _index_cache.get(directory)
+        if (index is None) or (not index.is_up_to_date()):
+            index = _load_persisted_index(directory) if persist else None
+            if (index is None) or (not index.is_up_to_date()):
+                index = ProfileStoreIndex.build(directory, atmospheric_profile_model)
+                if persist:
+                    _persist_index(index)
+            _index_cache[directory] = index
+        return index
@@ -8,35 +8,19 @@ import tum_esm_utils
 import rich.console
 import rich.progress
 from src import types
+from .profile_store import ProfileStoreIndex, get_profile_store_index
+from .results_catalog import ResultsCatalogEntry, get_results_by_slug
 from .text import get_coordinates_slug, replace_regex_placeholders
 from .functions import sdc_covers_the_full_day
 
 
-def _ggg2014_profiles_exists(
-    path: str,
+def _profiles_exist(
+    profile_store_index: ProfileStoreIndex,
     lat: float,
     lon: float,
     date: datetime.date,
 ) -> str:
-    date_string = date.strftime("%Y%m%d")
-    coords_string = get_coordinates_slug(lat, lon)
-    return "✅" if os.path.isfile(
-        os.path.join(path, "GGG2014", f"{date_string}_{coords_string}.map")
-    ) else "-"
-
-
-def _ggg2020_profiles_exists(
-    path: str,
-    lat: float,
-    lon: float,
-    date: datetime.date,
-) -> str:
-    date_string = date.strftime("%Y%m%d")
-    coords_string = get_coordinates_slug(lat, lon)
-    return "✅" if all([
-        os.path.isfile(os.path.join(path, "GGG2020", f"{date_string}{h:02d}_{coords_string}.map"))
-        for h in range(0, 22, 3)
-    ]) else "-"
+    return "✅" if profile_store_index.has_date(get_coordinates_slug(lat, lon), date) else "-"
 
 
 def _count_ifg_datapoints(
@@ -74,19 +58,9 @@ def _count_ground_pressure_datapoints(
 
 
 def _check_retrieval_output(
-    config: types.Config,
+    results: dict[str, ResultsCatalogEntry],
     date: datetime.date,
     sdc: em27_metadata.types.SensorDataContext,
-    retrieval_algorithm: Literal[
-        "proffast-1.0",
-        "proffast-2.2",
-        "proffast-2.3",
-        "proffast-2.4",
-    ],
-    atmospheric_model: Literal[
-        "GGG2014",
-        "GGG2020",
-    ],
 ) -> Literal["✅", "❌", "-"]:
     output_folder_slug = date.strftime("%Y%m%d")
     if not sdc_covers_the_full_day(sdc):
@@ -99,28 +73,13 @@ def _check_retrieval_output(
             datetime.datetime.combine(date, datetime.time.max, tzinfo=datetime.timezone.utc),
         ).strftime("_%H%M%S")
 
-    success_path = os.path.join(
-        config.general.data.results.root,
-        retrieval_algorithm,
-        atmospheric_model,
-        sdc.sensor_id,
-        "successful",
-        output_folder_slug,
-    )
-    failed_path = os.path.join(
-        config.general.data.results.root,
-        retrieval_algorithm,
-        atmospheric_model,
-        sdc.sensor_id,
-        "failed",
-        output_folder_slug,
-    )
-    if os.path.isdir(success_path):
+    result = results.get(output_folder_slug)
+    if result is None:
+        return "-"
+    elif result.status == "successful":
         return "✅"
-    elif os.path.isdir(failed_path):
-        return "❌"
     else:
-        return "-"
+        return "❌"
 
 
 def export_data_report(
@@ -128,6 +87,21 @@ def export_data_report(
     em27_metadata_interface: em27_metadata.interfaces.EM27MetadataInterface,
     console: rich.console.Console,
 ) -> None:
+    ggg2014_profile_store_index = get_profile_store_index(
+        config.general.data.atmospheric_profiles.root, "GGG2014"
+    )
+    ggg2020_profile_store_index = get_profile_store_index(
+        config.general.data.atmospheric_profiles.root, "GGG2020"
+    )
+    reported_outputs: list[tuple[types.RetrievalAlgorithm, types.AtmosphericProfileModel]] = [
+        ("proffast-1.0", "GGG2014"),
+        ("proffast-2.2", "GGG2014"),
+        ("proffast-2.3", "GGG2014"),
+        ("proffast-2.4", "GGG2014"),
+        ("proffast-2.2", "GGG2020"),
+        ("proffast-2.3", "GGG2020"),
+        ("proffast-2.4", "GGG2020"),
+    ]
     for sensor in em27_metadata_interface.sensors.root:
         from_datetimes: list[datetime.datetime] = []
         to_datetimes: list[datetime.datetime] = []
@@ -143,6 +117,15 @@ def export_data_report(
         ggg2020_proffast_22_outputs: list[str] = []
         ggg2020_proffast_23_outputs: list[str] = []
         ggg2020_proffast_24_outputs: list[str] = []
+        results: dict[tuple[str, str], dict[str, ResultsCatalogEntry]] = {
+            (retrieval_algorithm, atmospheric_profile_model): get_results_by_slug(
+                config.general.data.results.root,
+                retrieval_algorithm,
+                atmospheric_profile_model,
+                sensor.sensor_id,
+            )
+            for retrieval_algorithm, atmospheric_profile_model in reported_outputs
+        }
         console.print(f"determining sensor data contexts for sensor {sensor.sensor_id}")
         sdcs = em27_metadata_interface.get(
             sensor_id=sensor.sensor_id,
@@ -190,41 +173,41 @@ def export_data_report(
                         )
                     )
                     ggg2014_profiles.append(
-                        _ggg2014_profiles_exists(
-                            config.general.data.atmospheric_profiles.root,
+                        _profiles_exist(
+                            ggg2014_profile_store_index,
                             sdc.location.lat,
                             sdc.location.lon,
                             date,
                         )
                     )
                     ggg2020_profiles.append(
-                        _ggg2020_profiles_exists(
-                            config.general.data.atmospheric_profiles.root,
+                        _profiles_exist(
+                            ggg2020_profile_store_index,
                             sdc.location.lat,
                             sdc.location.lon,
                             date,
                         )
                     )
                     ggg2014_proffast_10_outputs.append(
-                        _check_retrieval_output(config, date, sdc, "proffast-1.0", "GGG2014")
+                        _check_retrieval_output(results["proffast-1.0", "GGG2014"], date, sdc)
                     )
                     ggg2014_proffast_22_outputs.append(
-                        _check_retrieval_output(config, date, sdc, "proffast-2.2", "GGG2014")
+                        _check_retrieval_output(results["proffast-2.2", "GGG2014"], date, sdc)
                     )
                     ggg2014_proffast_23_outputs.append(
-                        _check_retrieval_output(config, date, sdc, "proffast-2.3", "GGG2014")
+                        _check_retrieval_output(results["proffast-2.3", "GGG2014"], date, sdc)
                     )
                     ggg2014_proffast_24_outputs.append(
-                        _check_retrieval_output(config, date, sdc, "proffast-2.4", "GGG2014")
+                        _check_retrieval_output(results["proffast-2.4", "GGG2014"], date, sdc)
                     )
                     ggg2020_proffast_22_outputs.append(
-                        _check_retrieval_output(config, date, sdc, "proffast-2.2", "GGG2020")
+                        _check_retrieval_output(results["proffast-2.2", "GGG2020"], date, sdc)
                     )
                     ggg2020_proffast_23_outputs.append(
-                        _check_retrieval_output(config, date, sdc, "proffast-2.3", "GGG2020")
+                        _check_retrieval_output(results["proffast-2.3", "GGG2020"], date, sdc)
                     )
                     ggg2020_proffast_24_outputs.append(
-                        _check_retrieval_output(config, date, sdc, "proffast-2.4", "GGG2020")
+                        _check_retrieval_output(results["proffast-2.4", "GGG2020"], date, sdc)
                     )
                     progress.advance(subtask)
                 progress.remove_task(subtask)
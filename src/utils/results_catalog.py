@@ -0,0 +1,340 @@
+from __future__ import annotations
+from typing import Any, Iterator, Literal, Optional, get_args
+import contextlib
+import datetime
+import os
+import re
+import sqlite3
+import time
+import pydantic
+import tum_esm_utils
+from src import types
+
+_CATALOG_PATH = tum_esm_utils.files.rel_to_abs_path("../../data/results_catalog.sqlite")
+
+# YYYYMMDD[_HHMMSS_HHMMSS][_suffix] (see `functions.get_output_slug`)
+_OUTPUT_SLUG_PATTERN = re.compile(r"^(\d{8})(_\d{6}_\d{6})?(_.+)?$")
+
+_STATUSES: list[Literal["successful", "failed"]] = ["successful", "failed"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    directory TEXT PRIMARY KEY,
+    partition TEXT NOT NULL,
+    retrieval_algorithm TEXT NOT NULL,
+    atmospheric_profile_model TEXT NOT NULL,
+    sensor_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    output_slug TEXT NOT NULL,
+    output_suffix TEXT,
+    date TEXT NOT NULL,
+    from_datetime TEXT,
+    to_datetime TEXT,
+    location_id TEXT,
+    generation_time TEXT,
+    spectrum_count INTEGER NOT NULL,
+    file_count INTEGER NOT NULL,
+    total_size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_partition ON results (partition);
+CREATE TABLE IF NOT EXISTS partitions (
+    partition TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    scan_time_ns INTEGER NOT NULL
+);
+"""
+
+
+class ResultsCatalogEntry(pydantic.BaseModel):
+    """One result directory `<results>/<algorithm>/<model>/<sensor>/<status>/<slug>`.
+    The time span, location, suffix and generation time are read from its
+    `about.json` (falling back to the slug for results without one)."""
+
+    directory: str
+    retrieval_algorithm: types.RetrievalAlgorithm
+    atmospheric_profile_model: types.AtmosphericProfileModel
+    sensor_id: str
+    status: Literal["successful", "failed"]
+    output_slug: str
+    output_suffix: Optional[str]
+    date: datetime.date
+    from_datetime: Optional[datetime.datetime]
+    to_datetime: Optional[datetime.datetime]
+    location_id: Optional[str]
+    generation_time: Optional[datetime.datetime]
+    spectrum_count: int
+    file_count: int
+    total_size: int
+    mtime_ns: int
+
+
+@contextlib.contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """Open the catalog and commit all changes when leaving the context.
+    Concurrent writers (e.g. the sessions of the retrieval) wait for each
+    other using SQLite's own locking."""
+
+    connection = sqlite3.connect(_CATALOG_PATH, timeout=60)
+    connection.row_factory = sqlite3.Row
+    try:
+        connection.executescript(_SCHEMA)
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def _get_partition_directory(
+    results_root: str,
+    retrieval_algorithm: types.RetrievalAlgorithm,
+    atmospheric_profile_model: types.AtmosphericProfileModel,
+    sensor_id: str,
+    status: Literal["successful", "failed"],
+) -> str:
+    return os.path.join(
+        os.path.abspath(results_root), retrieval_algorithm, atmospheric_profile_model, sensor_id,
+        status
+    )
+
+
+def _parse_about_file(directory: str) -> dict[str, Any]:
+    """Time span, location, output suffix and generation time of a result.
+    Raises an exception if the `about.json` is missing or incomplete."""
+
+    about = tum_esm_utils.files.load_json_file(os.path.join(directory, "about.json"))
+    context: dict[str, Any] = about["session"].get("ctx", about["session"])
+    if "from_datetime" in context:
+        from_datetime = tum_esm_utils.timing.parse_iso_8601_datetime(context["from_datetime"])
+        to_datetime = tum_esm_utils.timing.parse_iso_8601_datetime(context["to_datetime"])
+    else:
+        date = datetime.datetime.strptime(context["date"], "%Y%m%d")
+        from_datetime = datetime.datetime.combine(date, datetime.time.min)
+        to_datetime = datetime.datetime.combine(date, datetime.time.max)
+    if "generationDate" in about:
+        generation_time = datetime.datetime.strptime(
+            about["generationDate"] + "T" + about["generationTime"], "%Y%m%dT%H:%M:%S"
+        )
+    else:
+        generation_time = tum_esm_utils.timing.parse_iso_8601_datetime(about["generationTime"])
+    return {
+        "output_suffix": about["session"].get("job_settings", {}).get("output_suffix"),
+        "from_datetime": from_datetime,
+        "to_datetime": to_datetime,
+        "location_id": context["location"]["location_id"],
+        "generation_time": generation_time,
+    }
+
+
+def parse_result_directory(directory: str) -> ResultsCatalogEntry:
+    """Build the catalog entry of a result directory. The algorithm, model,
+    sensor, status and slug are taken from its path."""
+
+    directory = os.path.abspath(directory)
+    parts = directory.split(os.sep)
+    output_slug = parts[-1]
+    slug_match = _OUTPUT_SLUG_PATTERN.match(output_slug)
+    if slug_match is None:
+        raise ValueError(f"Invalid result directory name: {output_slug}")
+    mtime_ns = os.stat(directory).st_mtime_ns
+
+    about_fields: dict[str, Any]
+    try:
+        about_fields = _parse_about_file(directory)
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        suffix = slug_match.group(3)
+        about_fields = {
+            "output_suffix": None if suffix is None else suffix[1 :],
+            "from_datetime": None,
+            "to_datetime": None,
+            "location_id": None,
+            "generation_time": None,
+        }
+
+    spectrum_count = 0
+    file_count = 0
+    total_size = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and ("comb" in entry.name) and entry.name.endswith(".csv"):
+                with open(entry.path, "rb") as f:
+                    spectrum_count += max(sum(1 for line in f if line.strip()) - 1, 0)
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            file_count += 1
+            total_size += os.path.getsize(os.path.join(root, filename))
+
+    return ResultsCatalogEntry.model_validate({
+        "directory": directory,
+        "retrieval_algorithm": parts[-5],
+        "atmospheric_profile_model": parts[-4],
+        "sensor_id": parts[-3],
+        "status": parts[-2],
+        "output_slug": output_slug,
+        "date": datetime.datetime.strptime(slug_match.group(1), "%Y%m%d").date(),
+        "spectrum_count": spectrum_count,
+        "file_count": file_count,
+        "total_size": total_size,
+        "mtime_ns": mtime_ns,
+        **about_fields,
+    })
+
+
+def _insert_entry(connection: sqlite3.Connection, entry: ResultsCatalogEntry) -> None:
+    row = entry.model_dump(mode="json")
+    row["partition"] = os.path.dirname(entry.directory)
+    connection.execute(
+        f"INSERT OR REPLACE INTO results ({', '.join(row.keys())}) " +
+        f"VALUES ({', '.join(':' + k for k in row.keys())})",
+        row,
+    )
+
+
+def _refresh_partition(connection: sqlite3.Connection, partition: str) -> None:
+    """Bring the rows of one `<algorithm>/<model>/<sensor>/<status>`
+    directory up to date. Nothing is read as long as the modification
+    time of the directory does not change. Otherwise, only new result
+    directories and those with a changed modification time are parsed
+    and rows of removed directories are dropped."""
+
+    scan_time_ns = time.time_ns()
+    try:
+        mtime_ns = os.stat(partition).st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = -1
+
+    # partitions scanned within two seconds of their last modification
+    # are never trusted because of coarse filesystem timestamps
+    row = connection.execute(
+        "SELECT mtime_ns, scan_time_ns FROM partitions WHERE partition = ?", (partition, )
+    ).fetchone()
+    if (row is not None) and (row["mtime_ns"] == mtime_ns) and (
+        (row["scan_time_ns"] - mtime_ns) > 2_000_000_000
+    ):
+        return
+
+    known_mtimes: dict[str, int] = {
+        r["directory"]: r["mtime_ns"] for r in connection.
+        execute("SELECT directory, mtime_ns FROM results WHERE partition = ?", (partition, ))
+    }
+    existing_directories: set[str] = set()
+    if mtime_ns != -1:
+        with os.scandir(partition) as entries:
+            for entry in entries:
+                if (not entry.is_dir()) or (_OUTPUT_SLUG_PATTERN.match(entry.name) is None):
+                    continue
+                try:
+                    if known_mtimes.get(entry.path) != entry.stat().st_mtime_ns:
+                        _insert_entry(connection, parse_result_directory(entry.path))
+                except FileNotFoundError:
+                    # removed while scanning the partition
+                    continue
+                existing_directories.add(entry.path)
+    connection.executemany(
+        "DELETE FROM results WHERE directory = ?",
+        [(d, ) for d in known_mtimes.keys() if d not in existing_directories],
+    )
+    connection.execute(
+        "INSERT OR REPLACE INTO partitions VALUES (?, ?, ?)", (partition, mtime_ns, scan_time_ns)
+    )
+
+
+def add_result(results_root: str, directory: str) -> None:
+    """Add or update the entry of a newly published result directory. The
+    entry of the same slug with the other status is removed."""
+
+    entry = parse_result_directory(directory)
+    with _connect() as connection:
+        for status in _STATUSES:
+            if status != entry.status:
+                connection.execute(
+                    "DELETE FROM results WHERE directory = ?",
+                    (
+                        os.path.join(
+                            _get_partition_directory(
+                                results_root, entry.retrieval_algorithm,
+                                entry.atmospheric_profile_model, entry.sensor_id, status
+                            ),
+                            entry.output_slug,
+                        ),
+                    ),
+                )
+        _insert_entry(connection, entry)
+
+
+def get_results(
+    results_root: str,
+    retrieval_algorithm: types.RetrievalAlgorithm,
+    atmospheric_profile_model: types.AtmosphericProfileModel,
+    sensor_id: str,
+    status: Optional[Literal["successful", "failed"]] = None,
+) -> list[ResultsCatalogEntry]:
+    """All results of a sensor sorted by their slug. The partitions of
+    the requested statuses are refreshed before querying them, so
+    results that have been added or removed manually are picked up."""
+
+    partitions = [
+        _get_partition_directory(
+            results_root, retrieval_algorithm, atmospheric_profile_model, sensor_id, s
+        ) for s in _STATUSES if (status is None) or (s == status)
+    ]
+    with _connect() as connection:
+        for partition in partitions:
+            _refresh_partition(connection, partition)
+        rows = connection.execute(
+            "SELECT * FROM results WHERE partition IN " +
+            f"({', '.join('?' for _ in partitions)}) ORDER BY output_slug, status DESC",
+            partitions,
+        ).fetchall()
+    return [
+        ResultsCatalogEntry.model_validate({k: r[k] for k in r.keys() if k != "partition"})
+        for r in rows
+    ]
+
+
+def get_results_by_slug(
+    results_root: str,
+    retrieval_algorithm: types.RetrievalAlgorithm,
+    atmospheric_profile_model: types.AtmosphericProfileModel,
+    sensor_id: str,
+) -> dict[str, ResultsCatalogEntry]:
+    """The result of each slug of a sensor. If a slug exists as both a
+    successful and a failed result, the successful one is returned."""
+
+    entries: dict[str, ResultsCatalogEntry] = {}
+    for entry in get_results(
+        results_root, retrieval_algorithm, atmospheric_profile_model, sensor_id
+    ):
+        if entry.output_slug not in entries:
+            entries[entry.output_slug] = entry
+    return entries
+
+
+def rebuild(results_root: str) -> int:
+    """Regenerate all entries below `results_root` from disk and return
+    the number of result directories."""
+
+    results_root = os.path.abspath(results_root)
+    prefix = os.path.join(results_root, "")
+    with _connect() as connection:
+        for table, column in [("results", "directory"), ("partitions", "partition")]:
+            connection.execute(
+                f"DELETE FROM {table} WHERE substr({column}, 1, ?) = ?", (len(prefix), prefix)
+            )
+        for retrieval_algorithm in get_args(types.RetrievalAlgorithm):
+            for atmospheric_profile_model in get_args(types.AtmosphericProfileModel):
+                model_directory = os.path.join(
+                    results_root, retrieval_algorithm, atmospheric_profile_model
+                )
+                if not os.path.isdir(model_directory):
+                    continue
+                for sensor_id in sorted(os.listdir(model_directory)):
+                    for status in _STATUSES:
+                        partition = os.path.join(model_directory, sensor_id, status)
+                        if os.path.isdir(partition):
+                            _refresh_partition(connection, partition)
+        row = connection.execute(
+            "SELECT COUNT(*) FROM results WHERE substr(directory, 1, ?) = ?",
+            (len(prefix), prefix),
+        ).fetchone()
+    return int(row[0])
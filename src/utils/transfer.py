@@ -0,0 +1,137 @@
+"""Move and copy files with as little I/O as possible.
+
+Moving prefers `os.rename` and only copies when the source and destination
+are on different filesystems. Copying prefers reflinks (`FICLONE`, e.g. on
+btrfs or XFS) and in-kernel copies (`copy_file_range`, which also allows
+server-side copies on NFS 4.2) before falling back to `shutil.copyfile`."""
+
+import errno
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None  # type: ignore
+
+# ioctl request code of `FICLONE` on Linux
+_FICLONE = 0x40049409
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    if (fcntl is None) or (not hasattr(fcntl, "ioctl")):
+        return False
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except OSError:
+        return False
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, size: int) -> bool:
+    if not hasattr(os, "copy_file_range"):
+        return False
+    try:
+        copied_bytes = 0
+        while copied_bytes < size:
+            n = os.copy_file_range(src_fd, dst_fd, size - copied_bytes)
+            if n == 0:
+                break
+            copied_bytes += n
+        return copied_bytes == size
+    except OSError:
+        return False
+
+
+def copy_file(src: str, dst: str) -> str:
+    """Copy a file including its permissions and timestamps (like
+    `shutil.copy2`). The destination never shares its data with the
+    source, so both can be modified independently afterwards. Can be
+    used as `copy_function` of `shutil.copytree`."""
+
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
+    copied = False
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        if _reflink(fsrc.fileno(), fdst.fileno()):
+            copied = True
+        elif _copy_file_range(fsrc.fileno(), fdst.fileno(), size):
+            copied = True
+        else:
+            fdst.seek(0)
+            fdst.truncate()
+    if not copied:
+        shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+    return dst
+
+
+def link_or_copy_file(src: str, dst: str) -> str:
+    """Hardlink a file or copy it if hardlinks are not possible (e.g. on
+    different filesystems). Only use this for files which are not modified
+    in place afterwards, since a hardlink shares its data with the source.
+    Can be used as `copy_function` of `shutil.copytree`."""
+
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    try:
+        os.link(src, dst)
+    except OSError:
+        return copy_file(src, dst)
+    return dst
+
+
+def move_file(src: str, dst: str) -> None:
+    """Rename a file or copy and remove it if it is on another filesystem."""
+
+    try:
+        os.rename(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        copy_file(src, dst)
+        os.remove(src)
+
+
+def _unshare_tree(root: str) -> None:
+    """Replace symlinks by copies of their targets and hardlinked files by
+    copies, so that no file below `root` shares its data with another file.
+    Dangling symlinks are removed."""
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path):
+                target = os.path.realpath(path)
+                os.remove(path)
+                if os.path.isdir(target):
+                    shutil.copytree(target, path, copy_function=copy_file)
+                elif os.path.isfile(target):
+                    copy_file(target, path)
+            elif (name in filenames) and (os.stat(path).st_nlink > 1):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                copy_file(path, tmp_path)
+                os.replace(tmp_path, path)
+
+
+def move_tree(src: str, dst: str) -> None:
+    """Rename a directory or copy and remove it if it is on another
+    filesystem. The destination must not exist yet.
+
+    The destination never shares its data with other files: symlinks are
+    replaced by copies of their targets and hardlinked files (e.g. spectra
+    shared with the spectra cache) by copies, so the moved files can be
+    modified independently afterwards."""
+
+    if os.path.exists(dst):
+        raise FileExistsError(f"{dst} already exists")
+    try:
+        os.rename(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.copytree(src, dst, copy_function=copy_file)
+        shutil.rmtree(src)
+    _unshare_tree(dst)
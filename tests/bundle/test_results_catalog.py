@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import tempfile
+import pytest
+import src
+
+
+def _write_result(
+    results_root: str,
+    status: str,
+    output_slug: str,
+    output_suffix: str | None = None,
+    spectrum_count: int = 2,
+) -> str:
+    directory = os.path.join(results_root, "proffast-2.4", "GGG2020", "mc", status, output_slug)
+    os.makedirs(directory)
+    with open(os.path.join(directory, "about.json"), "w") as f:
+        json.dump({
+            "generationTime": "2024-01-01T12:00:00+0000",
+            "session": {
+                "ctx": {
+                    "sensor_id": "mc",
+                    "from_datetime": f"{output_slug[:4]}-{output_slug[4:6]}-{output_slug[6:8]}" +
+                                     "T00:00:00+0000",
+                    "to_datetime": f"{output_slug[:4]}-{output_slug[4:6]}-{output_slug[6:8]}" +
+                                   "T23:59:59+0000",
+                    "location": {"location_id": "ZEN"},
+                },
+                "job_settings": {"output_suffix": output_suffix},
+            },
+        }, f)
+    with open(os.path.join(directory, f"comb_invparms_mc_SN115_{output_slug[2:8]}.csv"), "w") as f:
+        f.write("UTC, spectrum, XAIR\n" + "some, some, 0.9983\n" * spectrum_count)
+    return directory
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_results_catalog(monkeypatch: pytest.MonkeyPatch) -> None:
+    catalog = src.utils.results_catalog
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(catalog, "_CATALOG_PATH", os.path.join(tmpdir, "catalog.sqlite"))
+        results_root = os.path.join(tmpdir, "results")
+        _write_result(results_root, "successful", "20220601")
+        _write_result(results_root, "successful", "20220602_suffix", output_suffix="suffix")
+        failed_directory = _write_result(results_root, "failed", "20220603", spectrum_count=0)
+
+        def _slugs() -> dict[str, str]:
+            return {
+                slug: entry.status
+                for slug, entry in catalog.get_results_by_slug(
+                    results_root, "proffast-2.4", "GGG2020", "mc"
+                ).items()
+            }
+
+        assert _slugs() == {
+            "20220601": "successful",
+            "20220602_suffix": "successful",
+            "20220603": "failed",
+        }
+        entries = catalog.get_results(
+            results_root, "proffast-2.4", "GGG2020", "mc", status="successful"
+        )
+        assert [(e.output_slug, e.output_suffix, e.location_id, e.spectrum_count, e.file_count)
+                for e in entries] == [
+                    ("20220601", None, "ZEN", 2, 2),
+                    ("20220602_suffix", "suffix", "ZEN", 2, 2),
+                ]
+
+        # results added and removed by hand
+        shutil.rmtree(os.path.join(results_root, "proffast-2.4", "GGG2020", "mc", "successful",
+                                   "20220601"))
+        _write_result(results_root, "successful", "20220604")
+        assert _slugs() == {
+            "20220602_suffix": "successful",
+            "20220603": "failed",
+            "20220604": "successful",
+        }
+
+        # a failed day has been reprocessed successfully
+        shutil.rmtree(failed_directory)
+        catalog.add_result(results_root, _write_result(results_root, "successful", "20220603"))
+        assert _slugs() == {
+            "20220602_suffix": "successful",
+            "20220603": "successful",
+            "20220604": "successful",
+        }
+
+        os.remove(os.path.join(tmpdir, "catalog.sqlite"))
+        assert catalog.rebuild(results_root) == 3
+        assert _slugs() == {
+            "20220602_suffix": "successful",
+            "20220603": "successful",
+            "20220604": "successful",
+        }
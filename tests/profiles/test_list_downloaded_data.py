@@ -1,5 +1,6 @@
 from typing import Any
 import os
+import pathlib
 import random
 import tempfile
 import pytest
@@ -10,7 +11,14 @@ from .utils import generate_random_locations, generate_random_dates
 
 @pytest.mark.order(3)
 @pytest.mark.quick
-def test_list_downloaded_data(provide_config_template: src.types.Config) -> None:
+def test_list_downloaded_data(
+    provide_config_template: src.types.Config,
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        src.utils.profile_store, "_INDEX_FILE", str(tmp_path / "profile_store_index.json")
+    )
     random_locations = generate_random_locations(n=30)
     random_dates = generate_random_dates(n=2000)
     cs = {l: src.utils.text.get_coordinates_slug(l.lat, l.lon) for l in random_locations}
@@ -45,4 +53,4 @@ def test_list_downloaded_data(provide_config_template: src.types.Config) -> None
                 downloaded = src.profiles.generate_queries.list_downloaded_data(config, model)
                 assert downloaded.keys() == downloaded_data.keys()
                 for l in downloaded_data.keys():
-                    assert downloaded[l] == downloaded_data[l]
+                    assert downloaded[l].to_dates() == downloaded_data[l]
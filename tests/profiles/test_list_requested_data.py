@@ -95,4 +95,4 @@ def test_list_requested_data(provide_config_template: src.types.Config) -> None:
     actual_data = src.profiles.generate_queries.list_desired_data(config, metadata)
     assert actual_data.keys() == expected_data.keys()
     for k in actual_data.keys():
-        assert actual_data[k] == expected_data[k]
+        assert actual_data[k].to_dates() == expected_data[k]
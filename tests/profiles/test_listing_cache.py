@@ -0,0 +1,91 @@
+import datetime
+import pathlib
+import pytest
+import src
+
+
+class _CountingPool(src.profiles.connection_pool.FTPConnectionPool):
+    def __init__(self) -> None:
+        super().__init__(email="test@example.com", host="example.com")
+        self.nlst_count = 0
+
+    def nlst(self, path: str) -> list[str]:
+        self.nlst_count += 1
+        return [f"{path}/a.tgz", f"{path}/b.tgz"]
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_listing_cache(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        src.profiles.listing_cache, "_CACHE_FILE", str(tmp_path / "profiles_listing_cache.json")
+    )
+    pool = _CountingPool()
+
+    cache = src.profiles.listing_cache.FTPListingCache.load()
+    ttl = datetime.timedelta(minutes=10)
+    assert cache.list_directory(pool, "ginput-jobs", ttl) == [
+        "ginput-jobs/a.tgz", "ginput-jobs/b.tgz"
+    ]
+    assert pool.nlst_count == 1
+
+    # cached listings are persisted and reused until the TTL has passed
+    cache = src.profiles.listing_cache.FTPListingCache.load()
+    cache.list_directory(pool, "ginput-jobs", ttl)
+    assert pool.nlst_count == 1
+    cache.list_directory(pool, "ginput-jobs", datetime.timedelta(0))
+    assert pool.nlst_count == 2
+    cache.invalidate(pool, "ginput-jobs")
+    cache.list_directory(pool, "ginput-jobs", ttl)
+    assert pool.nlst_count == 3
+
+    # expired listings are dropped from the cache on disk
+    cache.list_directory(pool, "upload/modfiles/tar/mods", ttl)
+    assert set(src.profiles.listing_cache.FTPListingCache.load().root.keys()) == {
+        "example.com:21/ginput-jobs", "example.com:21/upload/modfiles/tar/mods"
+    }
+    cache.list_directory(pool, "upload/modfiles/tar/maps", datetime.timedelta(0))
+    assert list(src.profiles.listing_cache.FTPListingCache.load().root.keys()) == [
+        "example.com:21/upload/modfiles/tar/maps"
+    ]
+    stale_cache = src.profiles.listing_cache.FTPListingCache.load()
+    for listing in stale_cache.root.values():
+        listing.listing_time -= datetime.timedelta(days=2)
+    stale_cache.dump()
+    assert src.profiles.listing_cache.FTPListingCache.load().root == {}
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_tarball_index() -> None:
+    paths = [
+        "ginput-jobs/job_000034641_tu_48.00N_12.00E_20221001-20221008.tgz",
+        "ginput-jobs/job_000034642_tu_48.00N_12.00E_20221008-20221015.tgz",
+        "ginput-jobs/job_000034643_tu_148.00N_12.00E_20221008-20221015.tgz",
+        "ginput-jobs/job_000034644_tu_5.00S_120.00W_20221001-20221008.tgz",
+        "upload/modfiles/tar/maps/maps_48N012E_20221001_20221007.tar",
+        "upload/modfiles/tar/mods/mods_48N012E_20221001_20221007.tar",
+        "ginput-jobs/README.txt",
+    ]
+    index = src.profiles.listing_cache.TarballIndex(paths)
+
+    def _query(lat: int, lon: int, from_date: datetime.date) -> src.types.DownloadQuery:
+        return src.types.DownloadQuery(lat=lat, lon=lon, from_date=from_date, to_date=from_date)
+
+    assert index.get_query_tarballs(_query(48, 12, datetime.date(2022, 10, 1))) == [
+        paths[0], paths[4], paths[5]
+    ]
+    assert index.get_query_tarballs(_query(48, 12, datetime.date(2022, 10, 8))) == [paths[1]]
+    assert index.get_query_tarballs(_query(-5, -120, datetime.date(2022, 10, 1))) == [paths[3]]
+    assert index.get_query_tarballs(_query(48, 12, datetime.date(2022, 10, 15))) == []
+    assert index.get_query_tarballs(_query(8, 12, datetime.date(2022, 10, 8))) == []
+
+    std_site_index = src.profiles.listing_cache.index_std_site_tarballs([
+        "ginput-std-sites/tarballs/mu/mu_ggg2020_20221001.tgz",
+        "ginput-std-sites/tarballs/mu/mu_ggg2020_20221002.tgz",
+        "ginput-std-sites/tarballs/mu/README.txt",
+    ])
+    assert std_site_index == {
+        datetime.date(2022, 10, 1): "ginput-std-sites/tarballs/mu/mu_ggg2020_20221001.tgz",
+        datetime.date(2022, 10, 2): "ginput-std-sites/tarballs/mu/mu_ggg2020_20221002.tgz",
+    }
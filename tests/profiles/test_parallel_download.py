@@ -0,0 +1,409 @@
+from typing import Any, Callable, Coroutine, Generator
+import asyncio
+import datetime
+import ftplib
+import io
+import os
+import pathlib
+import socket
+import tarfile
+import tempfile
+import threading
+import time
+import warnings
+import pytest
+import src
+from ..fixtures import provide_config_template
+
+
+def _build_ggg2020_tarball(date: datetime.date) -> bytes:
+    d = date.strftime("%Y%m%d")
+    members = [
+        f"maps-vertical/xx_48N_011E_{d}{h:02d}.map" for h in range(0, 24, 3)
+    ] + [f"fpit/FPIT_{d}{h:02d}Z_48N_011E.mod" for h in range(0, 24, 3)
+        ] + [f"vmrs/JL1_{d}{h:02d}Z_48N_011E.vmr" for h in range(0, 24, 3)]
+    with io.BytesIO() as archive:
+        with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+            for name in members:
+                content = (name + "\n").encode() * 2000
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+        return archive.getvalue()
+
+
+@pytest.fixture
+def local_ftp_server() -> Generator[tuple[str, int, str], None, None]:
+    """Local stand-in for the ccycle FTP server serving an empty
+    directory tree with anonymous login and write access."""
+
+    pyftpdlib_authorizers = pytest.importorskip("pyftpdlib.authorizers")
+    pyftpdlib_handlers = pytest.importorskip("pyftpdlib.handlers")
+    pyftpdlib_servers = pytest.importorskip("pyftpdlib.servers")
+
+    with tempfile.TemporaryDirectory() as root_dir:
+        os.mkdir(os.path.join(root_dir, "ginput-jobs"))
+        os.mkdir(os.path.join(root_dir, "upload"))
+        authorizer = pyftpdlib_authorizers.DummyAuthorizer()
+        with warnings.catch_warnings():
+            # anonymous write access is needed to test uploading requests
+            warnings.simplefilter("ignore", RuntimeWarning)
+            authorizer.add_anonymous(root_dir, perm="elrw")
+        handler = pyftpdlib_handlers.FTPHandler
+        handler.authorizer = authorizer
+        server = pyftpdlib_servers.ThreadedFTPServer(("127.0.0.1", 0), handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield "127.0.0.1", server.address[1], root_dir
+        finally:
+            server.close_all()
+            thread.join(timeout=5)
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_parallel_download(
+    provide_config_template: src.types.Config,
+    local_ftp_server: tuple[str, int, str],
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        src.profiles.listing_cache, "_CACHE_FILE", str(tmp_path / "profiles_listing_cache.json")
+    )
+    host, port, root_dir = local_ftp_server
+    config = provide_config_template.model_copy(deep=True)
+    assert config.profiles is not None
+    config.profiles.server.listing_cache_ttl = 0
+
+    from_dates = [datetime.date(2022, 1, 3) + datetime.timedelta(days=7 * i) for i in range(12)]
+    queries = [
+        src.types.DownloadQuery(lat=48, lon=11, from_date=d, to_date=d) for d in from_dates
+    ]
+    for i, d in enumerate(from_dates[:-1]):
+        with open(
+            os.path.join(
+                root_dir,
+                "ginput-jobs",
+                f"job_{i:09d}_tu_48.00N_11.00E_{d.strftime('%Y%m%d')}-" +
+                f"{(d + datetime.timedelta(days=1)).strftime('%Y%m%d')}.tgz",
+            ),
+            "wb",
+        ) as f:
+            f.write(_build_ggg2020_tarball(d))
+
+    for pool_size in [1, 4]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config.general.data.atmospheric_profiles.root = tmpdir
+            os.mkdir(os.path.join(tmpdir, "GGG2020"))
+            with src.profiles.connection_pool.FTPConnectionPool(
+                email="test@example.com", size=pool_size, host=host, port=port
+            ) as pool:
+                t1 = time.time()
+                fulfilled_queries = src.profiles.download_logic.download_data(
+                    config, queries, pool, "GGG2020"
+                )
+                print(f"Downloaded with {pool_size} connection(s) in {time.time() - t1:.3f}s")
+
+            assert fulfilled_queries == queries[:-1]
+            filenames = set(os.listdir(os.path.join(tmpdir, "GGG2020")))
+            assert len(filenames) == len(from_dates[:-1]) * 8 * 3
+            for d in from_dates[:-1]:
+                for e in ["map", "mod", "vmr"]:
+                    assert f"{d.strftime('%Y%m%d')}00_48N011E.{e}" in filenames
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_connection_pool_retries(local_ftp_server: tuple[str, int, str]) -> None:
+    host, port, root_dir = local_ftp_server
+    with open(os.path.join(root_dir, "ginput-jobs", "a.txt"), "wb") as f:
+        f.write(b"hello")
+
+    with src.profiles.connection_pool.FTPConnectionPool(
+        email="test@example.com", size=2, host=host, port=port, retry_delay=0
+    ) as pool:
+        # break the connection behind the pool's back, the next download
+        # should transparently reconnect
+        with pool.connection() as ftp:
+            assert ftp.sock is not None
+            ftp.sock.close()
+        assert pool.download("ginput-jobs/a.txt").read() == b"hello"
+
+        # permanent errors are not retried
+        with pytest.raises(ftplib.error_perm):
+            pool.download("ginput-jobs/does-not-exist.txt")
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_extract_archive(
+    provide_config_template: src.types.Config,
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        src.utils.profile_store, "_INDEX_FILE", str(tmp_path / "profile_store_index.json")
+    )
+    config = provide_config_template.model_copy(deep=True)
+    assert config.profiles is not None
+    config.profiles.file_types = ["map"]
+    tarball = _build_ggg2020_tarball(datetime.date(2022, 1, 3))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config.general.data.atmospheric_profiles.root = tmpdir
+        os.mkdir(os.path.join(tmpdir, "GGG2020"))
+
+        # a truncated archive must not leave any files behind
+        with pytest.raises(tarfile.TarError):
+            src.profiles.download_logic.extract_archive(
+                config, io.BytesIO(tarball[: len(tarball) // 2]), 48, 11, "GGG2020"
+            )
+        assert os.listdir(os.path.join(tmpdir, "GGG2020")) == []
+
+        src.profiles.download_logic.extract_archive(
+            config, io.BytesIO(tarball), 48, 11, "GGG2020"
+        )
+        assert sorted(os.listdir(os.path.join(tmpdir, "GGG2020"))) == [
+            f"20220103{h:02d}_48N011E.map" for h in range(0, 24, 3)
+        ]
+        assert src.profiles.std_site_logic.list_downloaded_data(
+            config,
+            src.types.config.ProfilesGGG2020StandardSitesItemConfig(
+                identifier="xx",
+                lat=48,
+                lon=11,
+                from_date=datetime.date(2022, 1, 1),
+                to_date=datetime.date(2022, 1, 31),
+            ),
+        ) == {datetime.date(2022, 1, 3)}
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_extract_archive_packed(provide_config_template: src.types.Config) -> None:
+    config = provide_config_template.model_copy(deep=True)
+    assert config.profiles is not None
+    config.profiles.storage_format = "packed"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config.general.data.atmospheric_profiles.root = tmpdir
+        model_dir = os.path.join(tmpdir, "GGG2020")
+        os.mkdir(model_dir)
+        for day in [3, 4, 3]:
+            src.profiles.download_logic.extract_archive(
+                config, io.BytesIO(_build_ggg2020_tarball(datetime.date(2022, 1, day))), 48, 11,
+                "GGG2020"
+            )
+        src.profiles.download_logic.extract_archive(
+            config, io.BytesIO(_build_ggg2020_tarball(datetime.date(2022, 2, 1))), 48, 11,
+            "GGG2020"
+        )
+        assert sorted(f for f in os.listdir(model_dir) if not f.startswith(".")) == [
+            "202201_48N011E.zip", "202202_48N011E.zip"
+        ]
+
+        index = src.utils.profile_store.get_profile_store_index(tmpdir, "GGG2020", persist=False)
+        assert index.get_dates("48N011E", ["map", "mod", "vmr"]).to_dates() == {
+            datetime.date(2022, 1, 3), datetime.date(2022, 1, 4), datetime.date(2022, 2, 1)
+        }
+
+        # packed members and loose files can be read the same way
+        with open(os.path.join(model_dir, "2022010500_48N011E.map"), "w") as f:
+            f.write("loose")
+        for filename in ["2022010406_48N011E.map", "2022010500_48N011E.map"]:
+            dst = os.path.join(tmpdir, filename)
+            src.utils.profile_store.copy_profile_file(model_dir, filename, dst)
+            assert os.path.getsize(dst) > 0
+        with pytest.raises(FileNotFoundError):
+            src.utils.profile_store.copy_profile_file(
+                model_dir, "2022010600_48N011E.map", os.path.join(tmpdir, "x.map")
+            )
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_upload_request(
+    provide_config_template: src.types.Config,
+    local_ftp_server: tuple[str, int, str],
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        src.profiles.listing_cache, "_CACHE_FILE", str(tmp_path / "profiles_listing_cache.json")
+    )
+    host, port, root_dir = local_ftp_server
+    config = provide_config_template.model_copy(deep=True)
+    assert config.profiles is not None
+    query = src.types.DownloadQuery(
+        lat=48, lon=11, from_date=datetime.date(2022, 1, 3), to_date=datetime.date(2022, 1, 9)
+    )
+    with src.profiles.connection_pool.FTPConnectionPool(
+        email=config.profiles.server.email, host=host, port=port
+    ) as pool:
+        with pool.connection() as ftp:
+            src.profiles.upload_logic.upload_request(config, query, ftp, "GGG2020")
+
+    with open(os.path.join(root_dir, "upload", "input_file_2020.txt")) as f:
+        assert f.read().split("\n") == [
+            "mu", "20220103", "20220110", "48", "11", config.profiles.server.email
+        ]
+
+
+async def _run_until(
+    coroutine: Coroutine[Any, Any, None],
+    condition: Callable[[], bool],
+    timeout: float = 30,
+) -> None:
+    """Run a daemon loop until `condition` holds, then cancel it."""
+
+    task = asyncio.create_task(coroutine)
+    try:
+        t1 = time.time()
+        while not condition():
+            assert not task.done(), "the loop has stopped"
+            assert (time.time() - t1) < timeout, "the loop did not reach the condition in time"
+            await asyncio.sleep(0.05)
+    finally:
+        task.cancel()
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_daemon_loops(
+    provide_config_template: src.types.Config,
+    local_ftp_server: tuple[str, int, str],
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    monkeypatch.setattr(
+        src.profiles.listing_cache, "_CACHE_FILE", str(tmp_path / "profiles_listing_cache.json")
+    )
+    monkeypatch.setattr(
+        src.utils.profile_store, "_INDEX_FILE", str(tmp_path / "profile_store_index.json")
+    )
+    monkeypatch.setattr(src.profiles.cache, "_CACHE_FILE", str(tmp_path / "query_cache.json"))
+    monkeypatch.setattr(src.profiles.daemon, "_UPLOAD_INTERVAL", 0)
+    host, port, root_dir = local_ftp_server
+    config = provide_config_template.model_copy(deep=True)
+    assert config.profiles is not None
+    config.profiles.scope = src.types.config.ProfilesScopeConfig(
+        from_date=datetime.date(2022, 1, 1), to_date=datetime.date(2022, 1, 31), models=["GGG2020"]
+    )
+    config.profiles.GGG2020_standard_sites = []
+    config.profiles.server.listing_cache_ttl = 0
+    config.general.data.atmospheric_profiles.root = str(tmp_path / "profiles")
+    os.makedirs(tmp_path / "profiles" / "GGG2020")
+
+    queries = [
+        src.types.DownloadQuery(lat=48, lon=11, from_date=d, to_date=d)
+        for d in [datetime.date(2022, 1, 3), datetime.date(2022, 1, 10)]
+    ]
+    monkeypatch.setattr(
+        src.profiles.generate_queries, "load_em27_metadata_interface", lambda config: None
+    )
+    monkeypatch.setattr(
+        src.profiles.generate_queries,
+        "generate_download_queries",
+        lambda config, model, interface: queries,
+    )
+    state = src.profiles.daemon._DaemonState(config)
+
+    def _active_queries() -> list[src.types.DownloadQuery]:
+        return state.cache.get_active_queries("GGG2020")
+
+    with src.profiles.connection_pool.FTPConnectionPool(
+        email=config.profiles.server.email, host=host, port=port, retry_delay=0
+    ) as pool:
+        # the idle upload connection has timed out, the upload is retried
+        with pool.connection() as ftp:
+            assert ftp.sock is not None
+            ftp.sock.shutdown(socket.SHUT_RDWR)
+        asyncio.run(
+            _run_until(
+                src.profiles.daemon._request_loop(state, pool, poll_interval=0.05),
+                lambda: len(_active_queries()) == 2,
+            )
+        )
+    assert _active_queries() == queries
+    with open(os.path.join(root_dir, "upload", "input_file_2020.txt")) as request_file:
+        assert request_file.read().split("\n")[1 : 3] == ["20220110", "20220111"]
+    assert "Error while requesting data" not in capsys.readouterr().out
+
+    # only the first request has been fulfilled by the server
+    with open(
+        os.path.join(
+            root_dir, "ginput-jobs", "job_000000000_tu_48.00N_11.00E_20220103-20220104.tgz"
+        ),
+        "wb",
+    ) as f:
+        f.write(_build_ggg2020_tarball(datetime.date(2022, 1, 3)))
+    with src.profiles.connection_pool.FTPConnectionPool(
+        email=config.profiles.server.email, host=host, port=port, retry_delay=0
+    ) as pool:
+        asyncio.run(
+            _run_until(
+                src.profiles.daemon._download_loop(state, pool, poll_interval=0.05),
+                lambda: len(_active_queries()) == 1,
+            )
+        )
+    assert _active_queries() == [queries[1]]
+    assert "2022010300_48N011E.map" in os.listdir(tmp_path / "profiles" / "GGG2020")
+    assert src.profiles.cache.DownloadQueryCache.load().get_active_queries("GGG2020") == [
+        queries[1]
+    ]
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_run_requests_top_ranked_queries(
+    provide_config_template: src.types.Config,
+    local_ftp_server: tuple[str, int, str],
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        src.profiles.listing_cache, "_CACHE_FILE", str(tmp_path / "profiles_listing_cache.json")
+    )
+    monkeypatch.setattr(src.profiles.cache, "_CACHE_FILE", str(tmp_path / "query_cache.json"))
+    host, port, _ = local_ftp_server
+    config = provide_config_template.model_copy(deep=True)
+    assert config.profiles is not None
+    config.profiles.scope = src.types.config.ProfilesScopeConfig(
+        from_date=datetime.date(2022, 1, 1), to_date=datetime.date(2022, 1, 31), models=["GGG2020"]
+    )
+    config.profiles.GGG2020_standard_sites = []
+    config.profiles.server.max_parallel_requests = 2
+    config.profiles.server.listing_cache_ttl = 0
+    config.general.data.atmospheric_profiles.root = str(tmp_path / "profiles")
+    monkeypatch.setattr(src.types.Config, "load", lambda: config)
+    pool_class = src.profiles.connection_pool.FTPConnectionPool
+    monkeypatch.setattr(
+        src.profiles.connection_pool,
+        "FTPConnectionPool",
+        lambda email, size: pool_class(email, size, host=host, port=port, retry_delay=0),
+    )
+
+    # ranked by the number of unblocked retrievals, not by date
+    ranked_queries = [
+        src.types.DownloadQuery(lat=48, lon=11, from_date=d, to_date=d) for d in [
+            datetime.date(2022, 1, 3),
+            datetime.date(2022, 1, 24),
+            datetime.date(2022, 1, 10),
+        ]
+    ]
+    monkeypatch.setattr(
+        src.profiles.generate_queries,
+        "generate_download_queries",
+        lambda config, model: ranked_queries,
+    )
+    submitted_queries: list[src.types.DownloadQuery] = []
+    monkeypatch.setattr(
+        src.profiles.upload_logic,
+        "upload_requests",
+        lambda config, queries, ftp, model: submitted_queries.extend(queries),
+    )
+    src.profiles.main.run()
+    assert submitted_queries == ranked_queries[: 2]
@@ -0,0 +1,118 @@
+from typing import Any
+import datetime
+import json
+import os
+import pathlib
+import random
+import shutil
+import tempfile
+import time
+import pytest
+import src
+from .utils import generate_random_locations, generate_random_dates
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_profile_store_index() -> None:
+    random_locations = generate_random_locations(n=10)
+    random_dates = generate_random_dates(n=200)
+    cs = [src.utils.text.get_coordinates_slug(l.lat, l.lon) for l in random_locations]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.mkdir(os.path.join(tmpdir, "GGG2014"))
+        os.mkdir(os.path.join(tmpdir, "GGG2020"))
+        filenames: set[str] = set()
+        for c in cs:
+            for d in random.sample(random_dates, 50):
+                for e in ["map", "mod"]:
+                    filenames.add(f"GGG2014/{d.strftime('%Y%m%d')}_{c}.{e}")
+                for h in range(0, 24, 3):
+                    filenames.add(f"GGG2020/{d.strftime('%Y%m%d')}{h:02d}_{c}.map")
+                    if random.random() > 0.05:
+                        filenames.add(f"GGG2020/{d.strftime('%Y%m%d')}{h:02d}_{c}.vmr")
+            # incomplete days
+            d = random.choice(random_dates)
+            filenames.add(f"GGG2014/{d.strftime('%Y%m%d')}_{c}.mod")
+            filenames.add(f"GGG2020/{d.strftime('%Y%m%d')}03_{c}.map")
+        for filename in filenames:
+            with open(os.path.join(tmpdir, filename), "w"):
+                pass
+
+        for model, file_types in [("GGG2014", ["map", "mod"]), ("GGG2020", ["map", "vmr"])]:
+            index = src.utils.profile_store.get_profile_store_index(
+                tmpdir,
+                model,  # type: ignore
+                persist=False,
+            )
+            assert index.get_slugs() == set(cs)
+            for c in cs:
+                for d in random_dates:
+                    ds = d.strftime("%Y%m%d") if model == "GGG2014" else [
+                        d.strftime(f"%Y%m%d{h:02d}") for h in range(0, 24, 3)
+                    ]
+                    for ft in [["map"], file_types]:
+                        expected = all(
+                            f"{model}/{x}_{c}.{e}" in filenames
+                            for x in ([ds] if isinstance(ds, str) else ds) for e in ft
+                        )
+                        assert index.has_date(c, d, ft) == expected
+                        assert (d in index.get_dates(c, ft)) == expected
+
+        # the index is rebuilt when the directory changes
+        new_date = datetime.date(2030, 1, 1)
+        with open(os.path.join(tmpdir, "GGG2014", f"20300101_{cs[0]}.map"), "w"):
+            pass
+        index = src.utils.profile_store.get_profile_store_index(tmpdir, "GGG2014", persist=False)
+        assert index.has_date(cs[0], new_date)
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_persisted_profile_store_index(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    profile_store = src.utils.profile_store
+    monkeypatch.setattr(profile_store, "_INDEX_FILE", str(tmp_path / "profile_store_index.json"))
+    monkeypatch.setattr(profile_store, "_index_cache", {})
+
+    def _persisted_directories() -> set[str]:
+        with open(profile_store._INDEX_FILE) as f:
+            return set(json.load(f).keys())
+
+    directories: list[str] = []
+    for name in ["a", "b"]:
+        directory = tmp_path / name / "GGG2014"
+        os.makedirs(directory)
+        for date in ["20240101", "20240102", "20240315"]:
+            with open(directory / f"{date}_48N011E.map", "w"):
+                pass
+        # indices of recently modified directories are never trusted
+        os.utime(directory, (time.time() - 10, time.time() - 10))
+        profile_store.get_profile_store_index(str(tmp_path / name), "GGG2014")
+        directories.append(os.path.abspath(directory))
+    assert _persisted_directories() == set(directories)
+
+    # another process loads the persisted index instead of scanning the directory
+    index = profile_store._index_cache[directories[1]]
+    assert profile_store._load_persisted_index(directories[1]) == index
+    monkeypatch.setattr(profile_store, "_index_cache", {})
+
+    def _build(*args: Any) -> None:
+        raise AssertionError("the index should not be rebuilt")
+
+    with monkeypatch.context() as m:
+        m.setattr(profile_store.ProfileStoreIndex, "build", _build)
+        loaded_index = profile_store.get_profile_store_index(str(tmp_path / "b"), "GGG2014")
+    assert loaded_index == index
+    assert loaded_index.has_date("48N011E", datetime.date(2024, 3, 15))
+    assert not loaded_index.has_date("48N011E", datetime.date(2024, 3, 16))
+
+    # indices of removed directories are dropped
+    shutil.rmtree(tmp_path / "a")
+    os.makedirs(tmp_path / "c" / "GGG2014")
+    profile_store.get_profile_store_index(str(tmp_path / "c"), "GGG2014")
+    assert _persisted_directories() == {
+        directories[1], os.path.abspath(tmp_path / "c" / "GGG2014")
+    }
@@ -1,8 +1,13 @@
 import random
 import datetime
+import os
+import pathlib
+import em27_metadata
 import pytest
 import tum_esm_utils
 import src
+from src.utils.date_intervals import DateIntervalSet
+from ..fixtures import provide_config_template
 from .utils import generate_random_locations, generate_random_dates
 
 
@@ -20,9 +25,15 @@ def test_compute_missing_data() -> None:
             l: set(random.sample(random_dates, 300))
             for l in random.sample(random_locations, 15)
         }
-        missing_data = src.profiles.generate_queries.compute_missing_data(
-            requested_data, downloaded_data
-        )
+        missing_data = {
+            l: dates.to_dates()
+            for l, dates in src.profiles.generate_queries.compute_missing_data(
+                {l: DateIntervalSet.from_dates(dates)
+                 for l, dates in requested_data.items()},
+                {l: DateIntervalSet.from_dates(dates)
+                 for l, dates in downloaded_data.items()},
+            ).items()
+        }
         for l in requested_data.keys():
             rq = requested_data[l] if l in requested_data else set()
             dl = downloaded_data[l] if l in downloaded_data else set()
@@ -50,7 +61,9 @@ def test_time_period_generation() -> None:
             )
         )
         time_periods = sorted(
-            src.profiles.generate_queries.compute_time_periods(required_dates),
+            src.profiles.generate_queries.compute_time_periods(
+                DateIntervalSet.from_dates(required_dates)
+            ),
             key=lambda tp: tp.from_date
         )
         for tp1, tp2 in zip(time_periods[:-1], time_periods[1 :]):
@@ -60,3 +73,171 @@ def test_time_period_generation() -> None:
             assert 0 <= (tp.to_date - tp.from_date).days <= 6
             requested_dates.update(tum_esm_utils.timing.date_range(tp.from_date, tp.to_date))
         assert requested_dates.issuperset(required_dates)
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_time_period_coalescing() -> None:
+    def d(day: int) -> datetime.date:
+        return datetime.date(2024, 1, day)
+
+    missing = DateIntervalSet.from_dates([d(1), d(4), d(7), d(8), d(9), d(20), d(21)])
+    time_periods = src.profiles.generate_queries.compute_time_periods(missing, 7)
+    assert [(tp.from_date, tp.to_date) for tp in time_periods] == [
+        (d(1), d(7)),
+        (d(8), d(9)),
+        (d(20), d(21)),
+    ]
+
+    # long continuous ranges are split into full-length periods
+    time_periods = src.profiles.generate_queries.compute_time_periods(
+        DateIntervalSet.from_range(d(1), d(17)), 7
+    )
+    assert [(tp.from_date, tp.to_date) for tp in time_periods] == [
+        (d(1), d(7)),
+        (d(8), d(14)),
+        (d(15), d(17)),
+    ]
+    assert src.profiles.generate_queries.compute_time_periods(DateIntervalSet(), 7) == []
+
+    # the greedy cover never needs more periods than the weekly split
+    for _ in range(20):
+        dates = set(generate_random_dates(random.randint(1, 100)))
+        for max_query_length in [1, 3, 7, 14]:
+            time_periods = src.profiles.generate_queries.compute_time_periods(
+                DateIntervalSet.from_dates(dates), max_query_length
+            )
+            covered: set[datetime.date] = set()
+            for tp in time_periods:
+                assert 0 <= (tp.to_date - tp.from_date).days < max_query_length
+                assert (tp.from_date in dates) and (tp.to_date in dates)
+                covered.update(tum_esm_utils.timing.date_range(tp.from_date, tp.to_date))
+            assert covered.issuperset(dates)
+            weeks = set((dt.toordinal() - 1) // 7 for dt in dates)
+            if max_query_length == 7:
+                assert len(time_periods) <= len(weeks)
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_download_query_ranking() -> None:
+    def q(lat: int, day: int) -> src.types.DownloadQuery:
+        return src.types.DownloadQuery(
+            lat=lat,
+            lon=11,
+            from_date=datetime.date(2024, 1, day),
+            to_date=datetime.date(2024, 1, day + 6),
+        )
+
+    def l(lat: int) -> src.profiles.generate_queries.ProfilesQueryLocation:
+        return src.profiles.generate_queries.ProfilesQueryLocation(lat=lat, lon=11)
+
+    def o(day: int) -> int:
+        return datetime.date(2024, 1, day).toordinal()
+
+    queries = [q(48, 1), q(48, 8), q(48, 15), q(49, 1), q(50, 1)]
+    demand = {
+        l(48): [o(9), o(10), o(10), o(20)],
+        l(49): [o(1), o(2)],
+        l(51): [o(1)],
+    }
+    ranked = src.profiles.generate_queries.rank_download_queries(queries, demand)
+    # 3 days, then 2 days, then 1 day, then by date (latest first)
+    assert ranked == [q(48, 8), q(49, 1), q(48, 15), q(48, 1), q(50, 1)]
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_date_interval_set() -> None:
+    all_dates = tum_esm_utils.timing.date_range(
+        datetime.date(2020, 1, 1), datetime.date(2021, 12, 31)
+    )
+    for _ in range(50):
+        a = set(random.sample(all_dates, random.randint(0, 300)))
+        b = set(random.sample(all_dates, random.randint(0, 300)))
+        sa, sb = DateIntervalSet.from_dates(a), DateIntervalSet.from_dates(b)
+        assert sa.to_dates() == a
+        assert len(sa) == len(a)
+        assert (sa | sb).to_dates() == a.union(b)
+        assert (sa & sb).to_dates() == a.intersection(b)
+        assert (sa - sb).to_dates() == a.difference(b)
+        assert all((d in sa) == (d in a) for d in all_dates[:: 7])
+
+    s = DateIntervalSet.from_range(datetime.date(2020, 1, 1), datetime.date(2020, 1, 31))
+    assert len(s.ranges) == 1
+    s -= DateIntervalSet.from_dates([datetime.date(2020, 1, 10)])
+    assert s.to_intervals() == [
+        (datetime.date(2020, 1, 1), datetime.date(2020, 1, 9)),
+        (datetime.date(2020, 1, 11), datetime.date(2020, 1, 31)),
+    ]
+    assert not DateIntervalSet.from_range(datetime.date(2020, 1, 2), datetime.date(2020, 1, 1))
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_list_retrieval_demand(
+    provide_config_template: src.types.Config,
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(src.utils.results_catalog, "_CATALOG_PATH", str(tmp_path / "catalog.db"))
+    monkeypatch.setattr(src.utils.profile_store, "_INDEX_FILE", str(tmp_path / "index.json"))
+    config = provide_config_template.model_copy(deep=True)
+    assert config.retrieval is not None
+    for d in ["ifg", "results", "map"]:
+        os.makedirs(tmp_path / d)
+    config.general.data.interferograms.root = str(tmp_path / "ifg")
+    config.general.data.results.root = str(tmp_path / "results")
+    config.general.data.atmospheric_profiles.root = str(tmp_path / "map")
+    os.makedirs(tmp_path / "map" / "GGG2020")
+    config.retrieval.jobs = [
+        src.types.RetrievalJobConfig(
+            retrieval_algorithm="proffast-2.4",
+            atmospheric_profile_model="GGG2020",
+            sensor_ids=["s1"],
+            from_date=datetime.date(2000, 1, 1),
+            to_date=datetime.date(2000, 1, 31),
+        )
+    ]
+    metadata = em27_metadata.EM27MetadataInterface(
+        locations=em27_metadata.types.LocationMetadataList(
+            root=[
+                em27_metadata.types.
+                LocationMetadata(location_id="l1", details="l1 details", lat=48, lon=11, alt=0),
+            ]
+        ),
+        sensors=em27_metadata.types.SensorMetadataList(
+            root=[
+                em27_metadata.types.SensorMetadata(
+                    sensor_id="s1",
+                    serial_number=1,
+                    setups=[
+                        em27_metadata.types.SetupsListItem(
+                            from_datetime="2000-01-01T00:00:00+0000",
+                            to_datetime="2000-12-31T23:59:59+0000",
+                            value=em27_metadata.types.Setup(location_id="l1"),
+                        ),
+                    ],
+                ),
+            ]
+        ),
+        campaigns=em27_metadata.types.CampaignMetadataList(root=[]),
+    )
+
+    # interferograms on five days, one of them outside of the job
+    for day in ["20000102", "20000103", "20000104", "20000105", "20000201"]:
+        os.makedirs(tmp_path / "ifg" / "s1" / day)
+    # one day has been retrieved, another one has profiles
+    os.makedirs(tmp_path / "results" / "proffast-2.4" / "GGG2020" / "s1" / "failed" / "20000103")
+    for h in range(0, 24, 3):
+        with open(tmp_path / "map" / "GGG2020" / f"20000104{h:02d}_48N011E.map", "w"):
+            pass
+
+    demand = src.profiles.generate_queries.list_retrieval_demand(config, "GGG2020", metadata)
+    assert demand == {
+        src.profiles.generate_queries.ProfilesQueryLocation(lat=48, lon=11): [
+            datetime.date(2000, 1, 2).toordinal(),
+            datetime.date(2000, 1, 5).toordinal(),
+        ]
+    }
+    assert src.profiles.generate_queries.list_retrieval_demand(config, "GGG2014", metadata) == {}
@@ -0,0 +1,125 @@
+import datetime
+import os
+import tempfile
+import em27_metadata
+import pytest
+import src
+from ..fixtures import provide_config_template
+
+
+def _get_sdc(sensor_id: str, date: datetime.date) -> em27_metadata.types.SensorDataContext:
+    location = em27_metadata.types.LocationMetadata(
+        location_id="ZEN",
+        details="Zentralfriedhof",
+        lon=16.438481,
+        lat=48.147699,
+        alt=180.0,
+    )
+    return em27_metadata.types.SensorDataContext(
+        sensor_id=sensor_id,
+        serial_number=115,
+        from_datetime=datetime.datetime.combine(date, datetime.time.min),
+        to_datetime=datetime.datetime.combine(date, datetime.time.max),
+        utc_offset=0,
+        pressure_data_source=sensor_id,
+        atmospheric_profile_location=location,
+        location=location,
+    )
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_group_into_batches(provide_config_template: src.types.Config) -> None:
+    config = provide_config_template.model_copy(deep=True)
+    assert config.retrieval is not None
+    config.retrieval.general.ifg_file_regex = "^$(SENSOR_ID)$(DATE).*\\.\\d+$"
+
+    days = [datetime.date(2022, 6, d) for d in [1, 2, 3, 4, 6, 7]]
+    sdcs = [_get_sdc("mc", d) for d in days] + [_get_sdc("md", datetime.date(2022, 6, 2))]
+    # another location in the middle of a series of days
+    sdcs[2] = sdcs[2].model_copy(update={"utc_offset": 1})
+
+    def _dates(batches: list[list[em27_metadata.types.SensorDataContext]]) -> list[list[str]]:
+        return [[f"{sdc.sensor_id}{sdc.from_datetime:%d}" for sdc in b] for b in batches]
+
+    assert _dates(
+        src.retrieval.dispatching.retrieval_queue.group_into_batches(
+            config, sdcs, src.types.config.RetrievalJobSettingsBatchingConfig(max_days=2)
+        )
+    ) == [["mc06", "mc07"], ["mc04"], ["mc03"], ["md02"], ["mc01", "mc02"]]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config.general.data.interferograms.root = tmpdir
+        for date, ifg_count in [(days[3], 1), (days[4], 3), (days[5], 2)]:
+            ifg_directory = os.path.join(tmpdir, "mc", f"{date:%Y%m%d}")
+            os.makedirs(ifg_directory)
+            for i in range(ifg_count):
+                with open(os.path.join(ifg_directory, f"mc{date:%Y%m%d}.{i}"), "w"):
+                    pass
+        assert _dates(
+            src.retrieval.dispatching.retrieval_queue.group_into_batches(
+                config,
+                sdcs[3 : 6],
+                src.types.config.RetrievalJobSettingsBatchingConfig(max_ifg_count=4),
+            )
+        ) == [["mc07"], ["mc06"], ["mc04"]]
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_split_outputs(monkeypatch: pytest.MonkeyPatch) -> None:
+    dates = [datetime.date(2022, 6, d) for d in [1, 2, 3]]
+    sdcs = [_get_sdc("mc", d) for d in dates]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(src.types.retrieval_containers, "_CONTAINERS_DIR", tmpdir)
+        session = src.types.Proffast2RetrievalSession(
+            retrieval_algorithm="proffast-2.4",
+            atmospheric_profile_model="GGG2020",
+            job_settings=src.types.config.RetrievalJobSettingsConfig(),
+            ctx=sdcs[0],
+            ctn=src.types.Proffast24Container(container_id="pytest-batch"),
+            batch_ctxs=sdcs,
+        )
+        src.retrieval.session.run_retrieval.run(session, test_mode=True)
+        batch_directory = os.path.join(
+            session.ctn.data_output_path, "mc_SN115_220601-220603"
+        )
+        os.makedirs(os.path.join(batch_directory, "raw_output_proffast"))
+        for d in dates:
+            for filename in [
+                os.path.join(batch_directory, "raw_output_proffast", f"mc{d:%y%m%d}-invparms.dat"),
+                os.path.join(session.ctn.container_path, "prf", "wrk_fast",
+                             f"mc{d:%y%m%d}-pT_fast_out.dat"),
+            ]:
+                with open(filename, "w") as f:
+                    f.write("...")
+
+        logger = src.retrieval.utils.logger.Logger("pytest", write_to_file=False)
+        src.retrieval.session.split_outputs.run(logger, session)
+
+        assert not os.path.exists(batch_directory)
+        for d in dates:
+            day_directory = os.path.join(
+                session.ctn.data_output_path, f"mc_SN115_{d:%y%m%d}-{d:%y%m%d}"
+            )
+            assert sorted(os.listdir(day_directory)) == [
+                f"comb_invparms_mc_SN115_{d:%y%m%d}-{d:%y%m%d}.csv",
+                "logfiles",
+                "pylot_config.yml",
+                "pylot_log_format.yml",
+                "raw_output_proffast",
+            ]
+            assert os.listdir(os.path.join(day_directory, "raw_output_proffast")) == [
+                f"mc{d:%y%m%d}-invparms.dat"
+            ]
+            with open(
+                os.path.join(day_directory, f"comb_invparms_mc_SN115_{d:%y%m%d}-{d:%y%m%d}.csv")
+            ) as f:
+                assert f.read() == (
+                    "UTC, LocalTime, spectrum, XAIR\n" +
+                    f"some, some, {d:%y%m%d}_120000SN.BIN, 0.9983\n"
+                )
+            assert sorted(
+                os.listdir(src.retrieval.session.split_outputs.get_pt_directory(session, d))
+            ) == ["dummyfile", f"mc{d:%y%m%d}-pT_fast_out.dat"]
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import pytest
+import src
+from ..fixtures import provide_config_template
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_container_trash(
+    provide_config_template: src.types.Config,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    config = provide_config_template.model_copy(deep=True)
+    assert config.retrieval is not None
+    config.retrieval.jobs = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(src.retrieval.dispatching.container_factory, "_CONTAINER_DIR", tmpdir)
+        monkeypatch.setattr(src.types.retrieval_containers, "_CONTAINERS_DIR", tmpdir)
+
+        # leftovers of a previous run
+        os.makedirs(os.path.join(tmpdir, "retrieval-container-old-one", "prf"))
+        os.makedirs(os.path.join(tmpdir, ".trash", "retrieval-container-older-one"))
+        with open(os.path.join(tmpdir, ".gitkeep"), "w"):
+            pass
+
+        logger = src.retrieval.utils.logger.Logger("pytest", write_to_file=False)
+        factory = src.retrieval.dispatching.container_factory.ContainerFactory(config, logger)
+        assert sorted(os.listdir(tmpdir)) == [".gitkeep", ".trash"]
+
+        container_id = factory.label_generator.generate()
+        container = src.types.Proffast24Container(container_id=container_id)
+        for path in [container.container_path, container.data_input_path,
+                     container.data_output_path]:
+            os.makedirs(os.path.join(path, "some", "subdirectory"))
+        factory.containers.append(container)
+        factory.remove_container(container_id)
+        assert sorted(os.listdir(tmpdir)) == [".gitkeep", ".trash"]
+        with pytest.raises(ValueError):
+            factory.remove_container(container_id)
+
+        factory.wait_for_trash_removal()
+        assert os.listdir(os.path.join(tmpdir, ".trash")) == []
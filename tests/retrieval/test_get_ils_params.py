@@ -12,3 +12,24 @@ def test_get_ils_params() -> None:
         src.retrieval.utils.ils.get_ils_params(115, datetime.date(2022, month, 1))
         src.retrieval.utils.ils.get_ils_params(116, datetime.date(2023, month, 1))
         src.retrieval.utils.ils.get_ils_params(117, datetime.date(2024, month, 1))
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_get_ils_params_for_queue() -> None:
+    items = [
+        (61, datetime.date(2020, 1, 1)),
+        (86, datetime.date(2021, 5, 1)),
+        (117, datetime.date(2024, 11, 1)),
+        (61, datetime.date(2020, 1, 1)),
+        (61, datetime.date(2000, 1, 1)),
+        (999, datetime.date(2020, 1, 1)),
+    ]
+    ils_params = src.retrieval.utils.ils.get_ils_params_for_queue(items)
+    assert len(ils_params) == 5
+    for serial_number, date in items[:3]:
+        assert ils_params[(serial_number, date)] == src.retrieval.utils.ils.get_ils_params(
+            serial_number, date
+        )
+    assert ils_params[(61, datetime.date(2000, 1, 1))] is None
+    assert ils_params[(999, datetime.date(2020, 1, 1))] is None
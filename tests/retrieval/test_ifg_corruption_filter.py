@@ -0,0 +1,61 @@
+import os
+import tempfile
+import pytest
+import src
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_ifg_corruption_filter(monkeypatch: pytest.MonkeyPatch) -> None:
+    checked_shards: list[list[str]] = []
+
+    def _detect_corrupt_opus_files(ifg_directory: str) -> dict[str, list[str]]:
+        filenames = sorted(os.listdir(ifg_directory))
+        checked_shards.append(filenames)
+        result: dict[str, list[str]] = {}
+        for filename in filenames:
+            with open(os.path.join(ifg_directory, filename)) as f:
+                if f.read() == "corrupt":
+                    result[filename] = ["Charfilter 'GFW' is missing"]
+        return result
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(
+            src.retrieval.utils.ifg_corruption_filter, "_CACHE_DIR", os.path.join(tmpdir, "cache")
+        )
+        monkeypatch.setattr(
+            src.retrieval.utils.ifg_corruption_filter.tum_esm_utils.em27,
+            "detect_corrupt_opus_files",
+            _detect_corrupt_opus_files,
+        )
+        ifg_dir = os.path.join(tmpdir, "ifgs")
+        os.mkdir(ifg_dir)
+        filenames = [f"ma20220316.ifg.{i:04d}" for i in range(240)]
+        for i, filename in enumerate(filenames):
+            with open(os.path.join(ifg_dir, filename), "w") as f:
+                f.write("corrupt" if (i % 7 == 0) else "ok")
+        expected = {f: ["Charfilter 'GFW' is missing"] for f in filenames[:: 7]}
+
+        # the files are split into shards of at least 50 files
+        result = src.retrieval.utils.ifg_corruption_filter.detect_corrupt_files(
+            ifg_dir, filenames, max_process_count=8
+        )
+        assert result == expected
+        assert len(checked_shards) == 4
+        assert sorted(f for s in checked_shards for f in s) == filenames
+
+        # a rerun only checks the new and modified files
+        checked_shards.clear()
+        with open(os.path.join(ifg_dir, filenames[1]), "w") as f:
+            f.write("corrupt")
+        with open(os.path.join(ifg_dir, "ma20220316.ifg.0240"), "w") as f:
+            f.write("ok")
+        result = src.retrieval.utils.ifg_corruption_filter.detect_corrupt_files(
+            ifg_dir, filenames + ["ma20220316.ifg.0240"], max_process_count=8
+        )
+        assert checked_shards == [[filenames[1], "ma20220316.ifg.0240"]]
+        assert result == {**expected, filenames[1]: ["Charfilter 'GFW' is missing"]}
+
+        checked_shards.clear()
+        src.retrieval.utils.ifg_corruption_filter.detect_corrupt_files(ifg_dir, filenames)
+        assert checked_shards == []
@@ -0,0 +1,166 @@
+import datetime
+import os
+import re
+import tempfile
+import numpy as np
+import pytest
+import tum_esm_utils
+import src
+from ..fixtures import download_sample_data
+
+PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(__file__, current_depth=3)
+
+
+def _encode_parameters(parameters: dict[str, str | float]) -> bytes:
+    content = b""
+    for name, value in parameters.items():
+        if isinstance(value, str):
+            encoded = value.encode() + b"\0"
+            encoded += b"\0" * (-len(encoded) % 4)
+            parameter_type = 2
+        else:
+            encoded = np.array([value], dtype="<f8").tobytes()
+            parameter_type = 1
+        content += name.encode() + b"\0"
+        content += np.array([parameter_type, len(encoded) // 2], dtype="<i2").tobytes()
+        content += encoded
+    return content + b"END\0" + np.array([0, 0], dtype="<i2").tobytes()
+
+
+def _write_opus_file(
+    filepath: str,
+    dc_level: float,
+    dc_variation: float,
+    measurement_time: datetime.datetime = datetime.datetime(2017, 6, 8, 12),
+) -> None:
+    """Write a minimal OPUS file with one channel. The DC level decreases
+    linearly over the forward and the backward scan. The measurement time
+    is stored in local time (UTC+2) with a scan duration of 10 seconds."""
+
+    point_count = 20000
+    x = np.linspace(-1, 1, point_count)
+    scan = (
+        dc_level * (1 + dc_variation * (1 - x) / 2) + 0.01 * np.exp(-(x * 200)**2) *
+        np.cos(x * 5000)
+    )
+    ifg = np.concatenate([scan, scan[::-1]]).astype("<f4")
+
+    local_time = measurement_time + datetime.timedelta(hours=2, seconds=-5)
+    ifg_parameters = _encode_parameters({
+        "DAT": local_time.strftime("%d/%m/%Y"),
+        "TIM": local_time.strftime("%H:%M:%S.000 (GMT+2)"),
+    })
+    acquisition_parameters = _encode_parameters({"DUR": 10.0})
+
+    directory_pointer = 24
+    block_pointer = directory_pointer + 12 * 4
+    blocks: list[tuple[int, bytes]] = [
+        (32, acquisition_parameters),
+        (2071, ifg_parameters),
+        (2055, ifg.tobytes()),
+    ]
+    with open(filepath, "wb") as f:
+        f.write(np.array([-16905718], dtype="<i4").tobytes())
+        f.write(np.array([920622.0], dtype="<f8").tobytes())
+        f.write(np.array([directory_pointer, 40, 4], dtype="<i4").tobytes())
+        f.write(np.array([1, 0, 0], dtype="<i4").tobytes())
+        for block_type, content in blocks:
+            f.write(
+                np.array([block_type, len(content) // 4, block_pointer], dtype="<i4").tobytes()
+            )
+            block_pointer += len(content)
+        for _, content in blocks:
+            f.write(content)
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_ifg_prescreen() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _write_opus_file(os.path.join(tmpdir, "ma20220316.ifg.0001"), 0.5, 0.02)
+        _write_opus_file(os.path.join(tmpdir, "ma20220316.ifg.0002"), 0.02, 0.02)
+        _write_opus_file(os.path.join(tmpdir, "ma20220316.ifg.0003"), 0.5, 0.5)
+        _write_opus_file(os.path.join(tmpdir, "ma20220316.ifg.0004"), 0.0475, 0.1005)
+        with open(os.path.join(tmpdir, "ma20220316.ifg.0005"), "wb") as f:
+            f.write(b"not an opus file")
+        with open(os.path.join(tmpdir, "ma20220316.ifg.0006"), "wb"):
+            pass
+
+        result = src.retrieval.utils.ifg_prescreen.screen_interferograms(
+            tmpdir,
+            sorted(os.listdir(tmpdir)),
+            dc_min_threshold=0.05,
+            dc_var_threshold=0.1,
+        )
+
+        # files just outside of the thresholds and unreadable files are kept
+        assert sorted(result.keys()) == ["ma20220316.ifg.0002", "ma20220316.ifg.0003"]
+        assert result["ma20220316.ifg.0002"].startswith("DC level")
+        assert result["ma20220316.ifg.0003"].startswith("DC variation")
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_ifg_prescreen_dc_statistics(download_sample_data: None) -> None:
+    """The DC levels and variations must match the ones computed by the
+    preprocess (columns 11-18 of `logfile.dat`: mean, min, max and variation
+    of the forward and the backward interferogram)."""
+
+    for sensor_id, date in [("so", "20170608"), ("so", "20170609"), ("mc", "20220602")]:
+        ifg_dir = os.path.join(
+            PROJECT_DIR, "data", "testing", "inputs", "data", "ifg", sensor_id, date
+        )
+        # the interferograms are passed to the preprocess in this order
+        ifg_filenames = sorted([
+            f for f in os.listdir(ifg_dir) if re.match(f"^{sensor_id}{date}.*\\.\\d+$", f)
+        ])
+        logfile_path = os.path.join(
+            PROJECT_DIR, "data", "testing", "inputs", "results", "proffast-2.4", "GGG2020",
+            sensor_id, "successful", date, "analysis", "cal", "logfile.dat"
+        )
+        with open(logfile_path) as f:
+            rows = [line.split() for line in f.read().split("\n") if len(line.strip()) > 0]
+        assert len(rows) > 0
+
+        for row in rows:
+            ifg_index = int(row[9].split(".")[-1])
+            statistics = src.retrieval.utils.ifg_prescreen._read_dc_statistics(
+                os.path.join(ifg_dir, ifg_filenames[ifg_index - 1])
+            )
+            assert statistics is not None
+            for (dc_mean, dc_var), offset in zip(statistics, [10, 14]):
+                assert dc_mean == pytest.approx(float(row[offset]), rel=1e-4)
+                assert dc_var == pytest.approx(float(row[offset + 3]), abs=1e-5)
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_solar_zenith_angle_filter() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for hour in range(0, 24, 2):
+            _write_opus_file(
+                os.path.join(tmpdir, f"so20170608.ifg.{hour:04d}"),
+                0.5,
+                0.02,
+                measurement_time=datetime.datetime(2017, 6, 8, hour),
+            )
+        with open(os.path.join(tmpdir, "so20170608.ifg.9999"), "wb") as f:
+            f.write(b"not an opus file")
+
+        # midnight sun in Sodankylä, the solar zenith angle ranges from
+        # about 44.5° at 10:00 UTC to 89.7° at 22:00 UTC
+        result = src.retrieval.utils.ifg_prescreen.screen_solar_zenith_angles(
+            tmpdir,
+            sorted(os.listdir(tmpdir)),
+            lat=67.366,
+            lon=26.630,
+            alt=181.0,
+            utc_offset=2,
+            max_sza=80,
+        )
+        assert sorted(result.keys()) == [
+            "so20170608.ifg.0000",
+            "so20170608.ifg.0002",
+            "so20170608.ifg.0020",
+            "so20170608.ifg.0022",
+        ]
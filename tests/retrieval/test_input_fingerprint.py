@@ -0,0 +1,140 @@
+import datetime
+import json
+import os
+import tempfile
+import em27_metadata
+import pytest
+import src
+from ..fixtures import provide_config_template
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_input_fingerprint(
+    provide_config_template: src.types.Config,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    config = provide_config_template.model_copy(deep=True)
+    assert config.retrieval is not None
+    config.retrieval.general.ifg_file_regex = "^$(SENSOR_ID)$(DATE).*\\.\\d+$"
+    config.general.data.ground_pressure.file_regex = (
+        "^ground-pressure-$(SENSOR_ID)-$(YYYY)-$(MM)-$(DD).csv$"
+    )
+
+    location = em27_metadata.types.LocationMetadata(
+        location_id="ZEN", details="Zentralfriedhof", lon=16.438481, lat=48.147699, alt=180.0
+    )
+    sdc = em27_metadata.types.SensorDataContext(
+        sensor_id="mc",
+        serial_number=115,
+        from_datetime=datetime.datetime(2022, 6, 2, 0, 0, 0),
+        to_datetime=datetime.datetime(2022, 6, 2, 23, 59, 59),
+        utc_offset=0,
+        pressure_data_source="mc",
+        atmospheric_profile_location=location,
+        location=location,
+    )
+    job_settings = src.types.config.RetrievalJobSettingsConfig()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fingerprint_module = src.retrieval.utils.input_fingerprint
+        monkeypatch.setattr(
+            fingerprint_module, "_FILE_CHECKSUM_CACHE_PATH", os.path.join(tmpdir, "checksums.json")
+        )
+        monkeypatch.setattr(
+            fingerprint_module, "_RESULT_FINGERPRINT_INDEX_PATH", os.path.join(tmpdir, "index.json")
+        )
+        for d in ["ifg", "log", "map"]:
+            os.makedirs(os.path.join(tmpdir, d))
+        config.general.data.interferograms.root = os.path.join(tmpdir, "ifg")
+        config.general.data.ground_pressure.path.root = os.path.join(tmpdir, "log")
+        config.general.data.atmospheric_profiles.root = os.path.join(tmpdir, "map")
+
+        ifg_dir = os.path.join(tmpdir, "ifg", "mc", "20220602")
+        pressure_file = os.path.join(tmpdir, "log", "mc", "ground-pressure-mc-2022-06-02.csv")
+        map_dir = os.path.join(tmpdir, "map", "GGG2020")
+        os.makedirs(ifg_dir)
+        os.makedirs(os.path.dirname(pressure_file))
+        os.makedirs(map_dir)
+        for i in range(3):
+            with open(os.path.join(ifg_dir, f"mc20220602.ifg.{i:04d}"), "w") as f:
+                f.write("...")
+        with open(pressure_file, "w") as f:
+            f.write("utc-date,utc-time,pressure\n2022-06-02,12:00:00,1013.2\n")
+        map_files = [os.path.join(map_dir, f"20220602{t:02d}_48N016E.map") for t in range(0, 22, 3)]
+        for filepath in map_files:
+            with open(filepath, "w") as f:
+                f.write(os.path.basename(filepath))
+
+        def _fingerprint() -> src.retrieval.utils.input_fingerprint.InputFingerprint:
+            return fingerprint_module.compute_input_fingerprint(
+                config, "proffast-2.4", "GGG2020", sdc, job_settings
+            )
+
+        fingerprint = _fingerprint()
+        assert fingerprint == _fingerprint()
+        assert os.path.isfile(os.path.join(tmpdir, "checksums.json"))
+
+        # packing the map files does not change the fingerprint
+        src.utils.profile_store.pack_files(map_dir, map_files)
+        for filepath in map_files:
+            os.remove(filepath)
+        assert fingerprint == _fingerprint()
+        archive_path = os.path.join(map_dir, "202206_48N016E.zip")
+        os.rename(archive_path, archive_path + ".bak")
+        assert fingerprint.get_changed_inputs(_fingerprint()) == ["atmospheric_profiles"]
+        os.rename(archive_path + ".bak", archive_path)
+
+        # late-arriving interferograms and corrected pressure files
+        with open(os.path.join(ifg_dir, "mc20220602.ifg.0003"), "w") as f:
+            f.write("...")
+        with open(pressure_file, "w") as f:
+            f.write("utc-date,utc-time,pressure\n2022-06-02,12:00:00,1013.25\n")
+        assert fingerprint.get_changed_inputs(_fingerprint()) == [
+            "interferograms", "ground_pressure"
+        ]
+
+        # metadata and settings which do not affect the results
+        job_settings = src.types.config.RetrievalJobSettingsConfig(
+            store_binary_spectra=True, output_suffix="suffix"
+        )
+        sdc = sdc.model_copy(
+            update={"location": location.model_copy(update={"details": "Vienna"})}
+        )
+        assert fingerprint.get_changed_inputs(_fingerprint()) == [
+            "interferograms", "ground_pressure"
+        ]
+
+        # settings which change the interferograms passed to the retrieval
+        for settings in [
+            {"use_ifg_prescreen": True},
+            {"use_ifg_corruption_filter": False},
+            {"max_sza": 80},
+        ]:
+            job_settings = src.types.config.RetrievalJobSettingsConfig.model_validate(settings)
+            assert fingerprint.get_changed_inputs(_fingerprint()) == [
+                "interferograms", "ground_pressure", "job_settings"
+            ]
+
+        # changed metadata and settings
+        job_settings = src.types.config.RetrievalJobSettingsConfig(dc_min_threshold=0.1)
+        sdc = sdc.model_copy(update={"utc_offset": 1})
+        assert fingerprint.get_changed_inputs(_fingerprint()) == [
+            "interferograms", "ground_pressure", "metadata", "job_settings"
+        ]
+
+        # fingerprints stored in the results
+        result_dirs = [os.path.join(tmpdir, "results", d) for d in ["a", "b", "c"]]
+        for result_dir in result_dirs:
+            os.makedirs(result_dir)
+        with open(os.path.join(result_dirs[0], "about.json"), "w") as f:
+            json.dump({"inputFingerprint": fingerprint.model_dump()}, f)
+        with open(os.path.join(result_dirs[1], "about.json"), "w") as f:
+            json.dump({"session": {}}, f)
+        for _ in range(2):
+            assert fingerprint_module.get_stored_fingerprints(result_dirs) == {
+                result_dirs[0]: fingerprint,
+                result_dirs[1]: None,
+                result_dirs[2]: None,
+            }
+        assert os.path.isfile(os.path.join(tmpdir, "index.json"))
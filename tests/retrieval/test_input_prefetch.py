@@ -0,0 +1,77 @@
+import datetime
+import os
+import tempfile
+import pytest
+import tum_esm_utils
+import src
+from ..fixtures import provide_config_template
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_input_prefetch(provide_config_template: src.types.Config) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = provide_config_template.model_copy(deep=True)
+        assert config.retrieval is not None
+        config.general.data.interferograms.root = os.path.join(tmpdir, "ifgs")
+        config.retrieval.general.ifg_file_regex = "^$(SENSOR_ID)$(DATE).*\\.\\d+$"
+        os.mkdir(os.path.join(tmpdir, "scratch"))
+        config.retrieval.general.input_prefetch = src.types.config.RetrievalInputPrefetchConfig(
+            scratch_dir=tum_esm_utils.validators.StrictDirectoryPath(
+                os.path.join(tmpdir, "scratch")
+            ),
+            max_size_gb=2.5e-6,
+            lookahead=3,
+        )
+
+        # four days with 1 kB each, one day with 3 kB
+        days = [("ma", datetime.date(2022, 3, d)) for d in range(1, 6)]
+        for sensor_id, date in days:
+            directory = os.path.join(tmpdir, "ifgs", sensor_id, date.strftime("%Y%m%d"))
+            os.makedirs(directory)
+            file_count = 3 if (date.day == 2) else 1
+            for i in range(file_count):
+                filename = f"ma{date.strftime('%Y%m%d')}.ifg.{i}"
+                with open(os.path.join(directory, filename), "wb") as f:
+                    f.write(b"x" * 1000)
+            with open(os.path.join(directory, "notes.txt"), "wb") as f:
+                f.write(b"not an interferogram")
+
+        def _prefetched_days() -> list[datetime.date]:
+            return [
+                d for s, d in days
+                if src.retrieval.utils.input_prefetch.get_prefetched_directory(config, s, d)
+                is not None
+            ]
+
+        logger = src.retrieval.utils.logger.Logger("pytest", write_to_file=False)
+        prefetcher = src.retrieval.utils.input_prefetch.InputPrefetcher(config, logger)
+        try:
+            # the second day exceeds the budget, the fourth one is beyond the lookahead
+            prefetcher.update(upcoming_days=days, running_days=[])
+            prefetcher.wait()
+            assert _prefetched_days() == [days[0][1], days[2][1]]
+            prefetched_directory = src.retrieval.utils.input_prefetch.get_prefetched_directory(
+                config, *days[0]
+            )
+            assert prefetched_directory is not None
+            assert os.listdir(prefetched_directory) == ["ma20220301.ifg.0"]
+
+            # days which are running are kept, the budget only allows two days
+            prefetcher.update(upcoming_days=days[3 :], running_days=[days[0]])
+            prefetcher.wait()
+            assert _prefetched_days() == [days[0][1], days[3][1]]
+
+            prefetcher.update(upcoming_days=days[4 :], running_days=[])
+            prefetcher.wait()
+            assert _prefetched_days() == [days[4][1]]
+
+            # skipped days are tried again when they are queued again
+            for i in range(1, 3):
+                os.remove(os.path.join(tmpdir, "ifgs", "ma", "20220302", f"ma20220302.ifg.{i}"))
+            prefetcher.update(upcoming_days=days[1 : 2], running_days=[])
+            prefetcher.wait()
+            assert _prefetched_days() == [days[1][1]]
+        finally:
+            prefetcher.teardown()
+        assert os.listdir(os.path.join(tmpdir, "scratch")) == []
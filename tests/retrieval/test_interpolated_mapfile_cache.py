@@ -0,0 +1,117 @@
+from typing import Any
+import datetime
+import importlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import pytest
+import tum_esm_utils
+import src
+
+PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(__file__, current_depth=3)
+
+
+def _load_preparation_class(retrieval_algorithm: str) -> Any:
+    sys.path.insert(
+        0, os.path.join(PROJECT_DIR, "src", "retrieval", "algorithms", retrieval_algorithm, "main")
+    )
+    try:
+        return importlib.import_module("prfpylot.prepare").Preparation
+    finally:
+        sys.path.pop(0)
+        for module in [m for m in sys.modules if m.split(".")[0] == "prfpylot"]:
+            sys.modules.pop(module)
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+@pytest.mark.parametrize("retrieval_algorithm", ["proffast-2.4", "proffast-2.4.1"])
+def test_interpolated_mapfile_cache(
+    retrieval_algorithm: str,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    Preparation = _load_preparation_class(retrieval_algorithm)
+    src_dir = os.path.join(PROJECT_DIR, "data", "testing", "inputs", "data", "map", "GGG2020")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        map_path = os.path.join(tmpdir, "map")
+        os.mkdir(map_path)
+        for h in range(0, 24, 3):
+            shutil.copyfile(
+                os.path.join(src_dir, f"20170608{h:02d}_67N027E.map"),
+                os.path.join(map_path, f"so_67N_027E_20170608{h:02d}Z.map"),
+            )
+
+        def _interpolate(result_folder: str, cache: Any, lat: float = 67.366) -> str:
+            p = Preparation.__new__(Preparation)
+            p.logger = logging.getLogger("test")
+            p.site_abbrev = "so"
+            p.map_path = map_path
+            p.coords = {"lat": lat, "lon": 26.630}
+            p.utc_offset = 0.0
+            p._localtime_offset = 2.0
+            p.result_folder = os.path.join(tmpdir, result_folder)
+            p.interpolated_mapfile_cache = cache
+            p.interpolate_map_files(datetime.datetime(2017, 6, 8))
+            return os.path.join(p.result_folder, "interpolated_mapfiles", "so2017060810_Z.map")
+
+        cache_dir = os.path.join(tmpdir, "cache", "GGG2020", "67N027E")
+        uncached = _interpolate("uncached", None)
+        first = _interpolate("first", cache_dir)
+        first_cached_mapfiles = os.listdir(cache_dir)
+        assert len(first_cached_mapfiles) == 1
+        assert first_cached_mapfiles[0].startswith("201706081000_")
+        assert not os.path.islink(first)
+
+        with caplog.at_level(logging.DEBUG, logger="test"):
+            second = _interpolate("second", cache_dir)
+        assert "Using cached interpolated mapfile" in caplog.text
+        assert os.listdir(cache_dir) == first_cached_mapfiles
+        assert not os.path.islink(second)
+
+        # the coordinates of cached files are checked as well
+        caplog.clear()
+        with caplog.at_level(logging.WARNING, logger="test"):
+            _interpolate("third", cache_dir, lat=12.0)
+        assert "does not match the Latitude" in caplog.text
+
+        # replaced map files are interpolated again
+        with open(os.path.join(map_path, "so_67N_027E_2017060812Z.map")) as f:
+            content = f.read()
+        with open(os.path.join(map_path, "so_67N_027E_2017060812Z.map"), "w") as f:
+            f.write(content.replace(" 284.82,", " 290.00,"))
+        caplog.clear()
+        with caplog.at_level(logging.DEBUG, logger="test"):
+            fourth = _interpolate("fourth", cache_dir)
+        assert "Using cached interpolated mapfile" not in caplog.text
+        assert len(os.listdir(cache_dir)) == 2
+        with open(second) as f1, open(fourth) as f2:
+            assert f1.read() != f2.read()
+
+        # the published results do not depend on the cache
+        shutil.rmtree(cache_dir)
+        with open(uncached) as f1, open(second) as f2:
+            assert f1.read() == f2.read()
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_prune_interpolated_mapfile_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(src.retrieval.utils.interpolated_mapfile_cache, "_CACHE_DIR", tmpdir)
+        assert src.retrieval.utils.interpolated_mapfile_cache.prune_cache(0) == 0
+
+        for i, slug in enumerate(["48N011E", "67N027E", "48N012E"]):
+            os.makedirs(os.path.join(tmpdir, "GGG2020", slug))
+            mapfile = os.path.join(tmpdir, "GGG2020", slug, "201706081000_0123456789abcdef.map")
+            with open(mapfile, "w") as f:
+                f.write("x" * 100)
+            os.utime(mapfile, (1_000_000 + i, 1_000_000 + i))
+
+        assert src.retrieval.utils.interpolated_mapfile_cache.prune_cache(300) == 0
+        assert src.retrieval.utils.interpolated_mapfile_cache.prune_cache(199) == 2
+        assert os.listdir(os.path.join(tmpdir, "GGG2020", "48N011E")) == []
+        assert os.listdir(os.path.join(tmpdir, "GGG2020", "67N027E")) == []
+        assert len(os.listdir(os.path.join(tmpdir, "GGG2020", "48N012E"))) == 1
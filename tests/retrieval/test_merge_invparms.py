@@ -1,5 +1,6 @@
 import glob
 import os
+import polars as pl
 import pytest
 import tum_esm_utils
 import src
@@ -24,3 +25,6 @@ def test_merge_invparms_files() -> None:
     assert merged_df is not None
 
     assert sum([len(df) for df in individual_dfs if df is not None]) == len(merged_df)
+    assert merged_df.equals(pl.concat([df for df in individual_dfs if df is not None]))
+    assert merged_df.columns[:3] == ["JulianDate", "HHMMSS_ID", "SX"]
+    assert merged_df["XCO2"].dtype == pl.Float64
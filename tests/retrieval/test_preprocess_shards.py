@@ -0,0 +1,112 @@
+from typing import Any, Optional
+import datetime
+import logging
+import os
+import tempfile
+import pytest
+import src
+
+
+class _FakePylot:
+    """Mimics the parts of the Proffast 2.X Pylot used by the sharded
+    preprocess. The "preprocess" writes one spectrum per interferogram
+    and a line per interferogram into the `logfile.dat` of its output
+    directory, like preprocess6.
+
+    The Pylots of Proffast 2.2 and 2.3 store the measurement days in
+    `dates` instead of `meas_dates`, the one of 2.2 also writes the TCCON
+    input file before the preprocessing."""
+    def __init__(self, root: str, igrams: list[str], proffast_version: str) -> None:
+        self.root = root
+        self.igrams = igrams
+        self.start_with_spectra = False
+        if proffast_version in ["2.2", "2.3"]:
+            self.dates = [datetime.date(2022, 6, 2), datetime.date(2022, 6, 3)]
+        else:
+            self.meas_dates = [datetime.date(2022, 6, 2), datetime.date(2022, 6, 3)]
+        if proffast_version == "2.2":
+            self.tccon_mode = True
+        self.global_inputfile_list: list[str] = []
+        self.logger = logging.getLogger("pytest")
+        self.logged_outputs: list[Any] = []
+
+    def _get_executable(self, program: str) -> str:
+        return os.path.join(self.root, "preprocess", program)
+
+    def get_prf_input_path(
+        self, template_type: str, date: Optional[datetime.date] = None
+    ) -> str:
+        if template_type == "tccon":
+            return os.path.join(self.root, "preprocess", "tccon.inp")
+        return os.path.join(self.root, "preprocess", f"preprocess6ma_{date:%y%m%d}.inp")
+
+    def generate_prf_input(self, template_type: str) -> None:
+        assert template_type == "tccon"
+        with open(self.get_prf_input_path("tccon"), "w") as f:
+            f.write("tccon")
+
+    def get_prep_parameters(self, meas_date: datetime.date) -> dict[str, str]:
+        # there are no interferograms on the second day
+        return {
+            "igrams": "\n".join(self.igrams) if meas_date.day == 2 else "",
+            "path_spectra": os.path.join(self.root, "analysis", f"{meas_date:%y%m%d}", "cal"),
+        }
+
+    def replace_params_in_template(
+        self, parameters: dict[str, str], template_type: str, prf_input_file: str
+    ) -> None:
+        with open(prf_input_file, "w") as f:
+            f.write(parameters["path_spectra"] + "\n" + parameters["igrams"])
+
+    def run_prf_with_inputfile(
+        self, inputfile: str, executable: str, popen_kwargs: dict[str, str]
+    ) -> str:
+        with open(os.path.join(popen_kwargs["cwd"], os.path.basename(inputfile))) as f:
+            path_spectra, *igrams = f.read().split("\n")
+        with open(os.path.join(path_spectra, "logfile.dat"), "w") as f:
+            for i, igram in enumerate(igrams):
+                f.write(f"{i + 1:7d}  0  {igram}\n")
+                with open(os.path.join(path_spectra, f"{igram}SN.BIN"), "w") as g:
+                    g.write("...")
+        return inputfile
+
+    def _write_logfile(self, program_name: str, output: list[Any]) -> None:
+        self.logged_outputs = output
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+@pytest.mark.parametrize("proffast_version", ["2.2", "2.3", "2.4"])
+def test_preprocess_shards(proffast_version: str) -> None:
+    assert src.retrieval.utils.preprocess_shards.split_into_shards(
+        [str(i) for i in range(10)], 4
+    ) == [["0", "1", "2"], ["3", "4", "5"], ["6", "7", "8"], ["9"]]
+    assert src.retrieval.utils.preprocess_shards.split_into_shards(["0", "1"], 4) == [["0"], ["1"]]
+    assert src.retrieval.utils.preprocess_shards.split_into_shards([], 4) == []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.makedirs(os.path.join(tmpdir, "preprocess"))
+        igrams = [f"ma20220602.ifg.{i:04d}" for i in range(11)]
+        pylot = _FakePylot(tmpdir, igrams, proffast_version)
+        src.retrieval.utils.preprocess_shards.run_sharded_preprocess(pylot, 3)
+
+        # days without interferograms are dropped like in `Pylot.run_preprocess`
+        if proffast_version in ["2.2", "2.3"]:
+            assert pylot.dates == [datetime.date(2022, 6, 2)]
+        else:
+            assert pylot.meas_dates == [datetime.date(2022, 6, 2)]
+        assert os.path.isfile(os.path.join(tmpdir, "preprocess", "tccon.inp")) == (
+            proffast_version == "2.2"
+        )
+
+        analysis_dir = os.path.join(tmpdir, "analysis", "220602")
+        assert os.listdir(analysis_dir) == ["cal"]
+        assert sorted(os.listdir(os.path.join(analysis_dir, "cal"))) == sorted(
+            [f"{i}SN.BIN" for i in igrams] + ["logfile.dat"]
+        )
+        with open(os.path.join(analysis_dir, "cal", "logfile.dat")) as f:
+            assert f.read() == "".join(
+                f"{i + 1:7d}  0  {igram}\n" for i, igram in enumerate(igrams)
+            )
+        assert len(pylot.global_inputfile_list) == 3
+        assert pylot.logged_outputs == pylot.global_inputfile_list
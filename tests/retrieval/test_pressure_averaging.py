@@ -1,5 +1,6 @@
 import datetime
 import os
+import pathlib
 import random
 import pytest
 import tum_esm_utils
@@ -11,14 +12,26 @@ _GROUND_PRESSURE_DIR = tum_esm_utils.files.rel_to_abs_path("../../data/testing/i
 
 @pytest.mark.order(3)
 @pytest.mark.quick
-def test_solar_noon_computation() -> None:
+def test_solar_noon_computation(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pressure_averaging = src.retrieval.utils.pressure_averaging
+    cache_path = str(tmp_path / "solar_noon_cache.json")
+    monkeypatch.setattr(pressure_averaging, "_SOLAR_NOON_CACHE_PATH", cache_path)
+    monkeypatch.setattr(pressure_averaging, "_MAX_CACHE_ENTRIES", 50)
+
     start_date = datetime.date(2000, 1, 1)
     for _ in range(100):
         date = start_date + datetime.timedelta(days=random.randint(0, 365 * 30))
         lat = random.uniform(-60, 60)
         lon = random.uniform(-180, 180)
-        solar_noon = src.retrieval.utils.pressure_averaging.compute_solar_noon_time(lat, lon, date)
+        solar_noon = pressure_averaging.compute_solar_noon_time(lat, lon, date)
         assert solar_noon.date() == date
+        assert pressure_averaging.compute_solar_noon_time(lat, lon, date) == solar_noon
+
+    # only the most recent entries are kept
+    cache = pressure_averaging.SolarNoonCache.load()
+    assert len(cache.root) == 50
+    last_key = pressure_averaging.SolarNoonCache.get_key(round(lat, 2), round(lon, 2), date)
+    assert last_key in cache.root
 
 
 @pytest.mark.order(3)
@@ -35,3 +48,27 @@ def test_pressure_averaging(download_sample_data: None) -> None:
         )
         assert isinstance(pressure, float)
         assert 900 <= pressure <= 1100
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_batched_solar_noon_computation() -> None:
+    start_date = datetime.date(2000, 1, 1)
+    queries: list[tuple[float, float, datetime.date]] = []
+    for _ in range(5):
+        lat = round(random.uniform(-60, 60), 2)
+        lon = round(random.uniform(-180, 180), 2)
+        first_date = start_date + datetime.timedelta(days=random.randint(0, 365 * 30))
+        queries.extend([(lat, lon, first_date + datetime.timedelta(days=i * random.randint(1, 20)))
+                        for i in range(20)])
+
+    batched_solar_noons = src.retrieval.utils.pressure_averaging.compute_solar_noon_times(
+        queries, use_cache=False
+    )
+    assert len(batched_solar_noons) == len(queries)
+    for (lat, lon, date), batched_solar_noon in zip(queries, batched_solar_noons):
+        assert batched_solar_noon.date() == date
+        single_solar_noon = src.retrieval.utils.pressure_averaging.compute_solar_noon_times(
+            [(lat, lon, date)], use_cache=False
+        )[0]
+        assert abs((batched_solar_noon - single_solar_noon).total_seconds()) < 1
@@ -0,0 +1,86 @@
+from typing import Any
+import datetime
+import importlib.util
+import os
+import tempfile
+import pytest
+import tum_esm_utils
+
+PROJECT_DIR = tum_esm_utils.files.get_parent_dir_path(__file__, current_depth=3)
+
+
+class _FakePylot:
+    """Provides the attributes of the Pylot used to drop pruned days,
+    `dates` (Proffast 2.2/2.3) or `meas_dates` (Proffast 2.4)."""
+
+    def __init__(self, root: str, dates_attribute: str, dates: list[datetime.datetime]) -> None:
+        self.analysis_instrument_path = os.path.join(root, "analysis", "so_SN039")
+        self.proffast_path = os.path.join(root, "prf")
+        self.site_name = "so"
+        self.dates_attribute = dates_attribute
+        setattr(self, dates_attribute, dates)
+
+    def get_localdate_spectra(self) -> dict[datetime.date, list[str]]:
+        localdate_spectra: dict[datetime.date, list[str]] = {}
+        for date in getattr(self, self.dates_attribute):
+            cal_dir = os.path.join(self.analysis_instrument_path, date.strftime("%y%m%d"), "cal")
+            localdate_spectra[date.date()] = sorted(os.listdir(cal_dir))
+        return localdate_spectra
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+@pytest.mark.parametrize(
+    "retrieval_algorithm,dates_attribute",
+    [
+        ("proffast-2.2", "dates"),
+        ("proffast-2.3", "dates"),
+        ("proffast-2.4", "meas_dates"),
+        ("proffast-2.4.1", "meas_dates"),
+    ],
+)
+def test_drop_pruned_dates(retrieval_algorithm: str, dates_attribute: str) -> None:
+    spec = importlib.util.spec_from_file_location(
+        "run_pylot_container",
+        os.path.join(
+            PROJECT_DIR, "src", "retrieval", "algorithms", retrieval_algorithm,
+            "run_pylot_container.py"
+        ),
+    )
+    assert (spec is not None) and (spec.loader is not None)
+    run_pylot_container: Any = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(run_pylot_container)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # day 1 has no spectra, day 2 has no map file, day 3 is complete
+        dates = [datetime.datetime(2017, 6, d) for d in [1, 2, 3]]
+        pylot = _FakePylot(tmpdir, dates_attribute, dates.copy())
+        for date in dates:
+            os.makedirs(
+                os.path.join(pylot.analysis_instrument_path, date.strftime("%y%m%d"), "cal")
+            )
+        for date in dates[1 :]:
+            with open(
+                os.path.join(
+                    pylot.analysis_instrument_path, date.strftime("%y%m%d"), "cal",
+                    f"{date.strftime('%y%m%d')}_083000SN.BIN"
+                ), "w"
+            ) as f:
+                f.write("spectrum")
+        os.makedirs(os.path.join(pylot.proffast_path, "wrk_fast"))
+        with open(
+            os.path.join(pylot.proffast_path, "wrk_fast", "so170603-pT_fast_out.dat"), "w"
+        ) as f:
+            f.write("pT")
+
+        run_pylot_container._drop_pruned_dates(pylot, "pcxs")
+        assert getattr(pylot, dates_attribute) == dates[1 :]
+        assert not hasattr(pylot, "localdate_spectra")
+
+        run_pylot_container._drop_pruned_dates(pylot, "invers")
+        assert getattr(pylot, dates_attribute) == dates[1 :]
+        assert getattr(pylot, "localdate_spectra") == {
+            datetime.date(2017, 6, 3): ["170603_083000SN.BIN"]
+        }
+        if dates_attribute == "meas_dates":
+            assert getattr(pylot, "local_dates") == [datetime.date(2017, 6, 3)]
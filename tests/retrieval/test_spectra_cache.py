@@ -0,0 +1,182 @@
+import datetime
+import os
+import tempfile
+import em27_metadata
+import pydantic
+import pytest
+import src
+from ..fixtures import provide_config_template
+
+LOCATION = em27_metadata.types.LocationMetadata(
+    location_id="SOD", details="Sodankyla", lon=26.630, lat=67.366, alt=181.0
+)
+
+
+def _create_session(
+    container_id: str,
+    atmospheric_profile_model: src.types.AtmosphericProfileModel,
+    ifg_dir: str,
+) -> src.types.Proffast2RetrievalSession:
+    session = src.types.Proffast2RetrievalSession(
+        retrieval_algorithm="proffast-2.4",
+        atmospheric_profile_model=atmospheric_profile_model,
+        job_settings=src.types.config.RetrievalJobSettingsConfig(),
+        ctx=em27_metadata.types.SensorDataContext(
+            sensor_id="so",
+            serial_number=39,
+            from_datetime=datetime.datetime(2017, 6, 8, 0, 0, 0),
+            to_datetime=datetime.datetime(2017, 6, 8, 23, 59, 59),
+            utc_offset=0,
+            pressure_data_source="so",
+            atmospheric_profile_location=LOCATION,
+            location=LOCATION,
+        ),
+        ctn=src.types.Proffast24Container(container_id=container_id),
+    )
+    ctn = session.ctn
+    os.makedirs(os.path.join(ctn.container_path, "prf", "preprocess"))
+    os.makedirs(os.path.join(ctn.container_path, "prfpylot", "templates"))
+    with open(os.path.join(ctn.container_path, "prf", "preprocess", "preprocess6"), "wb") as f:
+        f.write(b"binary")
+    with open(
+        os.path.join(ctn.container_path, "prfpylot", "templates", "template_preprocess6.inp"), "w"
+    ) as f:
+        f.write("DC_min 0.05")
+    os.makedirs(os.path.join(ctn.data_input_path, "ifg", "170608"))
+    for i, filename in enumerate(sorted(os.listdir(ifg_dir))):
+        os.symlink(
+            os.path.join(ifg_dir, filename),
+            os.path.join(ctn.data_input_path, "ifg", "170608", f"170608SN.{i + 1}"),
+        )
+    os.makedirs(ctn.data_output_path)
+    with open(ctn.pylot_config_path, "w") as f:
+        f.write("site_name: so\nstart_with_spectra: False\nnote:\n")
+    return session
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_spectra_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(src.types.retrieval_containers, "_CONTAINERS_DIR", tmpdir)
+        monkeypatch.setattr(
+            src.retrieval.utils.spectra_cache, "_CACHE_DIR", os.path.join(tmpdir, "cache")
+        )
+        ifg_dir = os.path.join(tmpdir, "ifgs")
+        os.mkdir(ifg_dir)
+        for i in range(3):
+            with open(os.path.join(ifg_dir, f"so20170608.ifg.{i}"), "w") as f:
+                f.write("ifg")
+
+        s1 = _create_session("a", "GGG2014", ifg_dir)
+        s2 = _create_session("b", "GGG2020", ifg_dir)
+        key = src.retrieval.utils.spectra_cache.get_cache_key(s1)
+        assert src.retrieval.utils.spectra_cache.get_cache_key(s2) == key
+        assert not src.retrieval.utils.spectra_cache.restore_spectra(s2, key)
+
+        # only complete preprocessing outputs are stored
+        cal_dir = os.path.join(s1.ctn.data_output_path, "analysis", "so_SN039", "170608", "cal")
+        os.makedirs(cal_dir)
+        with open(os.path.join(cal_dir, "logfile.dat"), "w") as f:
+            f.write("log")
+        assert not src.retrieval.utils.spectra_cache.store_spectra(s1, key)
+        with open(os.path.join(cal_dir, "170608_083000SN.BIN"), "w") as f:
+            f.write("spectrum")
+        assert src.retrieval.utils.spectra_cache.store_spectra(s1, key)
+
+        assert src.retrieval.utils.spectra_cache.restore_spectra(s2, key)
+        assert sorted(
+            os.listdir(
+                os.path.join(s2.ctn.data_output_path, "analysis", "so_SN039", "170608", "cal")
+            )
+        ) == ["170608_083000SN.BIN", "logfile.dat"]
+        with open(s2.ctn.pylot_config_path) as f:
+            assert "start_with_spectra: True\n" in f.read()
+
+        # different thresholds, binaries or interferograms lead to different keys
+        with open(
+            os.path.join(
+                s2.ctn.container_path, "prfpylot", "templates", "template_preprocess6.inp"
+            ), "w"
+        ) as f:
+            f.write("DC_min 0.1")
+        assert src.retrieval.utils.spectra_cache.get_cache_key(s2) != key
+        os.remove(os.path.join(s1.ctn.data_input_path, "ifg", "170608", "170608SN.3"))
+        assert src.retrieval.utils.spectra_cache.get_cache_key(s1) != key
+
+        # least recently used entries are removed when the cache is too large
+        assert src.retrieval.utils.spectra_cache.prune_cache(11) == []
+        assert src.retrieval.utils.spectra_cache.prune_cache(10) == [key]
+        assert os.listdir(os.path.join(tmpdir, "cache")) == []
+        assert not src.retrieval.utils.spectra_cache.restore_spectra(s2, key)
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_reprocessing_from_spectra(
+    monkeypatch: pytest.MonkeyPatch,
+    provide_config_template: src.types.Config,
+) -> None:
+    spectra_source = src.types.config.RetrievalJobSettingsSpectraSourceConfig(
+        atmospheric_profile_model="GGG2014"
+    )
+    job_config = {
+        "retrieval_algorithm": "proffast-2.4",
+        "atmospheric_profile_model": "GGG2014",
+        "sensor_ids": ["so"],
+        "from_date": "2017-06-08",
+        "to_date": "2017-06-08",
+    }
+    with pytest.raises(pydantic.ValidationError):
+        src.types.RetrievalJobConfig.model_validate({
+            **job_config, "settings": {
+                "reprocess_from_spectra": spectra_source.model_dump()
+            }
+        })
+    src.types.RetrievalJobConfig.model_validate({
+        **job_config, "settings": {
+            "reprocess_from_spectra": spectra_source.model_dump(),
+            "output_suffix": "new-pressure"
+        }
+    })
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(src.types.retrieval_containers, "_CONTAINERS_DIR", tmpdir)
+        config = provide_config_template.model_copy(deep=True)
+        config.general.data.results.root = os.path.join(tmpdir, "results")
+        ifg_dir = os.path.join(tmpdir, "ifgs")
+        os.mkdir(ifg_dir)
+
+        session = _create_session("a", "GGG2020", ifg_dir)
+        session.job_settings.reprocess_from_spectra = spectra_source
+        assert src.retrieval.utils.spectra_cache.find_archived_spectra(
+            config, "proffast-2.4", spectra_source, session.ctx
+        ) is None
+        with pytest.raises(FileNotFoundError):
+            src.retrieval.utils.spectra_cache.stage_archived_spectra(config, session)
+
+        archive_dir = os.path.join(
+            tmpdir, "results", "proffast-2.4", "GGG2014", "so", "successful", "20170608",
+            "analysis", "cal"
+        )
+        os.makedirs(archive_dir)
+        with open(os.path.join(archive_dir, "logfile.dat"), "w") as f:
+            f.write("log")
+        assert src.retrieval.utils.spectra_cache.find_archived_spectra(
+            config, "proffast-2.4", spectra_source, session.ctx
+        ) is None
+        for t in ["083000", "083100"]:
+            with open(os.path.join(archive_dir, f"170608_{t}SN.BIN"), "w") as f:
+                f.write("spectrum")
+        assert src.retrieval.utils.spectra_cache.find_archived_spectra(
+            config, "proffast-2.4", spectra_source, session.ctx
+        ) == archive_dir
+
+        assert src.retrieval.utils.spectra_cache.stage_archived_spectra(config, session) == 2
+        assert sorted(
+            os.listdir(
+                os.path.join(session.ctn.data_output_path, "analysis", "so_SN039", "170608", "cal")
+            )
+        ) == ["170608_083000SN.BIN", "170608_083100SN.BIN", "logfile.dat"]
+        with open(session.ctn.pylot_config_path) as f:
+            assert "start_with_spectra: True\n" in f.read()
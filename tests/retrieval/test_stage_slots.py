@@ -0,0 +1,57 @@
+import multiprocessing
+import threading
+import pytest
+import src
+
+
+def _can_acquire(
+    stage_slots: src.retrieval.utils.stage_slots.StageSlots,
+    stage: src.retrieval.utils.stage_slots.RetrievalStage,
+) -> bool:
+    """Try to acquire a slot from another thread within one second."""
+
+    acquired = threading.Event()
+    release = threading.Event()
+
+    def _target() -> None:
+        with stage_slots.acquire(stage):
+            acquired.set()
+            release.wait()
+
+    thread = threading.Thread(target=_target, daemon=True)
+    thread.start()
+    result = acquired.wait(timeout=1)
+    release.set()
+    if result:
+        thread.join()
+    return result
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_stage_slots() -> None:
+    stage_slots = src.retrieval.utils.stage_slots.StageSlots(
+        src.types.config.RetrievalStageConcurrencyConfig(
+            input_output=2, preprocess=None, pcxs=1, invers=3
+        ),
+        multiprocessing.get_context("spawn"),
+    )
+
+    # inputs and outputs share one pool
+    with stage_slots.acquire("inputs"):
+        assert _can_acquire(stage_slots, "outputs")
+        with stage_slots.acquire("outputs"):
+            assert not _can_acquire(stage_slots, "inputs")
+            assert _can_acquire(stage_slots, "pcxs")
+    assert _can_acquire(stage_slots, "inputs")
+
+    # unlimited stages never block
+    with stage_slots.acquire("preprocess"):
+        assert _can_acquire(stage_slots, "preprocess")
+
+    # slots are released when a stage fails
+    with pytest.raises(RuntimeError):
+        with stage_slots.acquire("pcxs"):
+            assert not _can_acquire(stage_slots, "pcxs")
+            raise RuntimeError("pcxs failed")
+    assert _can_acquire(stage_slots, "pcxs")
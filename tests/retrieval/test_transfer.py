@@ -0,0 +1,111 @@
+import errno
+import os
+import tempfile
+import pytest
+import src
+
+
+def _write_tree(root: str) -> None:
+    os.makedirs(os.path.join(root, "sub"))
+    with open(os.path.join(root, "a.txt"), "wb") as f:
+        f.write(b"a" * 100_000)
+    with open(os.path.join(root, "sub", "b.sh"), "wb") as f:
+        f.write(b"#!/bin/bash\n")
+    os.chmod(os.path.join(root, "sub", "b.sh"), 0o755)
+
+
+def _read_tree(root: str) -> dict[str, tuple[bytes, int]]:
+    contents: dict[str, tuple[bytes, int]] = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            filepath = os.path.join(dirpath, filename)
+            with open(filepath, "rb") as f:
+                contents[os.path.relpath(filepath, root)] = (
+                    f.read(), os.stat(filepath).st_mode & 0o777
+                )
+    return contents
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_transfer(monkeypatch: pytest.MonkeyPatch) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src_dir = os.path.join(tmpdir, "src")
+        _write_tree(src_dir)
+        expected_contents = _read_tree(src_dir)
+        src_file = os.path.join(src_dir, "a.txt")
+
+        # copies are independent of their source
+        src.utils.transfer.copy_file(src_file, os.path.join(tmpdir, "copy.txt"))
+        with open(os.path.join(tmpdir, "copy.txt"), "ab") as f:
+            f.write(b"b")
+        assert _read_tree(src_dir) == expected_contents
+        assert os.stat(os.path.join(tmpdir, "copy.txt")).st_size == 100_001
+
+        # links share their data with the source
+        src.utils.transfer.link_or_copy_file(src_file, os.path.join(tmpdir, "link.txt"))
+        assert os.path.samefile(src_file, os.path.join(tmpdir, "link.txt"))
+        os.remove(os.path.join(tmpdir, "link.txt"))
+
+        # moves within one filesystem are renames
+        inode = os.stat(src_file).st_ino
+        src.utils.transfer.move_tree(src_dir, os.path.join(tmpdir, "moved"))
+        assert not os.path.exists(src_dir)
+        assert _read_tree(os.path.join(tmpdir, "moved")) == expected_contents
+        assert os.stat(os.path.join(tmpdir, "moved", "a.txt")).st_ino == inode
+        with pytest.raises(FileExistsError):
+            src.utils.transfer.move_tree(
+                os.path.join(tmpdir, "moved", "sub"), os.path.join(tmpdir, "moved")
+            )
+
+        # moves across filesystems fall back to copying
+        def _cross_device_rename(src: str, dst: str) -> None:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+        monkeypatch.setattr(os, "rename", _cross_device_rename)
+        src.utils.transfer.move_tree(
+            os.path.join(tmpdir, "moved"), os.path.join(tmpdir, "moved-again")
+        )
+        assert not os.path.exists(os.path.join(tmpdir, "moved"))
+        assert _read_tree(os.path.join(tmpdir, "moved-again")) == expected_contents
+        src.utils.transfer.move_file(
+            os.path.join(tmpdir, "copy.txt"), os.path.join(tmpdir, "copy-moved.txt")
+        )
+        assert not os.path.exists(os.path.join(tmpdir, "copy.txt"))
+        assert os.stat(os.path.join(tmpdir, "copy-moved.txt")).st_size == 100_001
+
+
+@pytest.mark.order(3)
+@pytest.mark.quick
+def test_transfer_unshares_files() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src_dir = os.path.join(tmpdir, "src")
+        _write_tree(src_dir)
+        expected_contents = _read_tree(src_dir)
+        with open(os.path.join(tmpdir, "outside.txt"), "wb") as f:
+            f.write(b"outside")
+
+        # e.g. spectra shared with the spectra cache or linked input files
+        os.link(os.path.join(src_dir, "a.txt"), os.path.join(tmpdir, "cached.txt"))
+        os.symlink(os.path.join(tmpdir, "outside.txt"), os.path.join(src_dir, "symlink.txt"))
+        os.symlink("missing.txt", os.path.join(src_dir, "dangling.txt"))
+        os.symlink("sub", os.path.join(src_dir, "sub-link"))
+
+        dst_dir = os.path.join(tmpdir, "dst")
+        src.utils.transfer.move_tree(src_dir, dst_dir)
+        assert _read_tree(dst_dir) == {
+            **expected_contents,
+            "symlink.txt": _read_tree(tmpdir)["outside.txt"],
+            os.path.join("sub-link", "b.sh"): expected_contents[os.path.join("sub", "b.sh")],
+        }
+        for dirpath, dirnames, filenames in os.walk(dst_dir):
+            for name in dirnames + filenames:
+                assert not os.path.islink(os.path.join(dirpath, name))
+        assert not os.path.samefile(
+            os.path.join(dst_dir, "a.txt"), os.path.join(tmpdir, "cached.txt")
+        )
+
+        # modifying the published files does not modify the cache
+        with open(os.path.join(dst_dir, "a.txt"), "ab") as f:
+            f.write(b"b")
+        assert os.stat(os.path.join(tmpdir, "cached.txt")).st_size == 100_000